@@ -0,0 +1,81 @@
+"""
+Dashboard statistics
+
+All counters of a table come from one conditional-aggregation query and the
+whole result is cached; model save/delete signals (see accounts.signals)
+drop the cached value once the change is committed.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from diagnostics.metrics import record_cache
+
+DASHBOARD_STATS_KEY = 'dashboard:stats'
+
+
+def count_by(field, choices):
+    """Count(*) plus one filtered Count per choice of the field"""
+    counts = {'total': Count('id')}
+    counts.update({f'{field}:{value}': Count('id', filter=Q(**{field: value})) for value, _ in choices})
+    return counts
+
+
+def breakdown(counts, field, choices):
+    """[(value, label, count)] in the order of the choices, for templates"""
+    return [(value, label, counts[f'{field}:{value}']) for value, label in choices]
+
+
+def compute_dashboard_stats():
+    from accounts.models import CustomUser
+    from bookings.models import Booking, DailyEarnings
+    from contracts.models import Contract
+    from utils import sum_decimal
+    from vehicles.models import Vehicle
+
+    roles = CustomUser.Roles.choices
+    users = CustomUser.objects.aggregate(**count_by('role', roles))
+    vehicles = Vehicle.objects.aggregate(**count_by('status', Vehicle.STATUS_CHOICES))
+    booking_counts = count_by('status', Booking.STATUS_CHOICES)
+    booking_counts.update(count_by('payment_status', Booking.PAYMENT_STATUS_CHOICES))
+    bookings = Booking.objects.aggregate(**booking_counts)
+    contracts = Contract.objects.aggregate(total=Count('id'), active=Count('id', filter=Q(is_active=True)))
+    # Shu oylik daromad (kunlik yig'indilar jadvalidan)
+    month_earnings = DailyEarnings.objects.filter(
+        day__gte=timezone.localdate().replace(day=1)
+    ).aggregate(
+        total=sum_decimal('total_earnings'),
+        owner=sum_decimal('owner_earnings'),
+        company=sum_decimal('company_earnings'),
+    )
+
+    return {
+        'total_users': sum(users[f'role:{value}'] for value, _ in roles),
+        'owner_count': users[f'role:{CustomUser.Roles.OWNER}'],
+        'renter_count': users[f'role:{CustomUser.Roles.RENTER}'],
+        'total_vehicles': vehicles['total'],
+        'vehicles_by_status': breakdown(vehicles, 'status', Vehicle.STATUS_CHOICES),
+        'total_bookings': bookings['total'],
+        'bookings_by_status': breakdown(bookings, 'status', Booking.STATUS_CHOICES),
+        'bookings_by_payment_status': breakdown(bookings, 'payment_status', Booking.PAYMENT_STATUS_CHOICES),
+        'total_contracts': contracts['total'],
+        'active_contracts': contracts['active'],
+        'month_earnings': month_earnings,
+    }
+
+
+def get_dashboard_stats():
+    """Cached dashboard counters; computed with five queries on a cache miss"""
+    stats = cache.get(DASHBOARD_STATS_KEY)
+    record_cache('dashboard_stats', hits=stats is not None, misses=stats is None)
+    if stats is None:
+        stats = compute_dashboard_stats()
+        cache.set(DASHBOARD_STATS_KEY, stats, getattr(settings, 'DASHBOARD_STATS_TTL', 60))
+    return stats
+
+
+def invalidate_dashboard_stats(using=None):
+    """Drop the cached counters when the current transaction commits"""
+    transaction.on_commit(lambda: cache.delete(DASHBOARD_STATS_KEY), using=using)
@@ -4,6 +4,7 @@ from django.contrib.auth.hashers import make_password
 import random
 import string
 from .models import CustomUser
+from .usernames import allocate_usernames, save_with_username, username_base
 
 class CustomUserCreationForm(forms.ModelForm):
     role = forms.ChoiceField(
@@ -48,17 +49,8 @@ class CustomUserCreationForm(forms.ModelForm):
         })
 
     def generate_username(self, first_name, last_name):
-        """Username generatsiya qilish"""
-        base_username = f"{first_name.lower()}_{last_name.lower()}"
-        username = base_username
-        
-        # Agar bunday username mavjud bo'lsa, raqam qo'shamiz
-        counter = 1
-        while CustomUser.objects.filter(username=username).exists():
-            username = f"{base_username}_{counter}"
-            counter += 1
-            
-        return username
+        """Username generatsiya qilish (band bo'lsa _1, _2, ... qo'shiladi)"""
+        return allocate_usernames([username_base(first_name, last_name)])[0]
 
     def generate_password(self):
         """Xavfsiz parol generatsiya qilish"""
@@ -70,15 +62,15 @@ class CustomUserCreationForm(forms.ModelForm):
         user = super().save(commit=False)
         
         # Username va parol generatsiya qilish
-        username = self.generate_username(user.first_name, user.last_name)
         password = self.generate_password()
-        
-        user.username = username
         user.password = make_password(password)
         user.is_verified = True  # Avtomatik tasdiqlash
         
         if commit:
-            user.save()
+            # Parallel yaratishda username band bo'lib qolsa, keyingisi olinadi
+            save_with_username(user, username_base(user.first_name, user.last_name))
+        else:
+            user.username = self.generate_username(user.first_name, user.last_name)
             
         return user, password
 
@@ -0,0 +1,63 @@
+from django.db import migrations
+
+FTS_COLUMNS = 'rowid, username, first_name, last_name, phone'
+
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE accounts_customuser_fts USING fts5(
+        username, first_name, last_name, phone,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER accounts_customuser_fts_insert AFTER INSERT ON accounts_customuser BEGIN
+        INSERT INTO accounts_customuser_fts ({FTS_COLUMNS})
+        VALUES (new.id, new.username, new.first_name, new.last_name, new.phone);
+    END
+    """,
+    f"""
+    CREATE TRIGGER accounts_customuser_fts_update
+    AFTER UPDATE OF username, first_name, last_name, phone ON accounts_customuser BEGIN
+        DELETE FROM accounts_customuser_fts WHERE rowid = old.id;
+        INSERT INTO accounts_customuser_fts ({FTS_COLUMNS})
+        VALUES (new.id, new.username, new.first_name, new.last_name, new.phone);
+    END
+    """,
+    """
+    CREATE TRIGGER accounts_customuser_fts_delete AFTER DELETE ON accounts_customuser BEGIN
+        DELETE FROM accounts_customuser_fts WHERE rowid = old.id;
+    END
+    """,
+    f"""
+    INSERT INTO accounts_customuser_fts ({FTS_COLUMNS})
+    SELECT id, username, first_name, last_name, phone FROM accounts_customuser
+    """,
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS accounts_customuser_fts_delete',
+    'DROP TRIGGER IF EXISTS accounts_customuser_fts_update',
+    'DROP TRIGGER IF EXISTS accounts_customuser_fts_insert',
+    'DROP TABLE IF EXISTS accounts_customuser_fts',
+]
+
+
+def run_on_sqlite(statements):
+    # FTS5 faqat SQLite'da; boshqa bazalarda qidiruv icontains bilan ishlaydi
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_alter_customuser_role'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_sqlite(CREATE_SQL), run_on_sqlite(DROP_SQL)),
+    ]
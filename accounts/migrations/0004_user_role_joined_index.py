@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_user_search_index'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['role', 'date_joined'], name='user_role_joined_idx'),
+        ),
+    ]
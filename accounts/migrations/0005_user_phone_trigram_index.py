@@ -0,0 +1,65 @@
+from django.db import migrations
+
+PHONE_COMPACT = "replace(replace(replace(replace(replace({phone}, ' ', ''), '+', ''), '-', ''), '(', ''), ')', '')"
+
+
+def compact(prefix):
+    return PHONE_COMPACT.format(phone=f'{prefix}.phone')
+
+
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE accounts_customuser_trigram USING fts5(
+        phone_compact, tokenize = 'trigram'
+    )
+    """,
+    f"""
+    CREATE TRIGGER accounts_customuser_trigram_insert AFTER INSERT ON accounts_customuser BEGIN
+        INSERT INTO accounts_customuser_trigram (rowid, phone_compact) VALUES (new.id, {compact('new')});
+    END
+    """,
+    f"""
+    CREATE TRIGGER accounts_customuser_trigram_update
+    AFTER UPDATE OF phone ON accounts_customuser BEGIN
+        DELETE FROM accounts_customuser_trigram WHERE rowid = old.id;
+        INSERT INTO accounts_customuser_trigram (rowid, phone_compact) VALUES (new.id, {compact('new')});
+    END
+    """,
+    """
+    CREATE TRIGGER accounts_customuser_trigram_delete AFTER DELETE ON accounts_customuser BEGIN
+        DELETE FROM accounts_customuser_trigram WHERE rowid = old.id;
+    END
+    """,
+    f"""
+    INSERT INTO accounts_customuser_trigram (rowid, phone_compact)
+    SELECT u.id, {compact('u')} FROM accounts_customuser u
+    """,
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS accounts_customuser_trigram_delete',
+    'DROP TRIGGER IF EXISTS accounts_customuser_trigram_update',
+    'DROP TRIGGER IF EXISTS accounts_customuser_trigram_insert',
+    'DROP TABLE IF EXISTS accounts_customuser_trigram',
+]
+
+
+def run_on_sqlite(statements):
+    # Trigram FTS5 faqat SQLite'da; boshqa bazalarda qidiruv icontains bilan ishlaydi
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_user_role_joined_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_sqlite(CREATE_SQL), run_on_sqlite(DROP_SQL)),
+    ]
@@ -10,5 +10,10 @@ class CustomUser(AbstractUser):
     phone = models.CharField(max_length=30, blank=True)
     is_verified = models.BooleanField(default=False)
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['role', 'date_joined'], name='user_role_joined_idx'),
+        ]
+
     def __str__(self):
         return f"{self.username} ({self.role})"
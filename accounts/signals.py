@@ -0,0 +1,25 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from bookings.models import Booking, Payment
+from contracts.models import Contract
+from diagnostics.metrics import timed_handler
+from vehicles.models import Vehicle
+from .dashboard import invalidate_dashboard_stats
+from .models import CustomUser
+
+DASHBOARD_MODELS = (CustomUser, Vehicle, Booking, Contract, Payment)
+
+
+@timed_handler
+def dashboard_changed(sender, instance, using, update_fields=None, **kwargs):
+    """Drop the cached dashboard counters after a counted model changes"""
+    # Har bir kirishda last_login yangilanadi, bu statistikaga ta'sir qilmaydi
+    if sender is CustomUser and update_fields and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_dashboard_stats(using)
+
+
+for model in DASHBOARD_MODELS:
+    post_save.connect(dashboard_changed, sender=model, dispatch_uid=f'dashboard_save_{model.__name__}')
+    post_delete.connect(dashboard_changed, sender=model, dispatch_uid=f'dashboard_delete_{model.__name__}')
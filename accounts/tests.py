@@ -1,3 +1,149 @@
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from bookings.models import Booking
+from vehicles.models import Vehicle
+from .dashboard import get_dashboard_stats
+from .models import CustomUser
+from .usernames import allocate_usernames, save_with_username
+
+
+class DashboardStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'parol123', role='')
+        self.owner = CustomUser.objects.create_user('owner', password='parol123', role='owner')
+        CustomUser.objects.create_user('renter', password='parol123', role='renter')
+        Vehicle.objects.create(owner=self.owner, plate_number='01 A 123 BC', daily_price=100, status='available')
+
+    def test_counters_use_one_query_per_table(self):
+        with self.assertNumQueries(5):
+            stats = get_dashboard_stats()
+        self.assertEqual(stats['total_users'], 2)
+        self.assertEqual(stats['owner_count'], 1)
+        self.assertEqual(stats['renter_count'], 1)
+        self.assertEqual(stats['total_vehicles'], 1)
+        self.assertIn(('available', 'Mavjud', 1), stats['vehicles_by_status'])
+        self.assertIn(('unpaid', 'Unpaid', 0), stats['bookings_by_payment_status'])
+
+        with self.assertNumQueries(0):
+            get_dashboard_stats()
+
+    def test_saves_invalidate_cached_counters(self):
+        get_dashboard_stats()
+        with self.captureOnCommitCallbacks(execute=True):
+            Vehicle.objects.create(owner=self.owner, plate_number='01 B 456 CD', daily_price=100)
+        stats = get_dashboard_stats()
+        self.assertEqual(stats['total_vehicles'], 2)
+        self.assertIn(('inactive', 'Faol emas', 1), stats['vehicles_by_status'])
+
+    def test_dashboard_renders_from_cache(self):
+        self.client.login(username='admin', password='parol123')
+        self.client.get(reverse('dashboard'))
+        # Only the session and user lookups remain once the counters are cached
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, 'Mashinalar holati')
+        self.assertEqual(response.context['owner_count'], 1)
+
+
+class UsersListTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'parol123', role='')
+        self.owner = CustomUser.objects.create_user('owner', password='x', role='owner', first_name='Sardor')
+        self.renter = CustomUser.objects.create_user('renter', password='x', role='renter', phone='+998901112233')
+        CustomUser.objects.bulk_create([CustomUser(username=f'mijoz{i}', role='renter') for i in range(30)])
+        vehicle = Vehicle.objects.create(owner=self.owner, plate_number='01 A 123 BC', daily_price=100)
+        now = timezone.now().replace(microsecond=0)
+        for day in (1, 5):
+            Booking.objects.create(
+                renter=self.renter, vehicle=vehicle,
+                start_at=now + timedelta(days=day), end_at=now + timedelta(days=day, hours=3),
+            )
+        self.last_start = now + timedelta(days=5)
+        self.client.force_login(self.admin)
+
+    def test_page_is_annotated_in_one_query(self):
+        self.client.get(reverse('users_list'))
+        # session, user, COUNT for the paginator, annotated page
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('users_list'), {'page': 2})
+        self.assertEqual(len(response.context['users']), 7)
+
+        users = {user.pk: user for user in response.context['users']}
+        owner, renter = users[self.owner.pk], users[self.renter.pk]
+        self.assertEqual((owner.vehicles_count, owner.bookings_count), (1, 2))
+        self.assertEqual((renter.vehicles_count, renter.bookings_count), (0, 2))
+        self.assertEqual(renter.last_booking_at, self.last_start)
+        self.assertNotIn(self.admin.pk, users)
+
+    def test_search_and_role_filter(self):
+        response = self.client.get(reverse('users_list'), {'search': 'sardor'})
+        self.assertEqual([user.pk for user in response.context['users']], [self.owner.pk])
+        response = self.client.get(reverse('users_list'), {'search': '99890111'})
+        self.assertEqual([user.pk for user in response.context['users']], [self.renter.pk])
+        response = self.client.get(reverse('users_list'), {'search': '112233'})
+        self.assertEqual([user.pk for user in response.context['users']], [self.renter.pk])
+        response = self.client.get(reverse('users_list'), {'role': 'owner'})
+        self.assertEqual([user.pk for user in response.context['users']], [self.owner.pk])
+
+
+
+class UserCreateVehiclesTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'parol123', role='')
+        self.client.force_login(self.admin)
+
+    def post(self, vehicles):
+        return self.client.post(reverse('user_create'), {
+            'first_name': 'Sardor', 'last_name': 'Karimov', 'role': 'owner', 'email': '',
+            'phone': '', 'vehicles_data': json.dumps(vehicles),
+        })
+
+    def test_owner_is_created_with_fleet(self):
+        response = self.post([{'plate_number': f'10a{i:03d}bc', 'daily_price': '100'} for i in range(3)])
+        self.assertRedirects(response, reverse('users_list'), fetch_redirect_response=False)
+        owner = CustomUser.objects.get(username='sardor_karimov')
+        self.assertEqual(owner.vehicles.count(), 3)
+
+    def test_invalid_vehicle_creates_nothing(self):
+        response = self.post([{'plate_number': '10a001bc', 'daily_price': '100'}, {'plate_number': 'xato'}])
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(CustomUser.objects.filter(username='sardor_karimov').exists())
+        self.assertEqual(Vehicle.objects.count(), 0)
+        self.assertTrue(any(str(m).startswith('2-mashina') for m in response.context['messages']))
+
+    def test_taken_plate_creates_nothing(self):
+        owner = CustomUser.objects.create_user('owner', password='x', role='owner')
+        Vehicle.objects.create(owner=owner, plate_number='10 A 001 BC')
+        response = self.post([{'plate_number': '10a001bc', 'daily_price': '100'}])
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(CustomUser.objects.filter(username='sardor_karimov').exists())
+        self.assertEqual(Vehicle.objects.count(), 1)
+        self.assertTrue(any('allaqachon mavjud' in str(m) for m in response.context['messages']))
+
+
+class UsernameAllocationTests(TestCase):
+    def setUp(self):
+        CustomUser.objects.bulk_create([
+            CustomUser(username=name) for name in
+            ('sardor_karimov', 'sardor_karimov_1', 'sardor_karimov_3', 'sardor_karimovich', 'ali_valiyev_x')
+        ])
+
+    def test_one_query_for_many_usernames(self):
+        with self.assertNumQueries(1):
+            usernames = allocate_usernames(['sardor_karimov', 'ali_valiyev', 'sardor_karimov', 'ali_valiyev'])
+        self.assertEqual(usernames, ['sardor_karimov_2', 'ali_valiyev', 'sardor_karimov_4', 'ali_valiyev_1'])
 
-# Create your tests here.
+    def test_clash_is_retried(self):
+        clashing = [['sardor_karimov'], ['sardor_karimov_2']]
+        with mock.patch('accounts.usernames.allocate_usernames', side_effect=clashing):
+            user = save_with_username(CustomUser(first_name='Sardor'), 'sardor_karimov')
+        self.assertEqual(user.username, 'sardor_karimov_2')
+        self.assertEqual(CustomUser.objects.filter(username__startswith='sardor_karimov_').count(), 3)
@@ -0,0 +1,69 @@
+"""
+Username allocation: base, base_1, base_2, ...
+
+Taken names are read with one prefix query for all requested bases instead
+of probing every candidate with exists(). Two concurrent allocations can
+still pick the same name; the unique constraint rejects the second insert
+and the caller retries (see save_with_username).
+"""
+import re
+
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import Q
+
+from .models import CustomUser
+
+USERNAME_ATTEMPTS = 5
+
+
+def username_base(first_name, last_name):
+    return f"{first_name.lower()}_{last_name.lower()}"
+
+
+def taken_suffixes(bases, using=DEFAULT_DB_ALIAS):
+    """{base: set of taken suffixes}; 0 stands for the bare base"""
+    bases = set(bases)
+    taken = {base: set() for base in bases}
+    if not bases:
+        return taken
+    prefixes = Q()
+    for base in bases:
+        prefixes |= Q(username__startswith=base)
+    pattern = re.compile(r'^(?P<base>.*?)(?:_(?P<suffix>\d+))?$')
+    for username in CustomUser.objects.using(using).filter(prefixes).values_list('username', flat=True):
+        if username in taken:
+            taken[username].add(0)
+        match = pattern.match(username)
+        if match.group('suffix') and match.group('base') in taken:
+            taken[match.group('base')].add(int(match.group('suffix')))
+    return taken
+
+
+def allocate_usernames(bases, using=DEFAULT_DB_ALIAS):
+    """
+    Free usernames for every base in order, in one query; repeated bases
+    get consecutive suffixes
+    """
+    taken = taken_suffixes(bases, using)
+    usernames = []
+    for base in bases:
+        suffixes = taken[base]
+        suffix = 0
+        while suffix in suffixes:
+            suffix += 1
+        suffixes.add(suffix)
+        usernames.append(f"{base}_{suffix}" if suffix else base)
+    return usernames
+
+
+def save_with_username(user, base, using=DEFAULT_DB_ALIAS):
+    """Allocate a username for the unsaved user and insert it, retrying on a concurrent clash"""
+    for attempt in range(USERNAME_ATTEMPTS):
+        user.username = allocate_usernames([base], using)[0]
+        try:
+            with transaction.atomic(using=using):
+                user.save(using=using)
+            return user
+        except IntegrityError:
+            if attempt == USERNAME_ATTEMPTS - 1:
+                raise
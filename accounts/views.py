@@ -3,12 +3,19 @@ from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.contrib.auth.views import LoginView
+from django.core.paginator import Paginator
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, IntegerField, Max, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
 from django.urls import reverse_lazy
 from django.views.generic import CreateView, ListView
 from django.http import JsonResponse
 from .forms import UserUpdateForm, CustomUserCreationForm
 from .models import CustomUser
 from vehicles.models import CarMake, CarModel, Vehicle
+from vehicles.onboarding import onboard_vehicles
+from bookings.models import Booking
+from utils import search_user_ids
 import json
 
 class CustomLoginView(LoginView):
@@ -38,16 +45,66 @@ def logout_view(request):
     messages.info(request, 'Tizimdan chiqdingiz.')
     return redirect('login')
 
+def subquery_value(queryset, group_field, aggregate):
+    """Correlated subquery returning one aggregate per outer user"""
+    return Subquery(
+        queryset.order_by().values(group_field).annotate(value=aggregate).values('value')[:1]
+    )
+
+
+def annotate_user_activity(users):
+    """
+    Add vehicles_count, bookings_count and last_booking_at to every user in
+    the same query. Owners count bookings of their vehicles, renters their own.
+    """
+    owner_bookings = Booking.objects.filter(vehicle__owner=OuterRef('pk'))
+    renter_bookings = Booking.objects.filter(renter=OuterRef('pk'))
+    return users.annotate(
+        vehicles_count=Coalesce(
+            subquery_value(Vehicle.objects.filter(owner=OuterRef('pk')), 'owner', Count('id')), 0
+        ),
+        bookings_count=Coalesce(
+            Case(
+                When(role=CustomUser.Roles.OWNER, then=subquery_value(owner_bookings, 'vehicle__owner', Count('id'))),
+                default=subquery_value(renter_bookings, 'renter', Count('id')),
+                output_field=IntegerField(),
+            ),
+            Value(0),
+        ),
+        last_booking_at=Case(
+            When(role=CustomUser.Roles.OWNER, then=subquery_value(owner_bookings, 'vehicle__owner', Max('start_at'))),
+            default=subquery_value(renter_bookings, 'renter', Max('start_at')),
+        ),
+    )
+
+
 @login_required
 def users_list(request):
     """Mijozlar ro'yxati - faqat owner va renter"""
     # Faqat mijozlarni ko'rsatish (admin emas)
-    users = CustomUser.objects.filter(
-        role__in=['owner', 'renter']
-    ).order_by('-date_joined')
+    role = request.GET.get('role')
+    if role in CustomUser.Roles.values:
+        users = CustomUser.objects.filter(role=role)
+    else:
+        role = ''
+        users = CustomUser.objects.filter(role__in=CustomUser.Roles.values)
+    
+    search = request.GET.get('search', '').strip()
+    if search:
+        users = users.filter(id__in=search_user_ids(search))
+    
+    # Hisoblagichlar sahifa so'rovining o'zida (COUNT so'rovi ularni tashlab yuboradi)
+    users = annotate_user_activity(users.order_by('-date_joined', '-id'))
+    paginator = Paginator(users, 25)
+    page_obj = paginator.get_page(request.GET.get('page'))
     
     context = {
-        'users': users,
+        'users': page_obj,
+        'page_obj': page_obj,
+        'is_paginated': page_obj.has_other_pages(),
+        'search': search,
+        'role': role,
+        'roles': CustomUser.Roles.choices,
     }
     return render(request, 'accounts/users_list.html', context)
 
@@ -64,37 +121,38 @@ class UserCreateView(CreateView):
         return context
     
     def form_valid(self, form):
-        # Form save metodini chaqirish va user, password olish
-        user, generated_password = form.save()
-        
-        # Mashina ma'lumotlarini tekshirish va saqlash
+        # Foydalanuvchi va mashinalar bitta tranzaksiyada: bitta qatordagi xato
+        # ham na foydalanuvchini, na mashinalarni yaratadi
+        rows = []
         vehicles_data = self.request.POST.get('vehicles_data')
-        if vehicles_data and user.role == 'owner':
+        if vehicles_data and form.cleaned_data.get('role') == CustomUser.Roles.OWNER:
             try:
-                vehicles_json = json.loads(vehicles_data)
-                for vehicle_data in vehicles_json:
-                    # Vehicle obyektini yaratish
-                    vehicle = Vehicle(
-                        owner=user,
-                        make_id=vehicle_data.get('make'),
-                        model_id=vehicle_data.get('model'),
-                        name=vehicle_data.get('name', ''),
-                        plate_number=vehicle_data.get('plate_number'),
-                        year=vehicle_data.get('year'),
-                        daily_price=vehicle_data.get('daily_price'),
-                        hourly_price=vehicle_data.get('hourly_price') or None,
-                        status='available'  # Default holat - Mavjud
-                    )
-                    vehicle.save()
-            except (json.JSONDecodeError, ValueError) as e:
-                messages.warning(self.request, f'Mashina ma\'lumotlarida xatolik: {str(e)}')
-            except Exception as e:
-                # Agar plate number format noto'g'ri bo'lsa
-                if 'Plate format' in str(e):
-                    messages.error(self.request, f'Davlat raqami formati noto\'g\'ri: {str(e)}')
-                else:
-                    messages.error(self.request, f'Mashina saqlashda xatolik: {str(e)}')
-                return redirect(self.request.path)
+                rows = json.loads(vehicles_data)
+            except json.JSONDecodeError as e:
+                rows = None
+                messages.error(self.request, f'Mashina ma\'lumotlarida xatolik: {str(e)}')
+            if not isinstance(rows, list):
+                if rows is not None:
+                    messages.error(self.request, 'Mashina ma\'lumotlarida xatolik: ro\'yxat kutilgan.')
+                return self.form_invalid(form)
+
+        errors = {}
+        try:
+            with transaction.atomic():
+                # Form save metodini chaqirish va user, password olish
+                user, generated_password = form.save()
+                if rows:
+                    _, errors = onboard_vehicles(user, rows)
+                    if errors:
+                        transaction.set_rollback(True)
+        except IntegrityError:
+            # Username tekshiruvdan keyin parallel so'rovda band qilingan bo'lishi mumkin
+            messages.error(self.request, 'Saqlashda xatolik: davlat raqami yoki username band. Qaytadan urinib ko\'ring.')
+            return self.form_invalid(form)
+        if errors:
+            for index, row_errors in errors.items():
+                messages.error(self.request, f'{index + 1}-mashina: ' + ' '.join(row_errors))
+            return self.form_invalid(form)
         
         # Muvaffaqiyatli xabar
         messages.success(
@@ -0,0 +1,114 @@
+"""
+Hot paths timed by run_benchmarks
+
+Every case is a function and the list of argument tuples it is called
+with. Arguments are drawn from the data in the database with a fixed seed,
+so two runs over the same data set call the paths with the same inputs.
+Views are called directly with RequestFactory requests of a staff user
+and their template response rendered, so middleware is not included.
+"""
+import random
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from accounts.dashboard import DASHBOARD_STATS_KEY
+from accounts.models import CustomUser
+from bookings.bench import random_windows
+from bookings.models import Booking
+from vehicles.models import Vehicle
+import utils
+
+SAMPLE_SIZE = 50
+
+
+class Case:
+    def __init__(self, name, func, arguments):
+        self.name = name
+        self.func = func
+        self.arguments = arguments
+
+    def call_args(self, calls):
+        """`calls` argument tuples, cycling through the prepared ones"""
+        return [self.arguments[i % len(self.arguments)] for i in range(calls)]
+
+
+def view_caller(user, name, query=None):
+    """(func, args) rendering the view behind the URL name with the given GET parameters"""
+    path = reverse(name)
+    view = resolve(path).func
+    factory = RequestFactory()
+
+    def call(params):
+        request = factory.get(path, params)
+        request.user = user
+        response = view(request)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    return call, [(params,) for params in (query or [{}])]
+
+
+def dashboard_cold(user):
+    cache.delete(DASHBOARD_STATS_KEY)
+    return view_caller(user, 'dashboard')[0]({})
+
+
+def build_cases(seed=7):
+    """Cases for the data currently in the database; [] when there is nothing to benchmark"""
+    rng = random.Random(seed)
+    vehicle_ids = list(Vehicle.objects.filter(status='available', daily_price__gt=0).values_list('id', flat=True))
+    booking_ids = list(Booking.objects.values_list('id', flat=True)[:10000])
+    if not vehicle_ids or not booking_ids:
+        return []
+    vehicles = list(Vehicle.objects.filter(id__in=rng.sample(vehicle_ids, min(SAMPLE_SIZE, len(vehicle_ids)))))
+    bookings = list(Booking.objects.filter(id__in=rng.sample(booking_ids, min(SAMPLE_SIZE, len(booking_ids)))))
+    owners = list(CustomUser.objects.filter(id__in={vehicle.owner_id for vehicle in vehicles}))
+    windows = random_windows(SAMPLE_SIZE, seed=seed)
+    user = CustomUser.objects.filter(is_staff=True).order_by('id').first() or CustomUser(
+        username='benchmark', is_staff=True, is_superuser=True
+    )
+
+    end_date = timezone.localdate()
+    start_date = end_date - timedelta(days=90)
+    renter_names = list(
+        CustomUser.objects.filter(role='renter').exclude(last_name='').values_list('last_name', flat=True)[:100]
+    ) or ['Karimov']
+    make_ids = list(Vehicle.objects.exclude(make=None).values_list('make_id', flat=True).distinct()[:10])
+
+    booking_search = [
+        {'search': rng.choice(renter_names)},
+        {'status': 'completed', 'start_date': start_date, 'end_date': end_date},
+        {'search': rng.choice(renter_names), 'status': 'pending'},
+    ]
+    vehicle_filters = [{'status': 'available', 'min_price': 300000}] + [
+        {'make': make_id, 'max_price': 600000} for make_id in make_ids
+    ]
+
+    def vehicle_window(i):
+        return (vehicles[i % len(vehicles)], *windows[i % len(windows)])
+
+    return [
+        Case('get_available_vehicles',
+             lambda start, end: list(utils.get_available_vehicles(start, end).values_list('id', flat=True)),
+             windows),
+        Case('check_vehicle_availability', utils.check_vehicle_availability,
+             [vehicle_window(i) for i in range(SAMPLE_SIZE)]),
+        Case('calculate_booking_price', utils.calculate_booking_price,
+             [vehicle_window(i) for i in range(SAMPLE_SIZE)]),
+        Case('Booking.calculate_earnings', Booking.calculate_earnings, [(booking,) for booking in bookings]),
+        Case('get_vehicle_earnings_summary', utils.get_vehicle_earnings_summary,
+             [(vehicle, start_date, end_date) for vehicle in vehicles]),
+        Case('get_owner_earnings_summary', utils.get_owner_earnings_summary,
+             [(owner, start_date, end_date) for owner in owners]),
+        Case('get_company_earnings_summary', utils.get_company_earnings_summary,
+             [(), (start_date, end_date)]),
+        Case('BookingListView search', *view_caller(user, 'booking_list', booking_search)),
+        Case('VehicleListView filter', *view_caller(user, 'vehicle_list', vehicle_filters)),
+        Case('dashboard', *view_caller(user, 'dashboard')),
+        Case('dashboard (cold cache)', dashboard_cold, [(user,)]),
+    ]
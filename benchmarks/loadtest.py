@@ -0,0 +1,386 @@
+"""
+HTTP load test: a weighted mix of scenarios against a running server
+
+Every virtual user is an asyncio task with its own keep-alive connection
+and session (a plain HTTP/1.1 client over asyncio streams, so nothing
+outside the standard library is needed). It logs in once, then picks
+scenarios by weight until the duration or the request count runs out.
+
+The write scenarios only touch bookings the run creates itself: the
+payment scenario updates bookings made by create_booking earlier in the
+same run, never existing ones.
+
+The mix is either given as weights or recorded from production traffic:
+the 'diagnostics.requests' log lines carry the URL name of every request,
+and their counts become the weights of the matching scenarios.
+
+Results are reported per URL name: throughput, latency percentiles,
+status codes and error rate (transport errors, 4xx/5xx and redirects to
+the login page).
+"""
+import asyncio
+import json
+import random
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from bookings.bench import summarize
+from bookings.models import Booking
+from vehicles.models import Vehicle
+from vehicles.views import VehicleListView
+
+# Scenario -> URL name it requests
+SCENARIOS = {
+    'browse': 'vehicle_list',
+    'search': 'booking_list',
+    'create_booking': 'booking_create',
+    'add_payment': 'update_payment_status',
+    'dashboard': 'dashboard',
+}
+DEFAULT_MIX = {'browse': 40, 'search': 25, 'dashboard': 20, 'create_booking': 10, 'add_payment': 5}
+
+
+class HttpError(Exception):
+    pass
+
+
+class HttpClient:
+    """Minimal keep-alive HTTP/1.1 client with a cookie jar"""
+
+    def __init__(self, base_url, timeout=30):
+        url = urlsplit(base_url)
+        if url.scheme != 'http':
+            raise ValueError("Only http:// servers are supported")
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.prefix = url.path.rstrip('/')
+        self.timeout = timeout
+        self.cookies = {}
+        self.reader = self.writer = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self):
+        if self.writer:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+            self.reader = self.writer = None
+
+    async def request(self, method, path, data=None):
+        """(status, headers, body); one reconnect when a kept-alive connection was dropped"""
+        for attempt in (1, 2):
+            if self.writer is None:
+                await self.connect()
+            try:
+                return await asyncio.wait_for(self._send(method, path, data), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                await self.close()
+                if attempt == 2:
+                    raise
+
+    async def _send(self, method, path, data):
+        body = urlencode(data).encode() if data is not None else b''
+        headers = {
+            'Host': f'{self.host}:{self.port}',
+            'Connection': 'keep-alive',
+            'Content-Length': str(len(body)),
+        }
+        if data is not None:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            headers['X-CSRFToken'] = self.cookies.get('csrftoken', '')
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+        head = f'{method} {self.prefix}{path} HTTP/1.1\r\n' + ''.join(f'{k}: {v}\r\n' for k, v in headers.items())
+        self.writer.write(head.encode('latin-1') + b'\r\n' + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readuntil(b'\r\n')
+        parts = status_line.decode('latin-1').split(' ', 2)
+        if len(parts) < 2 or not parts[1].isdigit():
+            raise HttpError(f"Bad status line: {status_line!r}")
+        status = int(parts[1])
+        response_headers = {}
+        set_cookies = []
+        while True:
+            line = (await self.reader.readuntil(b'\r\n')).decode('latin-1').rstrip('\r\n')
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            name = name.strip().lower()
+            if name == 'set-cookie':
+                set_cookies.append(value.strip())
+            response_headers[name] = value.strip()
+        for header in set_cookies:
+            cookie = SimpleCookie()
+            cookie.load(header)
+            for name, morsel in cookie.items():
+                self.cookies[name] = morsel.value
+
+        if response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self.reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if not size:
+                    break
+                chunks.append(chunk[:-2])
+            response_body = b''.join(chunks)
+        elif 'content-length' in response_headers:
+            response_body = await self.reader.readexactly(int(response_headers['content-length']))
+        else:
+            response_body = await self.reader.read()
+            await self.close()
+        if response_headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, response_headers, response_body
+
+
+class Fixtures:
+    """Ids and search terms the scenarios draw from, read from the server's database"""
+
+    def __init__(self, renter_ids, vehicle_ids, search_terms, make_ids):
+        self.renter_ids = renter_ids
+        self.vehicle_ids = vehicle_ids
+        self.search_terms = search_terms or ['Karimov']
+        self.make_ids = make_ids
+        # Bookings made by this run's create_booking calls (targets of add_payment)
+        self.created_booking_ids = []
+
+    @classmethod
+    def load(cls, limit=5000):
+        renters = CustomUser.objects.filter(role='renter')
+        return cls(
+            renter_ids=list(renters.values_list('id', flat=True)[:limit]),
+            vehicle_ids=list(Vehicle.objects.filter(status='available').values_list('id', flat=True)[:limit]),
+            search_terms=list(renters.exclude(last_name='').values_list('last_name', flat=True).distinct()[:200]),
+            make_ids=list(Vehicle.objects.exclude(make=None).values_list('make_id', flat=True).distinct()[:50]),
+        )
+
+
+def scenario_request(name, rng, fixtures):
+    """(method, path, form data) of one scenario call"""
+    if name == 'browse':
+        # Filtrlangan ro'yxat qisqa bo'lishi mumkin: u faqat birinchi sahifada ko'riladi
+        if fixtures.make_ids and rng.random() < 0.5:
+            params = {'make': rng.choice(fixtures.make_ids)}
+        else:
+            pages = max(1, min(3, len(fixtures.vehicle_ids) // VehicleListView.paginate_by))
+            params = {'page': rng.randint(1, pages)}
+        return 'GET', f"{reverse('vehicle_list')}?{urlencode(params)}", None
+    if name == 'search':
+        params = {'search': rng.choice(fixtures.search_terms)}
+        if rng.random() < 0.3:
+            params['status'] = rng.choice(['pending', 'active', 'completed'])
+        return 'GET', f"{reverse('booking_list')}?{urlencode(params)}", None
+    if name == 'create_booking':
+        # Uzoq kelajakdagi tasodifiy oraliq: to'qnashuvlar kam, lekin bo'lsa ham forma 200 qaytaradi
+        start_at = datetime.now(dt_timezone.utc) + timedelta(days=rng.randint(400, 4000), hours=rng.randint(0, 23))
+        end_at = start_at + timedelta(hours=rng.randint(2, 48))
+        return 'POST', reverse('booking_create'), {
+            'renter': rng.choice(fixtures.renter_ids),
+            'vehicle': rng.choice(fixtures.vehicle_ids),
+            'start_at': start_at.strftime('%Y-%m-%dT%H:%M'),
+            'end_at': end_at.strftime('%Y-%m-%dT%H:%M'),
+            'deposit_amount': '0.00', 'total_price': '0.00',
+        }
+    if name == 'add_payment':
+        booking_id = rng.choice(fixtures.created_booking_ids)
+        return 'POST', reverse('update_payment_status', args=[booking_id]), {
+            'payment_status': rng.choice(['partial', 'paid']),
+        }
+    if name == 'dashboard':
+        return 'GET', reverse('dashboard'), None
+    raise ValueError(f"Unknown scenario: {name}")
+
+
+def available_scenarios(mix, fixtures):
+    """Drop the scenarios the data cannot support (nothing to book, so nothing to pay)"""
+    can_book = bool(fixtures.renter_ids and fixtures.vehicle_ids)
+    needs = {'create_booking': can_book, 'add_payment': can_book}
+    return {name: weight for name, weight in mix.items() if weight > 0 and needs.get(name, True)}
+
+
+def parse_mix(value):
+    """'browse=40,search=25' -> {'browse': 40.0, 'search': 25.0}"""
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario '{name}' (choose from {', '.join(SCENARIOS)})")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise ValueError(f"Bad weight for '{name}': {weight!r}")
+    return mix
+
+
+def mix_from_log(lines):
+    """Scenario weights from 'diagnostics.requests' JSON log lines (other lines are skipped)"""
+    by_url = {url_name: name for name, url_name in SCENARIOS.items()}
+    counts = Counter()
+    for line in lines:
+        start = line.find('{')
+        if start < 0:
+            continue
+        try:
+            stats = json.loads(line[start:])
+        except ValueError:
+            continue
+        if isinstance(stats, dict) and stats.get('url_name') in by_url:
+            counts[by_url[stats['url_name']]] += 1
+    return dict(counts)
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.errors = Counter()
+        self.requests = 0
+
+    def add(self, url_name, elapsed_ms, status=None, error=False):
+        self.requests += 1
+        self.latencies[url_name].append(elapsed_ms)
+        self.statuses[url_name][str(status) if status else 'error'] += 1
+        if error:
+            self.errors[url_name] += 1
+
+    def report(self, duration):
+        results = {}
+        for url_name, latencies in sorted(self.latencies.items()):
+            stats = summarize(latencies)
+            results[url_name] = {
+                'requests': stats['calls'],
+                'rps': round(stats['calls'] / duration, 2) if duration else 0,
+                **{name: round(stats[name], 2) for name in ('mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms')},
+                'errors': self.errors[url_name],
+                'error_rate': round(self.errors[url_name] / stats['calls'], 4),
+                'statuses': dict(self.statuses[url_name]),
+            }
+        return results
+
+
+def is_error(status, headers, login_path):
+    if status >= 400:
+        return True
+    # Sessiya yo'qolsa Django login sahifasiga yo'naltiradi
+    return status in (301, 302) and headers.get('location', '').startswith(login_path)
+
+
+async def login(client, username, password):
+    path = reverse('login')
+    await client.request('GET', path)
+    status, headers, _ = await client.request('POST', path, {
+        'username': username, 'password': password,
+        'csrfmiddlewaretoken': client.cookies.get('csrftoken', ''),
+    })
+    if status != 302 or 'sessionid' not in client.cookies:
+        raise HttpError(f"Login as '{username}' failed (HTTP {status})")
+
+
+def find_created_booking(data):
+    """Id of the booking a successful create_booking POST made"""
+    start_at = timezone.make_aware(datetime.strptime(data['start_at'], '%Y-%m-%dT%H:%M'))
+    return Booking.objects.filter(
+        renter_id=data['renter'], vehicle_id=data['vehicle'], start_at=start_at,
+    ).order_by('-id').values_list('id', flat=True).first()
+
+
+async def virtual_user(number, options, fixtures, recorder, deadline):
+    rng = random.Random(f"{options['seed']}:{number}")
+    names = list(options['mix'])
+    weights = [options['mix'][name] for name in names]
+    client = HttpClient(options['url'], options['timeout'])
+    try:
+        await login(client, options['username'], options['password'])
+        while time.perf_counter() < deadline:
+            if options['requests'] and recorder.requests >= options['requests']:
+                break
+            scenario = rng.choices(names, weights)[0]
+            if scenario == 'add_payment' and not fixtures.created_booking_ids:
+                # Hali to'lanadigan o'z broni yo'q: avval bron yaratamiz
+                scenario = 'create_booking'
+            method, path, data = scenario_request(scenario, rng, fixtures)
+            started = time.perf_counter()
+            try:
+                status, headers, _ = await client.request(method, path, data)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, HttpError):
+                recorder.add(SCENARIOS[scenario], (time.perf_counter() - started) * 1000, error=True)
+                await client.close()
+                continue
+            recorder.add(
+                SCENARIOS[scenario], (time.perf_counter() - started) * 1000, status,
+                is_error(status, headers, settings.LOGIN_URL),
+            )
+            if scenario == 'create_booking' and status == 302:
+                # Vaqt o'lchovidan tashqarida: bron id sini bazadan topamiz
+                booking_id = await sync_to_async(find_created_booking)(data)
+                if booking_id:
+                    fixtures.created_booking_ids.append(booking_id)
+            if options['think_time']:
+                await asyncio.sleep(rng.uniform(0, 2 * options['think_time']))
+    finally:
+        await client.close()
+
+
+async def run_load(options, fixtures):
+    """Run the virtual users; returns the results dict (saved as JSON by the command)"""
+    recorder = Recorder()
+    started = time.perf_counter()
+    deadline = started + options['duration']
+    users = [
+        virtual_user(number, options, fixtures, recorder, deadline)
+        for number in range(options['concurrency'])
+    ]
+    # Login xatosi butun testni to'xtatadi
+    await asyncio.gather(*users)
+    duration = time.perf_counter() - started
+    per_url = recorder.report(duration)
+    total_errors = sum(recorder.errors.values())
+    return {
+        'created_at': datetime.now(dt_timezone.utc).isoformat(timespec='seconds'),
+        'url': options['url'],
+        'concurrency': options['concurrency'],
+        'mix': options['mix'],
+        'duration_s': round(duration, 2),
+        'requests': recorder.requests,
+        'rps': round(recorder.requests / duration, 2) if duration else 0,
+        'error_rate': round(total_errors / recorder.requests, 4) if recorder.requests else 0,
+        'urls': per_url,
+    }
+
+
+def compare_runs(before, after, threshold):
+    """
+    Rows (url name, metric, before, after, change, regressed) for every URL
+    name in both runs. Latency regresses when p95 or p99 grew by more than
+    `threshold`, throughput when it fell by more than `threshold`, errors
+    when the error rate grew at all.
+    """
+    rows = []
+    for url_name in sorted(set(before['urls']) & set(after['urls'])):
+        old, new = before['urls'][url_name], after['urls'][url_name]
+        for metric in ('rps', 'p50_ms', 'p95_ms', 'p99_ms', 'error_rate'):
+            change = (new[metric] - old[metric]) / old[metric] if old[metric] else 0.0
+            if metric == 'rps':
+                regressed = change < -threshold
+            elif metric == 'error_rate':
+                regressed = new[metric] > old[metric]
+            else:
+                regressed = metric != 'p50_ms' and change > threshold
+            rows.append((url_name, metric, old[metric], new[metric], change, regressed))
+    return rows
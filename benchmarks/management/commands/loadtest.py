@@ -0,0 +1,166 @@
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from importlib.util import find_spec
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import CustomUser
+from benchmarks.loadtest import (
+    DEFAULT_MIX, SCENARIOS, Fixtures, HttpError, available_scenarios, compare_runs, mix_from_log,
+    parse_mix, run_load,
+)
+
+
+def mix_option(value):
+    try:
+        return parse_mix(value)
+    except ValueError as e:
+        raise CommandError(str(e))
+
+
+def server_command(port, workers):
+    """gunicorn when installed (as in production), the development server otherwise"""
+    if find_spec('gunicorn'):
+        return [
+            sys.executable, '-m', 'gunicorn', 'config.wsgi:application', '--workers', str(workers),
+            '--bind', f'127.0.0.1:{port}', '--chdir', str(settings.BASE_DIR),
+        ]
+    return [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'runserver', f'127.0.0.1:{port}', '--noreload']
+
+
+def wait_for_port(process, port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError(f"Server exited with code {process.returncode}")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError(f"Server did not start listening on port {port} in {timeout}s")
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test a running server with a weighted mix of scenarios (browse vehicle_list, search "
+        "booking_list, create booking, payment update, dashboard); or compare two saved runs. "
+        "create_booking writes to the server's database; add_payment only updates bookings the run created."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help="Server to test")
+        parser.add_argument('--start-server', action='store_true',
+                            help="Start gunicorn (or runserver) on --port with the current settings")
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--workers', type=int, default=2, help="gunicorn workers with --start-server")
+        parser.add_argument('--concurrency', type=int, default=10, help="Virtual users")
+        parser.add_argument('--duration', type=float, default=30, help="Seconds to run")
+        parser.add_argument('--requests', type=int, default=0, help="Stop after this many requests")
+        parser.add_argument('--mix', type=mix_option,
+                            help=f"Scenario weights, e.g. browse=40,search=25 (scenarios: {', '.join(SCENARIOS)})")
+        parser.add_argument('--mix-from-log', help="Take the weights from a diagnostics.requests log file")
+        parser.add_argument('--think-time', type=float, default=0, help="Mean pause between requests (s)")
+        parser.add_argument('--username', default='loadtest')
+        parser.add_argument('--password', default='loadtest')
+        parser.add_argument('--create-user', action='store_true',
+                            help="Create or reset the --username admin account before the run")
+        parser.add_argument('--timeout', type=float, default=30, help="Per-request timeout (s)")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help="Write the results as JSON to this file")
+        parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'),
+                            help="Compare two saved runs instead of running a test")
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help="Allowed latency growth / throughput drop in --compare (0.2 = 20%%)")
+
+    def handle(self, *args, **options):
+        if options['compare']:
+            return self.compare(*options['compare'], options['threshold'])
+        if options['concurrency'] < 1 or options['duration'] <= 0:
+            raise CommandError("--concurrency and --duration must be positive")
+
+        mix = options['mix'] or DEFAULT_MIX
+        if options['mix_from_log']:
+            with open(options['mix_from_log'], encoding='utf-8') as f:
+                mix = mix_from_log(f)
+            if not mix:
+                raise CommandError(f"No requests of the known scenarios in {options['mix_from_log']}")
+        fixtures = Fixtures.load()
+        options['mix'] = available_scenarios(mix, fixtures)
+        if not options['mix']:
+            raise CommandError("No scenario left to run (no vehicles, renters or bookings for the chosen mix)")
+        skipped = set(mix) - set(options['mix'])
+        if skipped:
+            self.stderr.write(f"Skipped for lack of data: {', '.join(sorted(skipped))}")
+
+        if options['create_user']:
+            user, _ = CustomUser.objects.get_or_create(username=options['username'], defaults={'role': 'admin'})
+            user.role = 'admin'
+            user.is_staff = True
+            user.set_password(options['password'])
+            user.save()
+
+        server = None
+        if options['start_server']:
+            options['url'] = f"http://127.0.0.1:{options['port']}"
+            server = subprocess.Popen(
+                server_command(options['port'], options['workers']), env=os.environ.copy(),
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+        try:
+            if server:
+                wait_for_port(server, options['port'])
+            self.stdout.write(
+                f"{options['concurrency']} virtual users against {options['url']} for {options['duration']:g}s, "
+                f"mix {json.dumps(options['mix'])}"
+            )
+            try:
+                results = asyncio.run(run_load(options, fixtures))
+            except (OSError, HttpError) as e:
+                raise CommandError(f"Load test failed: {e}")
+        finally:
+            if server:
+                server.terminate()
+                server.wait(10)
+
+        self.report(results)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+                f.write('\n')
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def report(self, results):
+        self.stdout.write(f"{'url name':<24}{'requests':>9}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'errors':>9}")
+        for url_name, stats in results['urls'].items():
+            self.stdout.write(
+                f"{url_name:<24}{stats['requests']:>9}{stats['rps']:>9.1f}{stats['p50_ms']:>7.1f}ms"
+                f"{stats['p95_ms']:>7.1f}ms{stats['p99_ms']:>7.1f}ms{stats['error_rate']:>9.1%}"
+            )
+        self.stdout.write(
+            f"Total: {results['requests']} requests in {results['duration_s']}s, "
+            f"{results['rps']} req/s, {results['error_rate']:.1%} errors"
+        )
+
+    def compare(self, before_path, after_path, threshold):
+        try:
+            with open(before_path, encoding='utf-8') as f:
+                before = json.load(f)
+            with open(after_path, encoding='utf-8') as f:
+                after = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        rows = compare_runs(before, after, threshold)
+        for url_name, metric, old, new, change, regressed in rows:
+            flag = '  REGRESSION' if regressed else ''
+            self.stdout.write(f"{url_name:<24}{metric:<11}{old:>10g} -> {new:<10g}{change:>+8.1%}{flag}")
+        regressions = sum(1 for row in rows if row[-1])
+        if regressions:
+            raise CommandError(f"{regressions} regression(s) between the runs")
+        self.stdout.write(self.style.SUCCESS(f"No regressions ({threshold:.0%} threshold)"))
@@ -0,0 +1,88 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from bookings.bench import Rollback
+from benchmarks.runner import compare_results, grow_dataset, load_results, new_results, run_size, save_results
+
+
+def parse_sizes(value):
+    try:
+        sizes = sorted({int(size.replace('_', '')) for size in value.split(',') if size.strip()})
+    except ValueError:
+        raise CommandError(f"Noto'g'ri o'lchamlar: {value} (masalan 1000,10000,100000)")
+    if not sizes or sizes[0] < 1:
+        raise CommandError("Sizes must be positive booking counts")
+    return sizes
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the hot paths (availability, pricing, earnings summaries, list views, dashboard) "
+        "against seeded data sets of increasing size and compare with a saved baseline"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=parse_sizes, default=[1000, 10000, 100000],
+                            help="Booking counts to benchmark at, seeded in a rolled back transaction")
+        parser.add_argument('--existing', action='store_true',
+                            help="Benchmark the data already in the database, seed nothing")
+        parser.add_argument('--calls', type=int, default=50, help="Timed calls per case")
+        parser.add_argument('--case', action='append', dest='cases', help="Only run this case (repeatable)")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help="Write the results as JSON to this file")
+        parser.add_argument('--compare', help="Baseline results JSON to check for regressions")
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help="Allowed timing growth against the baseline (0.2 = 20%%)")
+
+    def handle(self, *args, **options):
+        if options['calls'] < 1:
+            raise CommandError("--calls must be positive")
+        baseline = None
+        if options['compare']:
+            try:
+                baseline = load_results(options['compare'])
+            except (OSError, ValueError) as e:
+                raise CommandError(str(e))
+
+        results = new_results(options['calls'])
+        try:
+            with transaction.atomic():
+                if options['existing']:
+                    self.run(results, 'existing', options)
+                else:
+                    for step, size in enumerate(options['sizes']):
+                        seeded = grow_dataset(size, step, options['seed'])
+                        if seeded:
+                            self.stdout.write(f"Seeded {seeded:,} bookings")
+                        self.run(results, str(size), options)
+                raise Rollback
+        except Rollback:
+            pass
+
+        if options['output']:
+            save_results(results, options['output'])
+            self.stdout.write(f"Results written to {options['output']}")
+        if baseline:
+            self.check_regressions(baseline, results, options['threshold'])
+
+    def run(self, results, size, options):
+        self.stdout.write(f"-- {size}")
+        run = run_size(options['calls'], options['cases'], self.log_case)
+        if not run['cases']:
+            self.stderr.write("Nothing to benchmark: no available vehicles or bookings")
+        self.stdout.write(f"   {run['bookings']:,} bookings, {run['vehicles']:,} vehicles")
+        results['runs'].append({'size': size, **run})
+
+    def log_case(self, name, stats):
+        self.stdout.write(
+            f"{name:<30} p50={stats['p50_ms']:.2f}ms p95={stats['p95_ms']:.2f}ms "
+            f"p99={stats['p99_ms']:.2f}ms queries={stats['queries']:g} peak={stats['peak_kb']:.0f}KB"
+        )
+
+    def check_regressions(self, baseline, results, threshold):
+        regressions = compare_results(baseline, results, threshold)
+        for size, name, metric, before, after in regressions:
+            self.stderr.write(f"REGRESSION {size} {name}: {metric} {before:g} -> {after:g}")
+        if regressions:
+            raise CommandError(f"{len(regressions)} regression(s) against the baseline")
+        self.stdout.write(self.style.SUCCESS(f"No regressions against the baseline ({threshold:.0%} threshold)"))
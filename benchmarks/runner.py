@@ -0,0 +1,161 @@
+"""
+Benchmark runner: data sets, measurement and result comparison
+
+Sizes are booking counts. The data set grows step by step inside the
+caller's transaction: each step seeds only the bookings missing up to the
+next size with the synthetic fleet generator (vehicles, owners and renters
+scale with it), and every case is measured at every size.
+
+Per case the runner records latency percentiles over the timed calls, the
+number of SQL queries per call (counted with the diagnostics
+QueryRecorder, after one untimed warm-up call per argument tuple fills the
+in-memory indexes) and the peak Python memory of one extra call under
+tracemalloc, kept out of the timed calls because tracing slows them down.
+"""
+import json
+import platform
+import subprocess
+import tracemalloc
+from datetime import datetime, timezone as dt_timezone
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from accounts.dashboard import DASHBOARD_STATS_KEY
+from bookings.availability import availability_index
+from bookings.bench import summarize, time_calls
+from bookings.models import Booking
+from bookings.seeding import SeedPlan, prepare, seed_shard
+from contracts.timeline import contract_timelines
+from diagnostics.middleware import QueryRecorder
+from vehicles.models import Vehicle
+from .cases import build_cases
+
+RESULTS_VERSION = 1
+# Timing changes smaller than this are noise, whatever the percentage
+NOISE_FLOOR_MS = 0.5
+COMPARED_METRICS = ('p50_ms', 'p95_ms')
+
+
+def grow_dataset(target, step, seed=42):
+    """Seed synthetic bookings until the database holds `target` of them; returns the seeded count"""
+    missing = target - Booking.objects.count()
+    if missing <= 0:
+        return 0
+    vehicles = max(5, missing // 100)
+    plan = SeedPlan(
+        owners=max(1, vehicles // 10), renters=max(5, missing // 20), vehicles=vehicles,
+        bookings=missing, seed=seed + step, prefix=f'bench{step}',
+    )
+    prepare(plan)
+    seed_shard(plan, 0)
+    # Yozuvlar signalsiz kiritildi: xotiradagi indekslar va dashboard keshi tozalanadi
+    availability_index.clear()
+    contract_timelines.clear()
+    cache.delete(DASHBOARD_STATS_KEY)
+    return missing
+
+
+def measure(case, calls):
+    arguments = case.call_args(calls)
+    # Har bir argument bir marta o'lchovsiz chaqiriladi: keshlar isiydi, barqaror holat o'lchanadi
+    for args in case.arguments:
+        case.func(*args)
+
+    recorder = QueryRecorder()
+    with connection.execute_wrapper(recorder):
+        timings = time_calls(case.func, arguments)
+    stats = summarize(timings)
+
+    tracemalloc.start()
+    try:
+        case.func(*arguments[0])
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    stats = {name: round(value, 4) if isinstance(value, float) else value for name, value in stats.items()}
+    stats['queries'] = round(recorder.count / calls, 2)
+    stats['peak_kb'] = round(peak / 1024, 1)
+    return stats
+
+
+def run_size(calls, only=None, log=None):
+    """Measure every case against the current data; returns one result entry"""
+    cases = [case for case in build_cases() if not only or case.name in only]
+    results = {}
+    for case in cases:
+        results[case.name] = measure(case, calls)
+        if log:
+            log(case.name, results[case.name])
+    return {
+        'bookings': Booking.objects.count(),
+        'vehicles': Vehicle.objects.count(),
+        'cases': results,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def new_results(calls):
+    return {
+        'version': RESULTS_VERSION,
+        'created_at': datetime.now(dt_timezone.utc).isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.display_name,
+        'machine': platform.platform(),
+        'calls': calls,
+        'runs': [],
+    }
+
+
+def save_results(results, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+
+
+def load_results(path):
+    with open(path, encoding='utf-8') as f:
+        results = json.load(f)
+    if results.get('version') != RESULTS_VERSION:
+        raise ValueError(f"{path}: unsupported results version {results.get('version')}")
+    return results
+
+
+def compare_results(baseline, current, threshold):
+    """
+    Regressions of `current` against `baseline` as (size, case, metric,
+    before, after) tuples. Runs are matched by their size label and cases by
+    name; a timing regresses when it grew by more than `threshold` (0.2 =
+    20%) and by more than NOISE_FLOOR_MS, the query count whenever it grew
+    at all.
+    """
+    before_runs = {run['size']: run['cases'] for run in baseline['runs']}
+    regressions = []
+    for run in current['runs']:
+        before_cases = before_runs.get(run['size'], {})
+        for name, after in run['cases'].items():
+            before = before_cases.get(name)
+            if before is None:
+                continue
+            if after['queries'] > before['queries']:
+                regressions.append((run['size'], name, 'queries', before['queries'], after['queries']))
+            for metric in COMPARED_METRICS:
+                if after[metric] - before[metric] < NOISE_FLOOR_MS:
+                    continue
+                if after[metric] > before[metric] * (1 + threshold):
+                    regressions.append((run['size'], name, metric, before[metric], after[metric]))
+    return regressions
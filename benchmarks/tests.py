@@ -0,0 +1,168 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import LiveServerTestCase, TestCase
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from bookings.models import Booking
+from vehicles.models import CarMake, CarModel, Vehicle
+from .cases import build_cases
+from .loadtest import compare_runs, mix_from_log, parse_mix
+from .runner import compare_results
+
+
+def results_with(cases, size='1000'):
+    return {'version': 1, 'runs': [{'size': size, 'cases': cases}]}
+
+
+def stats(p50, queries=2):
+    return {'p50_ms': p50, 'p95_ms': p50 * 2, 'queries': queries}
+
+
+class CompareResultsTests(TestCase):
+    def test_timing_over_threshold(self):
+        baseline = results_with({'dashboard': stats(10), 'get_available_vehicles': stats(10)})
+        current = results_with({'dashboard': stats(11.5), 'get_available_vehicles': stats(13)})
+        regressions = compare_results(baseline, current, threshold=0.2)
+        self.assertEqual(
+            [(name, metric) for _, name, metric, _, _ in regressions],
+            [('get_available_vehicles', 'p50_ms'), ('get_available_vehicles', 'p95_ms')],
+        )
+
+    def test_small_absolute_changes_are_noise(self):
+        regressions = compare_results(results_with({'price': stats(0.01)}), results_with({'price': stats(0.1)}), 0.2)
+        self.assertEqual(regressions, [])
+
+    def test_any_extra_query_regresses(self):
+        regressions = compare_results(
+            results_with({'dashboard': stats(10, queries=5)}), results_with({'dashboard': stats(10, queries=6)}), 0.2
+        )
+        self.assertEqual(regressions, [('1000', 'dashboard', 'queries', 5, 6)])
+
+    def test_unmatched_sizes_and_cases_are_skipped(self):
+        baseline = results_with({'dashboard': stats(1)}, size='1000')
+        current = results_with({'dashboard': stats(100), 'new case': stats(100)}, size='10000')
+        self.assertEqual(compare_results(baseline, current, 0.2), [])
+
+
+class RunBenchmarksTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.directory.name, 'results.json')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command('run_benchmarks', '--sizes', '200,400', '--calls', '2', *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_results_cover_every_case_and_data_is_rolled_back(self):
+        self.assertEqual(build_cases(), [])
+        self.run_command('--output', self.output)
+        self.assertEqual(Booking.objects.count(), 0)
+
+        with open(self.output) as f:
+            results = json.load(f)
+        self.assertEqual([run['size'] for run in results['runs']], ['200', '400'])
+        self.assertEqual([run['bookings'] for run in results['runs']], [200, 400])
+        cases = results['runs'][1]['cases']
+        self.assertEqual(len(cases), 11)
+        for name in ('get_available_vehicles', 'Booking.calculate_earnings', 'BookingListView search', 'dashboard'):
+            self.assertIn(name, cases)
+        self.assertEqual(
+            sorted(cases['dashboard']),
+            ['calls', 'max_ms', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'peak_kb', 'queries', 'total_ms'],
+        )
+        self.assertEqual(cases['get_company_earnings_summary']['queries'], 3)
+
+    def test_regression_against_baseline_fails(self):
+        baseline = results_with({'get_company_earnings_summary': stats(1000, queries=0)}, size='400')
+        with open(self.output, 'w') as f:
+            json.dump(baseline, f)
+        with self.assertRaisesMessage(CommandError, '1 regression(s) against the baseline'):
+            self.run_command('--compare', self.output, '--case', 'get_company_earnings_summary')
+
+    def test_invalid_sizes(self):
+        with self.assertRaises(CommandError):
+            call_command('run_benchmarks', '--sizes', 'abc', stdout=StringIO())
+
+
+class LoadTestMixTests(TestCase):
+    def test_parse_mix(self):
+        self.assertEqual(parse_mix('browse=3,dashboard=1'), {'browse': 3.0, 'dashboard': 1.0})
+        with self.assertRaisesMessage(ValueError, "Unknown scenario 'checkout'"):
+            parse_mix('checkout=1')
+
+    def test_mix_from_diagnostics_log(self):
+        lines = [
+            'INFO diagnostics.requests {"url_name": "vehicle_list", "queries": 4}',
+            '{"url_name": "vehicle_list"}',
+            '{"url_name": "booking_create"}',
+            '{"url_name": "login"}',
+            'not json',
+        ]
+        self.assertEqual(mix_from_log(lines), {'browse': 2, 'create_booking': 1})
+
+    def test_compare_runs(self):
+        def run(rps, p95, error_rate=0):
+            return {'urls': {'vehicle_list': {
+                'rps': rps, 'p50_ms': 10, 'p95_ms': p95, 'p99_ms': p95, 'error_rate': error_rate,
+            }}}
+        regressed = {
+            metric for _, metric, _, _, _, flag in compare_runs(run(100, 20), run(70, 30, 0.01), 0.2) if flag
+        }
+        self.assertEqual(regressed, {'rps', 'p95_ms', 'p99_ms', 'error_rate'})
+        self.assertFalse(any(row[-1] for row in compare_runs(run(100, 20), run(90, 23), 0.2)))
+
+
+class LoadTestLiveServerTests(LiveServerTestCase):
+    def setUp(self):
+        make = CarMake.objects.create(name='Chevrolet')
+        model = CarModel.objects.create(make=make, name='Cobalt')
+        owner = CustomUser.objects.create_user('owner', password='x', role='owner')
+        renter = CustomUser.objects.create_user('mijoz', password='x', role='renter', last_name='Karimov')
+        for i in range(3):
+            vehicle = Vehicle.objects.create(
+                owner=owner, make=make, model=model, plate_number=f'10 A {i:03d} BC', daily_price=100,
+            )
+        start = timezone.now() - timedelta(days=3)
+        self.existing = Booking.objects.create(
+            renter=renter, vehicle=vehicle, start_at=start, end_at=start + timedelta(hours=5),
+        )
+        # Shartnomasiz mashinalar 'inactive' bo'ladi; yuklama testi uchun bron qilinadigan qilamiz
+        Vehicle.objects.update(status='available')
+
+    def test_every_scenario_against_live_server(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        output = os.path.join(directory.name, 'run.json')
+        mix = 'browse=1,search=1,create_booking=1,add_payment=1,dashboard=1'
+        # Live server threads share one in-memory SQLite connection: one virtual user at a time
+        call_command(
+            'loadtest', '--url', self.live_server_url, '--create-user', '--concurrency', '1',
+            '--duration', '10', '--requests', '40', '--mix', mix, '--output', output,
+            stdout=StringIO(), stderr=StringIO(),
+        )
+        with open(output) as f:
+            results = json.load(f)
+        self.assertGreaterEqual(results['requests'], 40)
+        self.assertEqual(results['error_rate'], 0, results['urls'])
+        self.assertEqual(
+            set(results['urls']),
+            {'vehicle_list', 'booking_list', 'booking_create', 'update_payment_status', 'dashboard'},
+        )
+        self.assertEqual(set(results['urls']['booking_create']['statuses']), {'302'})
+        self.assertTrue(Booking.objects.filter(status='pending').exists())
+        # The payment scenario only touched bookings the run created
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.payment_status, 'unpaid')
+        self.assertTrue(Booking.objects.exclude(payment_status='unpaid').exists())
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Booking
+from .models import Booking, DailyEarnings
 from .payment_models import Payment
 
 @admin.register(Payment)
@@ -16,7 +16,7 @@ class BookingAdmin(admin.ModelAdmin):
     list_filter = ('status', 'payment_status', 'start_at', 'created_at')
     search_fields = ('vehicle__name', 'vehicle__plate_number', 'renter__username', 'renter__first_name', 'renter__last_name')
     ordering = ('-created_at',)
-    readonly_fields = ('created_at', 'updated_at', 'total_price', 'owner_earned', 'company_earned')
+    readonly_fields = ('created_at', 'updated_at', 'total_price', 'owner_earned', 'company_earned', 'payment_status', 'paid_amount')
     
     fieldsets = (
         ('Booking Information', {
@@ -33,3 +33,12 @@ class BookingAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+
+@admin.register(DailyEarnings)
+class DailyEarningsAdmin(admin.ModelAdmin):
+    list_display = ('day', 'vehicle', 'owner', 'total_earnings', 'owner_earnings', 'company_earnings', 'booking_count')
+    list_filter = ('day',)
+    search_fields = ('vehicle__plate_number', 'owner__username')
+    date_hierarchy = 'day'
+    readonly_fields = ('vehicle', 'owner', 'day', 'total_earnings', 'owner_earnings', 'company_earnings', 'booking_count', 'updated_at')
+
@@ -0,0 +1,307 @@
+"""
+In-memory interval index for vehicle availability checks
+"""
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time as datetime_time
+
+from django.conf import settings
+from django.utils import timezone
+
+from diagnostics.metrics import AVAILABILITY_CHECK, record_cache
+
+BLOCKING_STATUSES = ('pending', 'active')
+LOAD_ATTEMPTS = 3
+IS_FREE_TIMER = AVAILABILITY_CHECK.labels(operation='is_free')
+BUSY_VEHICLES_TIMER = AVAILABILITY_CHECK.labels(operation='busy_vehicle_ids')
+
+
+def as_datetime(value):
+    """Bring dates and naive datetimes to the form stored in the database"""
+    if not isinstance(value, datetime) and isinstance(value, date):
+        value = datetime.combine(value, datetime_time.min)
+    if settings.USE_TZ and timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+class VehicleIntervals:
+    """Sorted pending/active booking intervals of a single vehicle"""
+
+    __slots__ = ('starts', 'ends', 'ids', 'max_ends', 'loaded_at')
+
+    def __init__(self, rows=(), loaded_at=None):
+        rows = sorted(rows)
+        self.starts = [row[0] for row in rows]
+        self.ends = [row[1] for row in rows]
+        self.ids = [row[2] for row in rows]
+        self.loaded_at = loaded_at if loaded_at is not None else time.monotonic()
+        self._rebuild_max_ends()
+
+    def _rebuild_max_ends(self):
+        # max_ends[i] - 0..i oraliqlar ichidagi eng kech tugash vaqti
+        self.max_ends = []
+        current = None
+        for end in self.ends:
+            if current is None or end > current:
+                current = end
+            self.max_ends.append(current)
+
+    def add(self, start, end, booking_id):
+        position = bisect_right(self.starts, start)
+        self.starts.insert(position, start)
+        self.ends.insert(position, end)
+        self.ids.insert(position, booking_id)
+        self._rebuild_max_ends()
+
+    def remove(self, booking_id):
+        try:
+            position = self.ids.index(booking_id)
+        except ValueError:
+            return
+        del self.starts[position]
+        del self.ends[position]
+        del self.ids[position]
+        self._rebuild_max_ends()
+
+    def conflicts(self, start, end, exclude_booking_id=None):
+        """Return True if any interval overlaps [start, end)"""
+        # Faqat start < end bo'lgan oraliqlar to'qnashishi mumkin
+        position = bisect_left(self.starts, end) - 1
+        while position >= 0 and self.max_ends[position] > start:
+            if self.ends[position] > start and self.ids[position] != exclude_booking_id:
+                return True
+            position -= 1
+        return False
+
+
+class AvailabilityIndex:
+    """
+    Process-local, lazily loaded index of pending/active bookings per vehicle.
+
+    Vehicles are loaded on first use and kept up to date from Booking
+    post_save/post_delete signals. Entries older than
+    AVAILABILITY_INDEX_TTL seconds are reloaded, which bounds staleness
+    caused by writes made in other processes or through queryset.update().
+
+    Each vehicle has a generation counter bumped by every update; a load
+    whose vehicle changed while its query ran may have missed that booking,
+    so the vehicle is queried again instead of installing the old snapshot.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._vehicles = {}
+        self._booking_vehicle = {}
+        self._generations = {}
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'AVAILABILITY_INDEX_TTL', 30)
+
+    def clear(self):
+        with self._lock:
+            self._vehicles.clear()
+            self._booking_vehicle.clear()
+
+    def _is_fresh(self, intervals, now):
+        return intervals is not None and now - intervals.loaded_at < self.ttl
+
+    def load(self, vehicle_ids):
+        """
+        Return {vehicle_id: VehicleIntervals} for the given vehicles,
+        loading the missing or expired ones with a single query (repeated
+        for vehicles updated while it ran)
+        """
+        vehicle_ids = set(vehicle_ids)
+        now = time.monotonic()
+        with self._lock:
+            loaded = {
+                vehicle_id: self._vehicles.get(vehicle_id) for vehicle_id in vehicle_ids
+            }
+        missing = [
+            vehicle_id for vehicle_id, intervals in loaded.items()
+            if not self._is_fresh(intervals, now)
+        ]
+        record_cache('availability_index', len(loaded) - len(missing), len(missing))
+        if not missing:
+            return loaded
+
+        for _ in range(LOAD_ATTEMPTS):
+            with self._lock:
+                generations = {vehicle_id: self._generations.get(vehicle_id, 0) for vehicle_id in missing}
+            rows = self._query(missing)
+            with self._lock:
+                changed = [
+                    vehicle_id for vehicle_id in missing
+                    if self._generations.get(vehicle_id, 0) != generations[vehicle_id]
+                ]
+                # So'rov paytida o'zgargan mashina qayta o'qiladi; oxirgi
+                # urinishdan keyin ham o'zgargan bo'lsa, indeksga yozilmaydi
+                for vehicle_id, vehicle_rows in rows.items():
+                    intervals = loaded[vehicle_id] = VehicleIntervals(vehicle_rows, loaded_at=now)
+                    if vehicle_id not in changed:
+                        self._install(vehicle_id, intervals)
+            if not changed:
+                break
+            missing = changed
+        return loaded
+
+    def _query(self, vehicle_ids):
+        """{vehicle_id: [(start_at, end_at, booking_id)]} of pending/active bookings"""
+        from .models import Booking
+
+        rows = {vehicle_id: [] for vehicle_id in vehicle_ids}
+        bookings = Booking.objects.filter(status__in=BLOCKING_STATUSES)
+        if len(vehicle_ids) <= 500:
+            bookings = bookings.filter(vehicle_id__in=vehicle_ids)
+        for booking_id, vehicle_id, start_at, end_at in bookings.values_list(
+            'id', 'vehicle_id', 'start_at', 'end_at'
+        ).order_by():
+            if vehicle_id in rows:
+                rows[vehicle_id].append((start_at, end_at, booking_id))
+        return rows
+
+    def _install(self, vehicle_id, intervals):
+        old = self._vehicles.get(vehicle_id)
+        if old is not None:
+            for booking_id in old.ids:
+                self._booking_vehicle.pop(booking_id, None)
+        self._vehicles[vehicle_id] = intervals
+        for booking_id in intervals.ids:
+            self._booking_vehicle[booking_id] = vehicle_id
+
+    def is_free(self, vehicle_id, start, end, exclude_booking_id=None):
+        with IS_FREE_TIMER.time():
+            start, end = as_datetime(start), as_datetime(end)
+            intervals = self.load([vehicle_id])[vehicle_id]
+            with self._lock:
+                return not intervals.conflicts(start, end, exclude_booking_id)
+
+    def busy_vehicle_ids(self, vehicle_ids, start, end, exclude_booking_id=None):
+        """Return the subset of vehicle_ids that have a conflicting booking in [start, end)"""
+        with BUSY_VEHICLES_TIMER.time():
+            start, end = as_datetime(start), as_datetime(end)
+            loaded = self.load(vehicle_ids)
+            with self._lock:
+                return {
+                    vehicle_id for vehicle_id, intervals in loaded.items()
+                    if intervals.conflicts(start, end, exclude_booking_id)
+                }
+
+    def update_booking(self, booking_id, vehicle_id, status, start_at, end_at):
+        """Apply a committed booking to the index"""
+        with self._lock:
+            self._discard(booking_id)
+            self._bump(vehicle_id)
+            intervals = self._vehicles.get(vehicle_id)
+            if intervals is not None and status in BLOCKING_STATUSES:
+                intervals.add(start_at, end_at, booking_id)
+                self._booking_vehicle[booking_id] = vehicle_id
+
+    def remove_booking(self, booking_id):
+        with self._lock:
+            self._discard(booking_id)
+
+    def _discard(self, booking_id):
+        vehicle_id = self._booking_vehicle.pop(booking_id, None)
+        if vehicle_id is not None:
+            self._bump(vehicle_id)
+            if vehicle_id in self._vehicles:
+                self._vehicles[vehicle_id].remove(booking_id)
+
+    def _bump(self, vehicle_id):
+        self._generations[vehicle_id] = self._generations.get(vehicle_id, 0) + 1
+
+
+availability_index = AvailabilityIndex()
+
+
+# Availability matrix cell states
+SLOT_FREE = 0
+SLOT_BOOKED = 1
+SLOT_UNAVAILABLE = 2
+
+
+def _merge_ranges(ranges):
+    """Merge overlapping or touching [first, last) slot ranges"""
+    merged = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1]:
+            if last > merged[-1][1]:
+                merged[-1][1] = last
+        else:
+            merged.append([first, last])
+    return merged
+
+
+def encode_rle(ranges, slot_count, state=SLOT_BOOKED):
+    """Encode merged ranges as a flat [state, length, state, length, ...] list"""
+    row = []
+    position = 0
+    for first, last in ranges:
+        if first > position:
+            row.extend((SLOT_FREE, first - position))
+        row.extend((state, last - first))
+        position = last
+    if position < slot_count:
+        row.extend((SLOT_FREE, slot_count - position))
+    return row
+
+
+def encode_bitset(ranges):
+    """Encode merged ranges as a hex string, bit i set when slot i is blocked"""
+    bits = 0
+    for first, last in ranges:
+        bits |= ((1 << (last - first)) - 1) << first
+    return format(bits, 'x')
+
+
+def build_availability_matrix(vehicles, window_start, slot_size, slot_count, encoding='rle'):
+    """
+    Build a vehicles x time slots availability grid.
+
+    All pending/active bookings overlapping the window are read with one
+    query; vehicles whose status is not 'available' are blocked for the
+    whole window. Rows are returned run-length ('rle') or bitset encoded.
+    """
+    from .models import Booking
+
+    window_end = window_start + slot_size * slot_count
+    slot_seconds = int(slot_size.total_seconds())
+
+    ranges = {}
+    bookings = Booking.objects.filter(
+        status__in=BLOCKING_STATUSES,
+        start_at__lt=window_end,
+        end_at__gt=window_start,
+    )
+    if vehicles.query.where:
+        bookings = bookings.filter(vehicle__in=vehicles.values('id'))
+    for vehicle_id, start_at, end_at in bookings.values_list(
+        'vehicle_id', 'start_at', 'end_at'
+    ).order_by():
+        first = max(0, int((start_at - window_start).total_seconds()) // slot_seconds)
+        last = min(slot_count, -(-int((end_at - window_start).total_seconds()) // slot_seconds))
+        ranges.setdefault(vehicle_id, []).append((first, last))
+
+    rows = []
+    for vehicle_id, plate_number, status in vehicles.values_list('id', 'plate_number', 'status'):
+        if status != 'available':
+            merged = [[0, slot_count]] if slot_count else []
+            state = SLOT_UNAVAILABLE
+        else:
+            merged = _merge_ranges(ranges.get(vehicle_id, ()))
+            state = SLOT_BOOKED
+        if encoding == 'bitset':
+            row = encode_bitset(merged)
+        else:
+            row = encode_rle(merged, slot_count, state)
+        rows.append({
+            'id': vehicle_id,
+            'plate_number': plate_number,
+            'status': status,
+            'row': row,
+        })
+    return rows
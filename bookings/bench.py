@@ -0,0 +1,119 @@
+"""
+Helpers shared by the benchmark management commands
+"""
+import random
+import statistics
+import string
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from vehicles.models import Vehicle
+from .models import Booking
+
+
+class Rollback(Exception):
+    """Raised to roll back the seeded benchmark data"""
+
+
+def plate_for(number):
+    """Build a unique, valid plate number ('12 A 345 BC') from an integer"""
+    letters = string.ascii_uppercase
+    number, tail = divmod(number, 26 * 26)
+    number, middle = divmod(number, 1000)
+    number, letter = divmod(number, 26)
+    region = number % 100
+    return f"{region:02d} {letters[letter]} {middle:03d} {letters[tail // 26]}{letters[tail % 26]}"
+
+
+def seed_bookings(vehicle_count, booking_count, seed=42, days=365, batch_size=5000):
+    """
+    Bulk-create one owner, one renter, vehicle_count vehicles and
+    booking_count bookings spread over the last `days` days.
+
+    Signals are not fired, so callers should clear any in-memory index
+    afterwards. Returns the list of created vehicle ids.
+    """
+    rng = random.Random(seed)
+    password = make_password(None)
+    owner = CustomUser.objects.create(username=f'bench_owner_{seed}', role='owner', password=password)
+    renter = CustomUser.objects.create(username=f'bench_renter_{seed}', role='renter', password=password)
+
+    offset = Vehicle.objects.count()
+    vehicles = Vehicle.objects.bulk_create(
+        [
+            Vehicle(
+                owner=owner,
+                plate_number=plate_for(offset + i),
+                daily_price=Decimal('300000.00'),
+                hourly_price=Decimal('20000.00'),
+                status='available',
+            )
+            for i in range(vehicle_count)
+        ],
+        batch_size=batch_size,
+    )
+    vehicle_ids = [vehicle.pk for vehicle in vehicles]
+
+    now = timezone.now()
+    window_start = now - timedelta(days=days)
+    statuses = ['completed'] * 14 + ['cancelled'] * 3 + ['pending'] * 2 + ['active']
+    batch = []
+    for _ in range(booking_count):
+        start_at = window_start + timedelta(hours=rng.randrange(days * 24 + 24 * 30))
+        end_at = start_at + timedelta(hours=rng.randint(2, 24 * 7))
+        total = Decimal(rng.randint(100, 3000) * 1000)
+        batch.append(Booking(
+            renter=renter,
+            vehicle_id=rng.choice(vehicle_ids),
+            start_at=start_at,
+            end_at=end_at,
+            status=rng.choice(statuses),
+            total_price=total,
+            owner_earned=total * Decimal('0.80'),
+            company_earned=total * Decimal('0.20'),
+        ))
+        if len(batch) >= batch_size:
+            Booking.objects.bulk_create(batch, batch_size=batch_size)
+            batch = []
+    if batch:
+        Booking.objects.bulk_create(batch, batch_size=batch_size)
+    return vehicle_ids
+
+
+def random_windows(count, seed=7, days=365):
+    """Random [start, end) windows inside the seeded period"""
+    rng = random.Random(seed)
+    window_start = timezone.now() - timedelta(days=days)
+    windows = []
+    for _ in range(count):
+        start_at = window_start + timedelta(hours=rng.randrange(days * 24))
+        windows.append((start_at, start_at + timedelta(hours=rng.randint(1, 24 * 3))))
+    return windows
+
+
+def time_calls(func, arguments):
+    """Call func(*args) for every args tuple and return per-call timings in milliseconds"""
+    timings = []
+    for args in arguments:
+        started = time.perf_counter()
+        func(*args)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def summarize(timings):
+    ordered = sorted(timings)
+    return {
+        'calls': len(ordered),
+        'mean_ms': statistics.fmean(ordered),
+        'p50_ms': ordered[len(ordered) // 2],
+        'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        'p99_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+        'max_ms': ordered[-1],
+        'total_ms': sum(ordered),
+    }
@@ -0,0 +1,181 @@
+"""
+Incremental maintenance of the DailyEarnings rollup
+
+A completed booking contributes its total_price, owner_earned and
+company_earned to the (vehicle, owner, day) row of the local date of its
+end_at. The contribution a booking had when it was loaded is remembered
+on the instance; after every save the difference to the new contribution
+is applied with F() updates, and a deleted booking subtracts what it had.
+
+Rows are keyed by the vehicle's owner; when a vehicle changes owner its
+rows are rebuilt for the new owner (vehicles.signals, import_fleet).
+
+Writes that bypass Model.save (QuerySet.update, bulk_update, raw SQL)
+are not seen here; rebuild_daily_earnings recomputes the rollup for such
+cases (see the backfill_daily_earnings command).
+"""
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+logger = logging.getLogger('bookings.earnings')
+
+ZERO = Decimal("0.00")
+ROLLUP_FIELDS = ('status', 'vehicle_id', 'end_at', 'total_price', 'owner_earned', 'company_earned')
+# Placeholder for instances loaded with some of ROLLUP_FIELDS deferred
+UNKNOWN = object()
+
+
+def rollup_state(booking):
+    """What the booking contributes to the rollup: (vehicle_id, day, total, owner, company) or None"""
+    if booking.status != 'completed' or booking.vehicle_id is None or booking.end_at is None:
+        return None
+    return (
+        booking.vehicle_id,
+        timezone.localdate(booking.end_at),
+        booking.total_price or ZERO,
+        booking.owner_earned or ZERO,
+        booking.company_earned or ZERO,
+    )
+
+
+def remember_rollup_state(booking, field_names=ROLLUP_FIELDS):
+    if all(name in field_names for name in ROLLUP_FIELDS):
+        booking._rollup_state = rollup_state(booking)
+    else:
+        booking._rollup_state = UNKNOWN
+
+
+def load_rollup_state(booking, using):
+    """Contribution stored in the database before the pending save"""
+    from .models import Booking
+
+    state = getattr(booking, '_rollup_state', UNKNOWN if booking.pk else None)
+    if state is not UNKNOWN:
+        return state
+    stored = Booking.objects.using(using).filter(pk=booking.pk).only(*ROLLUP_FIELDS).first()
+    return stored._rollup_state if stored is not None else None
+
+
+def _vehicle_owner_id(booking, vehicle_id, using):
+    from vehicles.models import Vehicle
+
+    if booking._meta.get_field('vehicle').is_cached(booking) and booking.vehicle.pk == vehicle_id:
+        return booking.vehicle.owner_id
+    return Vehicle.objects.using(using).filter(pk=vehicle_id).values_list('owner_id', flat=True).first()
+
+
+def add_to_rollup(vehicle_id, owner_id, day, total, owner, company, count, using, missing_ok=False):
+    """Add the amounts to one rollup row, creating it for positive contributions"""
+    from .models import DailyEarnings
+
+    rows = DailyEarnings.objects.using(using).filter(vehicle_id=vehicle_id, owner_id=owner_id, day=day)
+    changes = dict(
+        total_earnings=F('total_earnings') + total,
+        owner_earnings=F('owner_earnings') + owner,
+        company_earnings=F('company_earnings') + company,
+        booking_count=F('booking_count') + count,
+    )
+    if rows.update(**changes):
+        return
+    if count < 0:
+        # Cascade deletes remove the rows first; anything else means the rollup drifted
+        if not missing_ok:
+            logger.warning(
+                "DailyEarnings row (vehicle %s, owner %s, day %s) missing on subtract; "
+                "run recompute_earnings or backfill_daily_earnings", vehicle_id, owner_id, day,
+            )
+        return
+    try:
+        with transaction.atomic(using=using):
+            DailyEarnings.objects.using(using).create(
+                vehicle_id=vehicle_id, owner_id=owner_id, day=day,
+                total_earnings=total, owner_earnings=owner, company_earnings=company,
+                booking_count=count,
+            )
+    except IntegrityError:
+        # Created concurrently in the meantime
+        rows.update(**changes)
+
+
+def apply_rollup_change(booking, old_state, using, deleted=False, cascade=False):
+    """Move the booking's contribution from old_state to its current values"""
+    new_state = None if deleted else rollup_state(booking)
+    if old_state != new_state:
+        with transaction.atomic(using=using):
+            if old_state is not None:
+                vehicle_id, day, total, owner, company = old_state
+                owner_id = _vehicle_owner_id(booking, vehicle_id, using)
+                add_to_rollup(vehicle_id, owner_id, day, -total, -owner, -company, -1, using, missing_ok=cascade)
+            if new_state is not None:
+                vehicle_id, day, total, owner, company = new_state
+                owner_id = _vehicle_owner_id(booking, vehicle_id, using)
+                add_to_rollup(vehicle_id, owner_id, day, total, owner, company, 1, using)
+    booking._rollup_state = new_state
+
+
+def rebuild_daily_earnings(vehicle_ids=None, start_day=None, end_day=None, using='default'):
+    """
+    Recompute the rollup from completed bookings, optionally limited to some
+    vehicles and/or an inclusive day range. Returns the number of rows written.
+    """
+    from utils import start_of_day
+    from .models import Booking, DailyEarnings
+
+    rows = DailyEarnings.objects.using(using)
+    bookings = Booking.objects.using(using).filter(status='completed')
+    if vehicle_ids is not None:
+        vehicle_ids = list(vehicle_ids)
+        rows = rows.filter(vehicle_id__in=vehicle_ids)
+        bookings = bookings.filter(vehicle_id__in=vehicle_ids)
+    if start_day:
+        rows = rows.filter(day__gte=start_day)
+        bookings = bookings.filter(end_at__gte=start_of_day(start_day))
+    if end_day:
+        rows = rows.filter(day__lte=end_day)
+        bookings = bookings.filter(end_at__lt=start_of_day(end_day + timedelta(days=1)))
+
+    totals = (
+        bookings.annotate(day=TruncDate('end_at'))
+        .values('vehicle_id', 'vehicle__owner_id', 'day')
+        .annotate(
+            total=Sum('total_price'),
+            owner=Sum('owner_earned'),
+            company=Sum('company_earned'),
+            count=Count('id'),
+        )
+        .order_by()
+    )
+    with transaction.atomic(using=using):
+        rows.delete()
+        created = DailyEarnings.objects.using(using).bulk_create(
+            [
+                DailyEarnings(
+                    vehicle_id=row['vehicle_id'],
+                    owner_id=row['vehicle__owner_id'],
+                    day=row['day'],
+                    total_earnings=row['total'] or ZERO,
+                    owner_earnings=row['owner'] or ZERO,
+                    company_earnings=row['company'] or ZERO,
+                    booking_count=row['count'],
+                )
+                for row in totals.iterator(chunk_size=2000)
+            ],
+            batch_size=500,
+        )
+    return len(created)
+
+
+def vehicles_with_stale_owner(vehicle_ids=None, using='default'):
+    """Ids of vehicles with rollup rows keyed by an owner other than the current one"""
+    from .models import DailyEarnings
+
+    rows = DailyEarnings.objects.using(using).exclude(owner_id=F('vehicle__owner_id'))
+    if vehicle_ids is not None:
+        rows = rows.filter(vehicle_id__in=list(vehicle_ids))
+    return set(rows.values_list('vehicle_id', flat=True).distinct())
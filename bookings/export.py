@@ -0,0 +1,201 @@
+"""
+Streaming CSV/JSONL export of booking and payment history
+
+Rows are read in batches from a chunked cursor, formatted one at a time and
+sent in ~64KB chunks (optionally gzip-compressed), so memory use does not
+grow with the number of exported rows.
+"""
+import csv
+import json
+import zlib
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connections, models
+
+from utils import start_of_day
+from .models import Booking, Payment
+
+CHUNK_SIZE = 2000
+BUFFER_SIZE = 64 * 1024
+FORMATS = ('csv', 'jsonl')
+
+BOOKING_COLUMNS = [
+    ('id', 'id'),
+    ('created_at', 'created_at'),
+    ('start_at', 'start_at'),
+    ('end_at', 'end_at'),
+    ('status', 'status'),
+    ('payment_status', 'payment_status'),
+    ('vehicle_id', 'vehicle_id'),
+    ('plate_number', 'vehicle__plate_number'),
+    ('vehicle_name', 'vehicle__name'),
+    ('owner', 'vehicle__owner__username'),
+    ('renter_id', 'renter_id'),
+    ('renter', 'renter__username'),
+    ('renter_first_name', 'renter__first_name'),
+    ('renter_last_name', 'renter__last_name'),
+    ('total_price', 'total_price'),
+    ('deposit_amount', 'deposit_amount'),
+    ('paid_amount', 'paid_amount'),
+    ('owner_earned', 'owner_earned'),
+    ('company_earned', 'company_earned'),
+]
+
+PAYMENT_COLUMNS = [
+    ('id', 'id'),
+    ('created_at', 'created_at'),
+    ('booking_id', 'booking_id'),
+    ('plate_number', 'booking__vehicle__plate_number'),
+    ('renter', 'booking__renter__username'),
+    ('amount', 'amount'),
+    ('payment_type', 'payment_type'),
+    ('payment_method', 'payment_method'),
+    ('created_by', 'created_by__username'),
+    ('notes', 'notes'),
+]
+
+EXPORTS = {
+    'bookings': (Booking, BOOKING_COLUMNS),
+    'payments': (Payment, PAYMENT_COLUMNS),
+}
+
+
+def resolve_field(model, path):
+    """Model field behind a values_list() path such as 'vehicle__owner__username'"""
+    *relations, name = path.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(name)
+
+
+def format_datetime(value):
+    if value.tzinfo is None and settings.USE_TZ:
+        # SQLite returns naive datetimes that are stored in UTC
+        return value.isoformat() + '+00:00'
+    return value.isoformat()
+
+
+def decimal_formatter(places):
+    template = f'{{:.{places}f}}'
+
+    def format_decimal(value):
+        return template.format(Decimal(value) if isinstance(value, str) else value)
+    return format_decimal
+
+
+def column_formatters(model, columns):
+    """Per column: None (value written as fetched) or a cheap formatter"""
+    formatters = []
+    for _, path in columns:
+        field = resolve_field(model, path)
+        if isinstance(field, models.DateTimeField):
+            formatters.append(format_datetime)
+        elif isinstance(field, models.DecimalField):
+            formatters.append(decimal_formatter(field.decimal_places))
+        else:
+            formatters.append(None)
+    return formatters
+
+
+def fetch_rows(queryset, formatters):
+    """
+    Stream the rows of a values_list() queryset in CHUNK_SIZE batches.
+
+    The compiled SQL is read with a chunked cursor directly: Django's
+    per-value converters (datetime parsing and make_aware, Decimal
+    quantize) took ~75% of the export time and are replaced by the
+    string formatting the export needs anyway.
+    """
+    connection = connections[queryset.db]
+    sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+    cursor = connection.chunked_cursor()
+    try:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(CHUNK_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                yield [
+                    value if format_value is None or value is None else format_value(value)
+                    for value, format_value in zip(row, formatters)
+                ]
+    finally:
+        cursor.close()
+
+
+def export_rows(kind, start_date=None, end_date=None):
+    """
+    (header, rows iterator) for 'bookings' or 'payments' created in the
+    inclusive date range; the created_at bounds use the (created_at, id) indexes
+    """
+    model, columns = EXPORTS[kind]
+    queryset = model.objects.all()
+    if start_date:
+        queryset = queryset.filter(created_at__gte=start_of_day(start_date))
+    if end_date:
+        queryset = queryset.filter(created_at__lt=start_of_day(end_date + timedelta(days=1)))
+    queryset = queryset.order_by('created_at', 'id').values_list(*[path for _, path in columns])
+    return [name for name, _ in columns], fetch_rows(queryset, column_formatters(model, columns))
+
+
+class Echo:
+    """File-like object for csv.writer that returns the line instead of storing it"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(header, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def jsonl_lines(header, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(header, row)), ensure_ascii=False) + '\n'
+
+
+def buffered(lines, size=BUFFER_SIZE):
+    """Join text lines into encoded chunks of about `size` bytes"""
+    parts = []
+    length = 0
+    for line in lines:
+        parts.append(line)
+        length += len(line)
+        if length >= size:
+            yield ''.join(parts).encode()
+            parts = []
+            length = 0
+    if parts:
+        yield ''.join(parts).encode()
+
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip header
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_export(kind, fmt='csv', start_date=None, end_date=None, compress=False):
+    """Iterator of bytes chunks with the whole export"""
+    header, rows = export_rows(kind, start_date, end_date)
+    lines = csv_lines(header, rows) if fmt == 'csv' else jsonl_lines(header, rows)
+    chunks = buffered(lines)
+    return gzipped(chunks) if compress else chunks
+
+
+def export_filename(kind, fmt, start_date=None, end_date=None, compress=False):
+    parts = [kind]
+    if start_date:
+        parts.append(start_date.isoformat())
+    if end_date:
+        parts.append(end_date.isoformat())
+    return '_'.join(parts) + f'.{fmt}' + ('.gz' if compress else '')
@@ -6,12 +6,13 @@ from datetime import datetime, timedelta
 from django.forms import ModelForm
 from django.utils.translation import gettext_lazy as _
 from decimal import Decimal
-from .models import Booking
+from .models import Booking, Payment
+from .availability import availability_index
 
 class BookingForm(forms.ModelForm):
     class Meta:
         model = Booking
-        fields = ['renter', 'vehicle', 'start_at', 'end_at', 'deposit_amount', 'paid_amount', 'total_price']
+        fields = ['renter', 'vehicle', 'start_at', 'end_at', 'deposit_amount', 'total_price']
         widgets = {
             'renter': forms.Select(attrs={'class': 'form-control'}),
             'vehicle': forms.Select(attrs={'class': 'form-control'}),
@@ -23,7 +24,6 @@ class BookingForm(forms.ModelForm):
                 'placeholder': 'Depozit miqdori',
                 'value': '0.00'
             }),
-            'paid_amount': forms.HiddenInput(attrs={'value': '0.00'}),
             'total_price': forms.HiddenInput(attrs={'value': '0.00'})
         }
 
@@ -53,8 +53,6 @@ class BookingForm(forms.ModelForm):
         # Set default values for optional fields
         if 'deposit_amount' in self.fields:
             self.fields['deposit_amount'].initial = Decimal('0.00')
-        if 'paid_amount' in self.fields:
-            self.fields['paid_amount'].initial = Decimal('0.00')
         if 'total_price' in self.fields:
             self.fields['total_price'].initial = Decimal('0.00')
 
@@ -70,21 +68,30 @@ class BookingForm(forms.ModelForm):
             
             # Check if vehicle is available during the requested time
             if vehicle:
-                conflicting_bookings = Booking.objects.filter(
-                    vehicle=vehicle,
-                    status__in=['pending', 'active'],
-                    start_at__lt=end_at,
-                    end_at__gt=start_at
-                )
                 # Exclude current instance if editing
-                if self.instance.pk:
-                    conflicting_bookings = conflicting_bookings.exclude(pk=self.instance.pk)
-                    
-                if conflicting_bookings.exists():
+                if not availability_index.is_free(vehicle.pk, start_at, end_at, self.instance.pk):
                     raise forms.ValidationError("Bu vaqtda mashina band.")
 
         return cleaned_data
 
+class PaymentForm(forms.ModelForm):
+    class Meta:
+        model = Payment
+        fields = ['booking', 'amount', 'payment_type', 'payment_method', 'notes']
+        widgets = {
+            'booking': forms.HiddenInput(),
+            'amount': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01', 'min': '0.01'}),
+            'payment_type': forms.Select(attrs={'class': 'form-control'}),
+            'payment_method': forms.Select(attrs={'class': 'form-control'}),
+            'notes': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
+        }
+
+    def clean_amount(self):
+        amount = self.cleaned_data.get('amount')
+        if amount is not None and amount <= 0:
+            raise forms.ValidationError("To'lov miqdori musbat bo'lishi kerak.")
+        return amount
+
 class BookingSearchForm(forms.Form):
     search = forms.CharField(
         max_length=200,
@@ -113,3 +120,21 @@ class BookingSearchForm(forms.Form):
         required=False,
         widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
     )
+
+
+class ExportForm(forms.Form):
+    """Query parameters of the booking/payment history export"""
+    format = forms.ChoiceField(choices=[('csv', 'CSV'), ('jsonl', 'JSON Lines')], required=False)
+    start_date = forms.DateField(required=False)
+    end_date = forms.DateField(required=False)
+    gzip = forms.BooleanField(required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start_date = cleaned_data.get('start_date')
+        end_date = cleaned_data.get('end_date')
+        if start_date and end_date and end_date < start_date:
+            raise forms.ValidationError("Tugash sanasi boshlanish sanasidan oldin bo'lishi mumkin emas.")
+        cleaned_data['format'] = cleaned_data.get('format') or 'csv'
+        return cleaned_data
+
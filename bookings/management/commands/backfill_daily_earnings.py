@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from bookings.earnings import rebuild_daily_earnings
+from bookings.management.commands.recompute_earnings import parse_date
+from vehicles.models import Vehicle
+
+
+class Command(BaseCommand):
+    help = "Rebuild the DailyEarnings rollup from completed bookings"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', type=parse_date, help="First day to rebuild (YYYY-MM-DD)")
+        parser.add_argument('--end-date', type=parse_date, help="Last day to rebuild (YYYY-MM-DD)")
+        parser.add_argument('--vehicle', type=int, help="Only this vehicle id")
+        parser.add_argument('--chunk-size', type=int, default=500, help="Vehicles rebuilt per transaction")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        vehicles = Vehicle.objects.order_by('id').values_list('id', flat=True)
+        if options['vehicle']:
+            vehicles = vehicles.filter(id=options['vehicle'])
+
+        chunk_size = options['chunk_size']
+        written = 0
+        last_id = 0
+        while True:
+            vehicle_ids = list(vehicles.filter(id__gt=last_id)[:chunk_size])
+            if not vehicle_ids:
+                break
+            last_id = vehicle_ids[-1]
+            written += rebuild_daily_earnings(vehicle_ids, options['start_date'], options['end_date'])
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} daily earnings rows in {elapsed:.2f}s"))
@@ -0,0 +1,101 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from bookings.availability import availability_index
+from bookings.bench import Rollback, random_windows, seed_bookings, summarize, time_calls
+from bookings.models import Booking
+from vehicles.models import Vehicle
+import utils
+
+
+def orm_is_free(vehicle_id, start_at, end_at):
+    """Overlap check as it was done before the interval index"""
+    return not Booking.objects.filter(
+        vehicle_id=vehicle_id,
+        status__in=['pending', 'active'],
+        start_at__lt=end_at,
+        end_at__gt=start_at
+    ).exists()
+
+
+def orm_available_vehicle_ids(start_at, end_at):
+    conflicting_vehicle_ids = Booking.objects.filter(
+        status__in=['pending', 'active'],
+        start_at__lt=end_at,
+        end_at__gt=start_at
+    ).values_list('vehicle_id', flat=True)
+    return list(Vehicle.objects.filter(
+        status='available',
+        daily_price__gt=0
+    ).exclude(id__in=conflicting_vehicle_ids).values_list('id', flat=True))
+
+
+def index_available_vehicle_ids(start_at, end_at):
+    return list(utils.get_available_vehicles(start_at, end_at).values_list('id', flat=True))
+
+
+class Command(BaseCommand):
+    help = "Compare the availability interval index with the plain ORM overlap queries"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed-vehicles', type=int, default=0,
+                            help="Seed this many vehicles in a rolled back transaction")
+        parser.add_argument('--seed-bookings', type=int, default=0,
+                            help="Seed this many bookings in a rolled back transaction")
+        parser.add_argument('--checks', type=int, default=2000,
+                            help="Number of single-vehicle availability checks")
+        parser.add_argument('--searches', type=int, default=50,
+                            help="Number of fleet-wide available vehicle searches")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if options['seed_vehicles'] or options['seed_bookings']:
+                    self.stdout.write("Seeding benchmark data...")
+                    seed_bookings(max(options['seed_vehicles'], 1), options['seed_bookings'])
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+        availability_index.clear()
+
+    def run(self, options):
+        vehicle_ids = list(Vehicle.objects.values_list('id', flat=True))
+        if not vehicle_ids:
+            self.stderr.write("No vehicles to benchmark; use --seed-vehicles/--seed-bookings.")
+            return
+        self.stdout.write(
+            f"Vehicles: {len(vehicle_ids)}, bookings: {Booking.objects.count()}"
+        )
+
+        rng = random.Random(11)
+        checks = [
+            (rng.choice(vehicle_ids), start_at, end_at)
+            for start_at, end_at in random_windows(options['checks'])
+        ]
+        searches = random_windows(options['searches'], seed=13)
+
+        availability_index.clear()
+        # Warm the index once so the comparison measures lookups, not the initial load
+        availability_index.load(vehicle_ids)
+
+        results = [
+            ('check (orm)', time_calls(orm_is_free, checks)),
+            ('check (index)', time_calls(availability_index.is_free, checks)),
+            ('search (orm)', time_calls(orm_available_vehicle_ids, searches)),
+            ('search (index)', time_calls(index_available_vehicle_ids, searches)),
+        ]
+        for label, timings in results:
+            stats = summarize(timings)
+            self.stdout.write(
+                f"{label:<16} calls={stats['calls']:<6} mean={stats['mean_ms']:.3f}ms "
+                f"p50={stats['p50_ms']:.3f}ms p95={stats['p95_ms']:.3f}ms"
+            )
+
+        mismatches = sum(
+            orm_is_free(*args) != availability_index.is_free(*args) for args in checks[:200]
+        )
+        if mismatches:
+            self.stderr.write(f"Index and ORM disagree on {mismatches} checks")
@@ -0,0 +1,104 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from bookings.bench import Rollback, seed_bookings, summarize, time_calls
+from bookings.earnings import rebuild_daily_earnings
+from bookings.models import Booking
+from contracts.models import Contract
+from vehicles.models import Vehicle
+import utils
+
+
+def python_vehicle_summary(vehicle, start_date=None, end_date=None):
+    """Summary computed from the bookings themselves, every row loaded and summed in Python"""
+    bookings = vehicle.bookings.filter(status='completed')
+    if start_date:
+        bookings = bookings.filter(end_at__date__gte=start_date)
+    if end_date:
+        bookings = bookings.filter(end_at__date__lte=end_date)
+    return {
+        'total_earnings': sum(booking.total_price for booking in bookings),
+        'owner_earnings': sum(booking.owner_earned for booking in bookings),
+        'company_earnings': sum(booking.company_earned for booking in bookings),
+        'booking_count': bookings.count(),
+    }
+
+
+def python_owner_summary(owner, start_date=None, end_date=None):
+    bookings = Booking.objects.filter(vehicle__owner=owner, status='completed')
+    if start_date:
+        bookings = bookings.filter(end_at__date__gte=start_date)
+    if end_date:
+        bookings = bookings.filter(end_at__date__lte=end_date)
+    return {
+        'total_earnings': sum(booking.owner_earned for booking in bookings),
+        'booking_count': bookings.count(),
+        'vehicles_count': owner.vehicles.count(),
+    }
+
+
+def python_company_summary(start_date=None, end_date=None):
+    bookings = Booking.objects.filter(status='completed')
+    if start_date:
+        bookings = bookings.filter(end_at__date__gte=start_date)
+    if end_date:
+        bookings = bookings.filter(end_at__date__lte=end_date)
+    return {
+        'total_earnings': sum(booking.company_earned for booking in bookings),
+        'booking_count': bookings.count(),
+        'vehicles_count': Vehicle.objects.count(),
+        'contracts_count': Contract.objects.filter(is_active=True).count(),
+    }
+
+
+class Command(BaseCommand):
+    help = "Compare the rollup-based earnings summaries with Python loops over bookings"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed-bookings', type=int, default=500000,
+                            help="Bookings seeded in a rolled back transaction (0 uses existing data)")
+        parser.add_argument('--seed-vehicles', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if options['seed_bookings']:
+                    self.stdout.write("Seeding benchmark data...")
+                    seed_bookings(options['seed_vehicles'], options['seed_bookings'], seed=9)
+                    # bulk_create skips the signals maintaining the rollup
+                    rows = rebuild_daily_earnings()
+                    self.stdout.write(f"Rebuilt {rows} daily earnings rows")
+                self.run(options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, repeat):
+        owner = CustomUser.objects.filter(role='owner').order_by('-id').first()
+        vehicle = Vehicle.objects.order_by('-id').first()
+        if owner is None or vehicle is None:
+            self.stderr.write("No owner/vehicle to benchmark; use --seed-bookings.")
+            return
+        self.stdout.write(f"Bookings: {Booking.objects.count()}")
+
+        end_date = timezone.localdate()
+        start_date = end_date - timedelta(days=90)
+        cases = [
+            ('vehicle', python_vehicle_summary, utils.get_vehicle_earnings_summary, (vehicle,)),
+            ('owner', python_owner_summary, utils.get_owner_earnings_summary, (owner,)),
+            ('company', python_company_summary, utils.get_company_earnings_summary, ()),
+            ('company 90d', python_company_summary, utils.get_company_earnings_summary, (start_date, end_date)),
+        ]
+        for label, before, after, arguments in cases:
+            if before(*arguments) != after(*arguments):
+                self.stderr.write(f"{label}: results differ")
+            for variant, func in (('python', before), ('rollup', after)):
+                stats = summarize(time_calls(func, [arguments] * repeat))
+                self.stdout.write(
+                    f"{label:<12} {variant:<10} mean={stats['mean_ms']:.1f}ms p50={stats['p50_ms']:.1f}ms"
+                )
@@ -0,0 +1,45 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.export import EXPORTS, FORMATS, export_filename, stream_export
+from bookings.management.commands.recompute_earnings import parse_date
+
+
+class Command(BaseCommand):
+    help = "Stream the booking or payment history to a CSV/JSONL file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTS))
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--start-date', type=parse_date, help="Created on or after (YYYY-MM-DD)")
+        parser.add_argument('--end-date', type=parse_date, help="Created on or before (YYYY-MM-DD)")
+        parser.add_argument('--gzip', action='store_true', help="Compress the output with gzip")
+        parser.add_argument('-o', '--output',
+                            help="Output file ('-' for stdout, default: <kind>_<dates>.<format>[.gz])")
+
+    def handle(self, *args, **options):
+        kind, fmt = options['kind'], options['format']
+        start_date, end_date = options['start_date'], options['end_date']
+        if start_date and end_date and end_date < start_date:
+            raise CommandError("--end-date must not be before --start-date")
+        output = options['output'] or export_filename(kind, fmt, start_date, end_date, options['gzip'])
+
+        started = time.perf_counter()
+        written = 0
+        chunks = stream_export(kind, fmt, start_date, end_date, options['gzip'])
+        target = sys.stdout.buffer if output == '-' else open(output, 'wb')
+        try:
+            for chunk in chunks:
+                target.write(chunk)
+                written += len(chunk)
+        finally:
+            if target is not sys.stdout.buffer:
+                target.close()
+
+        if output != '-':
+            elapsed = time.perf_counter() - started
+            self.stdout.write(self.style.SUCCESS(
+                f"Wrote {written:,} bytes to {output} in {elapsed:.2f}s"
+            ))
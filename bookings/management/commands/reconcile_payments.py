@@ -0,0 +1,68 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+
+from bookings.models import Booking, Payment
+
+CENT = Decimal("0.01")
+
+
+class Command(BaseCommand):
+    help = "Rebuild Booking.paid_amount and payment_status from Payment rows and report drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help="Number of bookings checked per query")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Only report drift, do not write corrections")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        checked = drifted = 0
+        last_id = 0
+
+        while True:
+            rows = list(
+                Booking.objects.filter(id__gt=last_id)
+                .order_by('id')
+                .values_list('id', 'total_price', 'paid_amount', 'payment_status')[:chunk_size]
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            totals = dict(
+                Payment.objects.filter(booking_id__in=[row[0] for row in rows])
+                .values('booking_id')
+                .annotate(total=Sum('amount'))
+                .order_by()
+                .values_list('booking_id', 'total')
+            )
+
+            corrected = []
+            for booking_id, total_price, paid_amount, payment_status in rows:
+                booking = Booking(
+                    id=booking_id,
+                    total_price=total_price,
+                    paid_amount=(totals.get(booking_id) or Decimal("0.00")).quantize(CENT),
+                )
+                booking.update_payment_status()
+                if booking.paid_amount != (paid_amount or Decimal("0.00")) or booking.payment_status != payment_status:
+                    drifted += 1
+                    corrected.append(booking)
+                    self.stdout.write(
+                        f"Booking #{booking_id}: paid_amount {paid_amount} -> {booking.paid_amount}, "
+                        f"payment_status {payment_status} -> {booking.payment_status}"
+                    )
+            checked += len(rows)
+
+            if corrected and not options['dry_run']:
+                with transaction.atomic():
+                    Booking.objects.bulk_update(corrected, ['paid_amount', 'payment_status'])
+
+        action = "found" if options['dry_run'] else "fixed"
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {checked} bookings, {action} {drifted} with drift."
+        ))
@@ -0,0 +1,98 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone as dt_timezone
+
+import django
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, connections
+
+from accounts.dashboard import invalidate_dashboard_stats
+from bookings.models import Booking
+from bookings.seeding import SeedPlan, prepare, seed_shard
+
+
+def parse_anchor(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=dt_timezone.utc)
+    except ValueError:
+        raise CommandError(f"Noto'g'ri sana: {value} (YYYY-MM-DD kutilgan)")
+
+
+def seed_worker(plan, shard):
+    # Forked workers must not share the parent's database connections
+    if not apps.ready:
+        django.setup()
+    connections.close_all()
+    try:
+        return seed_shard(plan, shard)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic fleet: owners, renters, makes/models, vehicles, share and fixed "
+        "contracts, non-overlapping booking histories and payments"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owners', type=int, default=200)
+        parser.add_argument('--renters', type=int, default=5000)
+        parser.add_argument('--vehicles', type=int, default=1000)
+        parser.add_argument('--bookings', type=int, default=100000, help="Bookings in total, spread over the vehicles")
+        parser.add_argument('--days', type=int, default=365, help="History length before the anchor date")
+        parser.add_argument('--future-days', type=int, default=30, help="Pending bookings after the anchor date")
+        parser.add_argument('--anchor-date', type=parse_anchor,
+                            help="'Today' of the generated data (YYYY-MM-DD, default: today)")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--prefix', default='seed', help="Username prefix of the generated users")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Rows per INSERT batch")
+        parser.add_argument('--workers', type=int, default=1, help="Worker processes, sharded by owner")
+
+    def handle(self, *args, **options):
+        if min(options['owners'], options['renters'], options['vehicles']) < 1:
+            raise CommandError("--owners, --renters and --vehicles must be positive")
+        workers = max(1, min(options['workers'], options['owners']))
+        plan = SeedPlan(
+            owners=options['owners'], renters=options['renters'], vehicles=options['vehicles'],
+            bookings=max(0, options['bookings']), days=options['days'], future_days=options['future_days'],
+            seed=options['seed'], prefix=options['prefix'], anchor=options['anchor_date'],
+            batch_size=options['batch_size'], shards=workers,
+        )
+        if plan.bookings and plan.window_minutes // plan.bookings_for(0) < 60:
+            raise CommandError("Too many bookings per vehicle for the window; increase --days or --vehicles")
+
+        started = time.perf_counter()
+        try:
+            prepare(plan)
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(f"{plan.owners} owners, {plan.renters} renters and the make/model catalog created")
+
+        if workers == 1:
+            results = [seed_shard(plan, 0)]
+        else:
+            connections.close_all()
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                futures = [pool.submit(seed_worker, plan, shard) for shard in range(workers)]
+                results = [future.result() for future in futures]
+
+        # Booking ids were assigned explicitly; move the sequence past them (no-op on SQLite)
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Booking]):
+                cursor.execute(sql)
+        invalidate_dashboard_stats()
+
+        totals = {name: sum(result[name] for result in results) for name in results[0]}
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {totals['vehicles']:,} vehicles, {totals['contracts']:,} contracts, "
+            f"{totals['bookings']:,} bookings, {totals['payments']:,} payments and "
+            f"{totals['daily_earnings']:,} daily earnings rows in {elapsed:.1f}s "
+            f"({totals['bookings'] / elapsed if elapsed else 0:,.0f} bookings/s, {workers} worker(s))"
+        ))
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0003_alter_booking_company_earned_and_more'),
+        ('vehicles', '0002_alter_vehicle_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['vehicle', 'status', 'start_at', 'end_at'], name='booking_vehicle_overlap_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['status', 'start_at', 'end_at'], name='booking_status_overlap_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['created_at', 'id'], name='booking_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['vehicle', 'created_at'], name='booking_vehicle_created_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:47
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0004_booking_indexes'),
+        ('vehicles', '0002_alter_vehicle_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyEarnings',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('total_earnings', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('owner_earnings', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('company_earnings', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('booking_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_earnings', to=settings.AUTH_USER_MODEL)),
+                ('vehicle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_earnings', to='vehicles.vehicle')),
+            ],
+            options={
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['owner', 'day'], name='daily_earnings_owner_idx'), models.Index(fields=['day'], name='daily_earnings_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('vehicle', 'owner', 'day'), name='daily_earnings_unique')],
+            },
+        ),
+    ]
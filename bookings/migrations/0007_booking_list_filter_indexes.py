@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 05:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0006_list_cursor_indexes'),
+        ('vehicles', '0003_vehicle_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='booking_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['payment_status', 'created_at', 'id'], name='booking_payment_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['start_at', 'end_at'], name='booking_period_idx'),
+        ),
+    ]
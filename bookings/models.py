@@ -1,5 +1,8 @@
-from django.db import models
-from django.db.models import Sum
+import time
+from django.db import models, transaction, OperationalError
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import GreaterThan, GreaterThanOrEqual
 from accounts.models import CustomUser
 from vehicles.models import Vehicle
 from contracts.models import Contract
@@ -8,6 +11,15 @@ import math
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 
+
+# Written only through the Payment ledger (apply_paid_amount_delta) or explicit update_fields
+LEDGER_FIELDS = ('paid_amount', 'payment_status')
+
+
+class BookingConflictError(ValidationError):
+    """Raised when a booking overlaps another pending/active booking of the same vehicle"""
+
+
 class Booking(models.Model):
     STATUS_CHOICES = [
         ("pending", "Pending"),
@@ -78,6 +90,21 @@ class Booking(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Overlap checks for one vehicle (form, reserve, availability index)
+            models.Index(fields=['vehicle', 'status', 'start_at', 'end_at'], name='booking_vehicle_overlap_idx'),
+            # Fleet-wide overlap scans and status filters
+            models.Index(fields=['status', 'start_at', 'end_at'], name='booking_status_overlap_idx'),
+            # List views ordered by -created_at, -id
+            models.Index(fields=['created_at', 'id'], name='booking_created_idx'),
+            # booking_list status / payment status filters in list order (no sort step)
+            models.Index(fields=['status', 'created_at', 'id'], name='booking_status_created_idx'),
+            models.Index(fields=['payment_status', 'created_at', 'id'], name='booking_payment_created_idx'),
+            # booking_list date range filter
+            models.Index(fields=['start_at', 'end_at'], name='booking_period_idx'),
+            # Per-vehicle history (vehicle and contract detail pages)
+            models.Index(fields=['vehicle', 'created_at'], name='booking_vehicle_created_idx'),
+        ]
 
     def __str__(self):
         return f"Booking #{self.id} {self.vehicle.plate_number}"
@@ -106,17 +133,13 @@ class Booking(models.Model):
 
     def calculate_earnings(self):
         """Calculate owner and company earnings based on active contract"""
-        from contracts.models import Contract
+        from contracts.timeline import contract_timelines
         
-        # Find active contract for this vehicle
+        # Find active contract for this vehicle in the cached contract timeline
         try:
-            contract = Contract.objects.filter(
-                vehicle=self.vehicle,
-                is_active=True,
-                start_date__lte=self.start_at.date()
-            ).filter(
-                models.Q(end_date__isnull=True) | models.Q(end_date__gte=self.end_at.date())
-            ).first()
+            contract = contract_timelines.resolve(
+                self.vehicle_id, self.start_at.date(), self.end_at.date()
+            )
             
             if not contract:
                 # No active contract, all earnings go to company
@@ -124,14 +147,7 @@ class Booking(models.Model):
                 self.company_earned = self.total_price
                 return
             
-            if contract.pricing_type == "share":
-                # Calculate based on percentages
-                self.owner_earned = (self.total_price * contract.owner_share_percent) / Decimal("100.00")
-                self.company_earned = (self.total_price * contract.company_share_percent) / Decimal("100.00")
-            else:
-                # Fixed payout - owner gets fixed amount, rest goes to company
-                self.owner_earned = contract.fixed_payout_amount or Decimal("0.00")
-                self.company_earned = self.total_price - self.owner_earned
+            self.owner_earned, self.company_earned = contract.split_earnings(self.total_price)
                 
         except Exception:
             # Fallback: all earnings to company
@@ -139,14 +155,14 @@ class Booking(models.Model):
             self.company_earned = self.total_price
 
     def clean(self):
-        from constants.models import Constant
+        from constants.cache import system_constants
         
         if self.end_at <= self.start_at:
             raise ValidationError("End time must be after start time.")
         
         # Check minimum rental duration
         try:
-            constants = Constant.objects.first()
+            constants = system_constants.get()
             if constants:
                 min_hours = constants.min_renter_rental_hours
                 if self.duration_hours() < min_hours:
@@ -156,40 +172,92 @@ class Booking(models.Model):
 
     def update_payment_status(self):
         """Update payment status based on paid amount"""
-        total_paid = self.payments.aggregate(Sum('amount'))['amount__sum'] or 0
-        self.paid_amount = total_paid
+        paid_amount = self.paid_amount or Decimal("0.00")
         
-        if self.paid_amount >= self.total_price:
+        if paid_amount >= (self.total_price or Decimal("0.00")):
             self.payment_status = 'paid'
-        elif self.paid_amount > 0:
+        elif paid_amount > 0:
             self.payment_status = 'partial'
         else:
             self.payment_status = 'unpaid'
 
+    @classmethod
+    def apply_paid_amount_delta(cls, booking_id, delta):
+        """
+        Add delta to paid_amount and recompute payment_status in a single
+        UPDATE, using F() so concurrent payments cannot overwrite each other
+        """
+        zero = Value(Decimal("0.00"))
+        paid_amount = Coalesce(F('paid_amount'), zero) + Value(delta)
+        return cls.objects.filter(pk=booking_id).update(
+            paid_amount=paid_amount,
+            payment_status=Case(
+                When(GreaterThanOrEqual(paid_amount, Coalesce(F('total_price'), zero)), then=Value('paid')),
+                When(GreaterThan(paid_amount, zero), then=Value('partial')),
+                default=Value('unpaid'),
+            ),
+        )
+
     def save(self, *args, **kwargs):
         is_new = not self.pk
         
         # Calculate total price for new bookings
         if is_new:
             self.calculate_total_price()
+        
+        # paid_amount/payment_status are maintained by Payment (apply_paid_amount_delta);
+        # a stale in-memory copy must not overwrite them on an ordinary save
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in LEDGER_FIELDS
+            ]
+        price_changed = (
+            not self._state.adding
+            and 'total_price' in (kwargs.get('update_fields') or ())
+            and getattr(self, '_loaded_total_price', None) != self.total_price
+        )
             
-        # Save the booking first to get a primary key
         super().save(*args, **kwargs)
+        self._loaded_total_price = self.total_price
         
-        # Update payment status if needed (only for existing bookings)
-        if not is_new and not hasattr(self, '_payment_status_updated'):
-            self.update_payment_status()
-            # Save again if payment status was updated
-            if hasattr(self, '_payment_status_updated'):
-                super().save(update_fields=['payment_status', 'paid_amount'])
-        
-        # Update vehicle status based on booking status
-        if hasattr(self, 'vehicle'):
-            if self.status == 'active':
-                self.vehicle.status = 'rented'
-            elif self.status in ['completed', 'cancelled']:
-                self.vehicle.status = 'available'
-            self.vehicle.save(update_fields=['status'])
+        if price_changed:
+            # payment_status depends on total_price; recompute it against the stored paid_amount
+            Booking.apply_paid_amount_delta(self.pk, Decimal("0.00"))
+            self.refresh_from_db(fields=LEDGER_FIELDS)
+        # Vehicle status is recomputed from the post_save signal (vehicles.status)
+
+    def reserve(self, max_attempts=5):
+        """
+        Check for overlapping bookings and save in one transaction.
+
+        The vehicle row is written first, which takes its row lock on
+        PostgreSQL/MySQL and the database write lock on SQLite, so
+        concurrent reservations of the same vehicle are serialized and the
+        overlap check cannot be raced. Lock timeouts are retried with a
+        short backoff; an overlap raises BookingConflictError.
+        """
+        for attempt in range(1, max_attempts + 1):
+            try:
+                with transaction.atomic():
+                    Vehicle.objects.filter(pk=self.vehicle_id).update(status=F('status'))
+                    if self.status in ['pending', 'active']:
+                        conflicting_bookings = Booking.objects.filter(
+                            vehicle_id=self.vehicle_id,
+                            status__in=['pending', 'active'],
+                            start_at__lt=self.end_at,
+                            end_at__gt=self.start_at
+                        )
+                        if self.pk:
+                            conflicting_bookings = conflicting_bookings.exclude(pk=self.pk)
+                        if conflicting_bookings.exists():
+                            raise BookingConflictError("Bu vaqtda mashina band.")
+                    self.save()
+                return self
+            except OperationalError as e:
+                if attempt == max_attempts or 'locked' not in str(e):
+                    raise
+                time.sleep(0.05 * attempt)
 
     def add_payment(self, amount, payment_type='advance', payment_method='cash', notes='', created_by=None):
         """Add a payment to this booking"""
@@ -204,6 +272,48 @@ class Booking(models.Model):
             created_by=created_by
         )
         
+        # The database row was already updated by Payment.save; mirror it in memory
+        self.paid_amount = (self.paid_amount or Decimal("0.00")) + Decimal(str(amount))
         self.update_payment_status()
-        self.save()
         return payment
+
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'total_price' in field_names:
+            instance._loaded_total_price = instance.total_price
+        # Remember what the booking contributed to DailyEarnings when loaded
+        from .earnings import remember_rollup_state
+        remember_rollup_state(instance, field_names)
+        return instance
+
+
+class DailyEarnings(models.Model):
+    """Completed booking earnings rolled up per vehicle, owner and day (end_at date)"""
+    vehicle = models.ForeignKey(Vehicle, on_delete=models.CASCADE, related_name="daily_earnings")
+    owner = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="daily_earnings")
+    day = models.DateField()
+    
+    total_earnings = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    owner_earnings = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    company_earnings = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    booking_count = models.IntegerField(default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(fields=['vehicle', 'owner', 'day'], name='daily_earnings_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['owner', 'day'], name='daily_earnings_owner_idx'),
+            models.Index(fields=['day'], name='daily_earnings_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.vehicle_id}: {self.total_earnings}"
+
+
+from .payment_models import Payment  # noqa: E402  (registers the model with the app)
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from .models import Booking
 
@@ -27,12 +27,26 @@ class Payment(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='payment_created_idx'),
+            models.Index(fields=['booking', 'created_at', 'id'], name='payment_booking_created_idx'),
+        ]
     
     def __str__(self):
         return f"To'lov #{self.id} - {self.amount} UZS"
     
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        # Update booking's paid amount
-        self.booking.update_payment_status()
-        self.booking.save()
+        with transaction.atomic():
+            previous = None
+            if not self._state.adding:
+                previous = Payment.objects.filter(pk=self.pk).values_list('booking_id', 'amount').first()
+            super().save(*args, **kwargs)
+            
+            # Update booking's paid amount incrementally instead of re-aggregating
+            if previous is None:
+                Booking.apply_paid_amount_delta(self.booking_id, self.amount)
+            elif previous[0] != self.booking_id:
+                Booking.apply_paid_amount_delta(previous[0], -previous[1])
+                Booking.apply_paid_amount_delta(self.booking_id, self.amount)
+            elif previous[1] != self.amount:
+                Booking.apply_paid_amount_delta(self.booking_id, self.amount - previous[1])
@@ -4,6 +4,7 @@ from django.urls import reverse_lazy
 from django.contrib import messages
 from django.shortcuts import get_object_or_404, redirect
 from django.utils.translation import gettext_lazy as _
+from pagination import CursorPaginationMixin
 from .models import Booking, Payment
 from .forms import PaymentForm
 
@@ -26,20 +27,16 @@ class PaymentCreateView(LoginRequiredMixin, CreateView):
     
     def form_valid(self, form):
         form.instance.created_by = self.request.user
+        # Payment.save updates the booking's paid amount and payment status
         response = super().form_valid(form)
         
-        # Update booking's payment status
-        booking = form.cleaned_data['booking']
-        booking.update_payment_status()
-        booking.save()
-        
         messages.success(self.request, _("Payment added successfully!"))
         return response
     
     def get_success_url(self):
         return reverse_lazy('bookings:detail', kwargs={'pk': self.object.booking.id})
 
-class PaymentListView(LoginRequiredMixin, ListView):
+class PaymentListView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     model = Payment
     template_name = 'bookings/payment_list.html'
     context_object_name = 'payments'
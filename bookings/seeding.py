@@ -0,0 +1,357 @@
+"""
+Synthetic fleet generator used by the seed_fleet command
+
+Volumes are split by owner shard: owner i belongs to shard i % shards and
+vehicle j to owner j % owners, so every shard writes its own vehicles,
+contracts, bookings and payments and shards can run in parallel processes.
+Every vehicle draws from its own random.Random(seed, vehicle index), and
+booking ids are assigned from per-vehicle ranges, so the generated data
+does not depend on the number of workers.
+
+Bookings of a vehicle are laid out in consecutive time slots (one booking
+per slot), so they never overlap. Bookings, payments and the matching
+DailyEarnings rows are written with executemany instead of bulk_create:
+it keeps the generated created_at values (auto_now_add would overwrite
+them) and skips the per-value field preparation that dominates
+bulk_create at millions of rows.
+"""
+import math
+import random
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import OperationalError, connection, transaction
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from contracts.models import Contract
+from vehicles.models import CarMake, CarModel, Vehicle
+from vehicles.status import vehicle_status_expression
+from .bench import plate_for
+from .models import Booking, DailyEarnings
+from .payment_models import Payment
+
+CENT = Decimal('0.01')
+CHUNK_SIZE = 500
+
+CATALOG = {
+    'Chevrolet': ['Cobalt', 'Nexia', 'Spark', 'Malibu', 'Tracker', 'Lacetti', 'Damas', 'Captiva'],
+    'Kia': ['K5', 'Sportage', 'Seltos', 'Sorento'],
+    'Hyundai': ['Sonata', 'Elantra', 'Tucson', 'Santa Fe'],
+    'BYD': ['Han', 'Song Plus', 'Chazor'],
+    'Toyota': ['Camry', 'Corolla', 'RAV4', 'Land Cruiser'],
+    'Lada': ['Vesta', 'Granta'],
+}
+FIRST_NAMES = [
+    'Aziz', 'Bobur', 'Sardor', 'Jasur', 'Otabek', 'Sherzod', 'Dilshod', 'Rustam', 'Jahongir', 'Ulugbek',
+    'Dilnoza', 'Madina', 'Gulnora', 'Nilufar', 'Shahnoza', 'Zarina', 'Malika', 'Sevara', 'Kamola', 'Feruza',
+]
+LAST_NAMES = [
+    'Karimov', 'Rahimov', 'Tursunov', 'Aliyev', 'Yusupov', 'Saidov', 'Ergashev', 'Nazarov', 'Qodirov',
+    'Mirzayev', 'Xolmatov', 'Abdullayev', 'Ismoilov', 'Sobirov', 'Hasanov',
+]
+DAILY_PRICES = [250, 300, 350, 400, 450, 500, 600, 700, 900, 1200]
+PAYMENT_METHODS = ['cash'] * 5 + ['card'] * 3 + ['transfer'] * 2
+
+
+class SeedPlan:
+    """Volumes and fixed inputs shared by the parent and every shard (picklable)"""
+
+    def __init__(self, owners, renters, vehicles, bookings, days=365, future_days=30,
+                 seed=42, prefix='seed', anchor=None, batch_size=5000, shards=1):
+        self.owners = owners
+        self.renters = renters
+        self.vehicles = vehicles
+        self.bookings = bookings
+        self.days = days
+        self.future_days = future_days
+        self.seed = seed
+        self.prefix = prefix
+        self.anchor = anchor or datetime.now(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        self.batch_size = batch_size
+        self.shards = shards
+        # Filled in by prepare()
+        self.owner_ids = []
+        self.renter_ids = []
+        self.models = []
+        self.plates = []
+        self.first_booking_id = 1
+
+    @property
+    def window_start(self):
+        return self.anchor - timedelta(days=self.days)
+
+    @property
+    def window_minutes(self):
+        return (self.days + self.future_days) * 1440
+
+    def bookings_for(self, vehicle):
+        base, extra = divmod(self.bookings, self.vehicles)
+        return base + (1 if vehicle < extra else 0)
+
+    def first_booking_id_for(self, vehicle):
+        base, extra = divmod(self.bookings, self.vehicles)
+        return self.first_booking_id + vehicle * base + min(vehicle, extra)
+
+    def vehicles_of_shard(self, shard):
+        """Vehicle indexes whose owner belongs to the shard"""
+        return [
+            vehicle for vehicle in range(self.vehicles)
+            if (vehicle % self.owners) % self.shards == shard
+        ]
+
+
+def retry_locked(func, attempts=20):
+    """Run func in a transaction, retrying SQLite lock timeouts caused by parallel shards"""
+    for attempt in range(1, attempts + 1):
+        try:
+            with transaction.atomic():
+                return func()
+        except OperationalError as e:
+            if attempt == attempts or 'locked' not in str(e):
+                raise
+            time.sleep(0.1 * attempt)
+
+
+def insert_rows(model, rows, columns):
+    """INSERT rows (tuples in `columns` order, values already adapted) with one executemany"""
+    if not rows:
+        return
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {table} ({columns}) VALUES ({values})'.format(
+        table=quote(model._meta.db_table),
+        columns=', '.join(quote(model._meta.get_field(name).column) for name in columns),
+        values=', '.join(['%s'] * len(columns)),
+    )
+
+    def execute():
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+    retry_locked(execute)
+
+
+def seed_name(rng):
+    return rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+
+
+def prepare(plan):
+    """Create owners, renters and the make/model catalog; fill the id lists of the plan"""
+    if CustomUser.objects.filter(username__startswith=f'{plan.prefix}_').exists():
+        raise ValueError(f"'{plan.prefix}_' usernames already exist; use another prefix")
+
+    rng = random.Random(f'{plan.seed}:users')
+    password = make_password(None)
+    users = []
+    for role, count in ((CustomUser.Roles.OWNER, plan.owners), (CustomUser.Roles.RENTER, plan.renters)):
+        for i in range(count):
+            first_name, last_name = seed_name(rng)
+            users.append(CustomUser(
+                username=f'{plan.prefix}_{role}_{i}', role=role, password=password, is_verified=True,
+                first_name=first_name, last_name=last_name, phone=f'+99890{rng.randrange(10 ** 7):07d}',
+            ))
+    CustomUser.objects.bulk_create(users, batch_size=plan.batch_size)
+    ids = dict(
+        CustomUser.objects.filter(username__startswith=f'{plan.prefix}_').values_list('username', 'id')
+    )
+    plan.owner_ids = [ids[f'{plan.prefix}_owner_{i}'] for i in range(plan.owners)]
+    plan.renter_ids = [ids[f'{plan.prefix}_renter_{i}'] for i in range(plan.renters)]
+
+    CarMake.objects.bulk_create([CarMake(name=name) for name in CATALOG], ignore_conflicts=True)
+    make_ids = dict(CarMake.objects.filter(name__in=list(CATALOG)).values_list('name', 'id'))
+    CarModel.objects.bulk_create(
+        [CarModel(make_id=make_ids[make], name=name) for make, names in CATALOG.items() for name in names],
+        ignore_conflicts=True,
+    )
+    plan.models = list(
+        CarModel.objects.filter(make_id__in=make_ids.values()).order_by('id').values_list('make_id', 'id')
+    )
+
+    # Mavjud raqamlar bilan to'qnashmaydigan raqamlar ketma-ketligi
+    taken = set(Vehicle.objects.values_list('plate_number', flat=True))
+    number = Vehicle.objects.count()
+    plan.plates = []
+    while len(plan.plates) < plan.vehicles:
+        plate = plate_for(number)
+        number += 1
+        if plate not in taken:
+            plan.plates.append(plate)
+    plan.first_booking_id = (Booking.objects.order_by('-id').values_list('id', flat=True).first() or 0) + 1
+    return plan
+
+
+def vehicle_rng(plan, vehicle):
+    return random.Random(f'{plan.seed}:vehicle:{vehicle}')
+
+
+def build_vehicle(plan, vehicle, rng):
+    make_id, model_id = rng.choice(plan.models)
+    daily_price = Decimal(rng.choice(DAILY_PRICES) * 1000)
+    return Vehicle(
+        owner_id=plan.owner_ids[vehicle % plan.owners],
+        make_id=make_id, model_id=model_id,
+        plate_number=plan.plates[vehicle],
+        year=rng.randint(2012, 2025),
+        daily_price=daily_price,
+        hourly_price=(daily_price / 8).quantize(Decimal('1000')) if rng.random() < 0.7 else None,
+        status='available',
+    )
+
+
+def build_contract(plan, vehicle, rng):
+    contract = Contract(
+        owner_id=vehicle.owner_id, vehicle_id=vehicle.pk,
+        start_date=(plan.window_start - timedelta(days=30)).date(),
+        min_rental_days=rng.choice([None, 1, 3]),
+    )
+    if rng.random() < 0.7:
+        contract.pricing_type = 'share'
+        contract.owner_share_percent = Decimal(rng.choice([70, 75, 80, 85]))
+        contract.company_share_percent = Decimal(100) - contract.owner_share_percent
+    else:
+        contract.pricing_type = 'fixed'
+        contract.fixed_payout_amount = (vehicle.daily_price / 2).quantize(CENT)
+    return contract
+
+
+class BookingWriter:
+    """Generate the bookings and payments of one vehicle at a time and write them in batches"""
+
+    BOOKING_COLUMNS = [
+        'id', 'renter', 'vehicle', 'start_at', 'end_at', 'status', 'payment_status',
+        'total_price', 'deposit_amount', 'paid_amount', 'owner_earned', 'company_earned',
+        'created_at', 'updated_at',
+    ]
+    PAYMENT_COLUMNS = ['booking', 'amount', 'payment_type', 'payment_method', 'notes', 'created_at']
+    ROLLUP_COLUMNS = [
+        'vehicle', 'owner', 'day', 'total_earnings', 'owner_earnings', 'company_earnings',
+        'booking_count', 'updated_at',
+    ]
+
+    def __init__(self, plan):
+        self.plan = plan
+        self.now = plan.anchor
+        self.bookings = []
+        self.payments = []
+        self.rollup = []
+        self.written = 0
+        self.payments_written = 0
+        self.rollup_written = 0
+        self.window_start = plan.window_start
+        self.adapt = connection.ops.adapt_datetimefield_value
+        if connection.vendor == 'sqlite':
+            # SQLite naive UTC matn saqlaydi: vaqtlar naive UTC da hisoblanib str() bilan yoziladi
+            self.window_start = self.window_start.replace(tzinfo=None)
+            self.now = self.now.replace(tzinfo=None)
+            self.adapt = str
+
+    def add_vehicle(self, plan_index, vehicle, contract, rng):
+        plan = self.plan
+        count = plan.bookings_for(plan_index)
+        if not count:
+            return
+        slot = plan.window_minutes // count
+        if slot < 60:
+            raise ValueError("Too many bookings per vehicle for the window; increase --days")
+        booking_id = plan.first_booking_id_for(plan_index)
+        adapt = self.adapt
+        # DailyEarnings qatorlari shu yerda yig'iladi: yangi mashinalar uchun
+        # rebuild_daily_earnings bookinglarni qayta o'qishi shart emas
+        days = {}
+        for position in range(count):
+            offset = rng.randrange(slot // 3 + 1)
+            minutes = rng.randint(min(60, slot - offset), slot - offset)
+            start_at = self.window_start + timedelta(minutes=position * slot + offset)
+            end_at = start_at + timedelta(minutes=minutes)
+            created_at = min(start_at - timedelta(minutes=rng.randint(30, 14 * 1440)), self.now)
+
+            hours = math.ceil(minutes / 60)
+            if hours < 24 and vehicle.hourly_price:
+                total = vehicle.hourly_price * hours
+            else:
+                total = vehicle.daily_price * math.ceil(hours / 24)
+            owner_earned, company_earned = contract.split_earnings(total)
+
+            if end_at <= self.now:
+                status = 'cancelled' if rng.random() < 0.08 else 'completed'
+            elif start_at <= self.now:
+                status = 'active'
+            else:
+                status = 'pending'
+            deposit = (total * Decimal('0.3')).quantize(CENT) if status != 'cancelled' else Decimal('0.00')
+            if status == 'completed':
+                paid, payment_status = total, 'paid'
+            elif status == 'active' or (status == 'pending' and rng.random() < 0.5):
+                paid, payment_status = deposit, 'partial'
+            else:
+                paid, payment_status = Decimal('0.00'), 'unpaid'
+
+            owner_earned = owner_earned.quantize(CENT)
+            company_earned = company_earned.quantize(CENT)
+            if status == 'completed':
+                day = timezone.localdate(end_at if end_at.tzinfo else end_at.replace(tzinfo=dt_timezone.utc))
+                amounts = days.setdefault(day, [Decimal('0.00'), Decimal('0.00'), Decimal('0.00'), 0])
+                amounts[0] += total
+                amounts[1] += owner_earned
+                amounts[2] += company_earned
+                amounts[3] += 1
+
+            created = adapt(created_at)
+            self.bookings.append((
+                booking_id, plan.renter_ids[rng.randrange(plan.renters)], vehicle.pk, adapt(start_at),
+                adapt(end_at), status, payment_status, total, deposit, paid, owner_earned, company_earned,
+                created, adapt(end_at) if status == 'completed' else created,
+            ))
+            if paid:
+                method = rng.choice(PAYMENT_METHODS)
+                self.payments.append((booking_id, deposit, 'deposit', method, '', created))
+                if paid > deposit:
+                    self.payments.append((booking_id, paid - deposit, 'final', method, '', adapt(end_at)))
+            booking_id += 1
+            if len(self.bookings) >= plan.batch_size:
+                self.flush()
+        updated_at = adapt(self.now)
+        self.rollup.extend(
+            (vehicle.pk, vehicle.owner_id, day, *amounts, updated_at) for day, amounts in sorted(days.items())
+        )
+
+    def flush(self):
+        insert_rows(Booking, self.bookings, self.BOOKING_COLUMNS)
+        insert_rows(Payment, self.payments, self.PAYMENT_COLUMNS)
+        insert_rows(DailyEarnings, self.rollup, self.ROLLUP_COLUMNS)
+        self.written += len(self.bookings)
+        self.payments_written += len(self.payments)
+        self.rollup_written += len(self.rollup)
+        self.bookings = []
+        self.payments = []
+        self.rollup = []
+
+
+def seed_shard(plan, shard):
+    """Write the vehicles, contracts, bookings and payments of one owner shard; returns counts"""
+    indexes = plan.vehicles_of_shard(shard)
+    vehicles, contracts, rngs = [], [], []
+    for index in indexes:
+        rng = vehicle_rng(plan, index)
+        vehicles.append(build_vehicle(plan, index, rng))
+        rngs.append(rng)
+    retry_locked(lambda: Vehicle.objects.bulk_create(vehicles, batch_size=plan.batch_size))
+    for vehicle, rng in zip(vehicles, rngs):
+        contracts.append(build_contract(plan, vehicle, rng))
+    retry_locked(lambda: Contract.objects.bulk_create(contracts, batch_size=plan.batch_size))
+
+    writer = BookingWriter(plan)
+    for index, vehicle, contract, rng in zip(indexes, vehicles, contracts, rngs):
+        writer.add_vehicle(index, vehicle, contract, rng)
+    writer.flush()
+
+    # Yozuvlar signalsiz kiritildi: mashina holati shu yerda qayta hisoblanadi
+    vehicle_ids = [vehicle.pk for vehicle in vehicles]
+    for position in range(0, len(vehicle_ids), CHUNK_SIZE):
+        chunk = vehicle_ids[position:position + CHUNK_SIZE]
+        retry_locked(lambda: Vehicle.objects.filter(id__in=chunk).update(status=vehicle_status_expression()))
+    return {
+        'vehicles': len(vehicles), 'contracts': len(contracts), 'bookings': writer.written,
+        'payments': writer.payments_written, 'daily_earnings': writer.rollup_written,
+    }
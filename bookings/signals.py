@@ -1,23 +1,79 @@
-from django.db.models.signals import post_save, pre_save
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, pre_save, pre_delete, post_delete
 from django.dispatch import receiver
 from .models import Booking
-from vehicles.models import Vehicle
+from .payment_models import Payment
+from .availability import availability_index
+from .earnings import apply_rollup_change, load_rollup_state
+from vehicles.status import mark_vehicle_dirty
+from diagnostics.metrics import timed_handler
 
 @receiver(post_save, sender=Booking)
-def update_vehicle_status_on_booking_change(sender, instance, created, **kwargs):
-    """Update vehicle status based on booking status"""
-    vehicle = instance.vehicle
-    
-    if instance.status == 'active':
-        vehicle.status = 'rented'
-    elif instance.status in ['completed', 'cancelled']:
-        # Check if there are other active bookings for this vehicle
-        active_bookings = Booking.objects.filter(
-            vehicle=vehicle,
-            status='active'
-        ).exclude(id=instance.id)
-        
-        if not active_bookings.exists():
-            vehicle.status = 'available'
-    
-    vehicle.save(update_fields=['status'])
+@timed_handler
+def update_vehicle_status_on_booking_change(sender, instance, using, **kwargs):
+    """Recompute vehicle status when the booking's transaction commits"""
+    mark_vehicle_dirty(instance.vehicle_id, using)
+
+
+@receiver(post_delete, sender=Booking)
+@timed_handler
+def update_vehicle_status_on_booking_delete(sender, instance, using, **kwargs):
+    """Recompute vehicle status after a booking is deleted"""
+    mark_vehicle_dirty(instance.vehicle_id, using)
+
+
+@receiver(post_save, sender=Booking)
+@timed_handler
+def update_availability_index_on_save(sender, instance, using, **kwargs):
+    """Apply the booking to the in-memory availability index once it is committed"""
+    # Values as saved; the instance may change again before the commit
+    values = (instance.pk, instance.vehicle_id, instance.status, instance.start_at, instance.end_at)
+    transaction.on_commit(lambda: availability_index.update_booking(*values), using=using)
+
+
+@receiver(post_delete, sender=Booking)
+@timed_handler
+def update_availability_index_on_delete(sender, instance, using, **kwargs):
+    """Drop deleted bookings from the in-memory availability index once committed"""
+    booking_id = instance.pk
+    transaction.on_commit(lambda: availability_index.remove_booking(booking_id), using=using)
+
+
+@receiver(pre_save, sender=Booking)
+@timed_handler
+def remember_daily_earnings_before_save(sender, instance, using, **kwargs):
+    """Contribution to DailyEarnings before the change (no query for loaded bookings)"""
+    instance._rollup_before_save = load_rollup_state(instance, using)
+
+
+@receiver(post_save, sender=Booking)
+@timed_handler
+def update_daily_earnings_on_save(sender, instance, using, **kwargs):
+    """Apply the change of a booking's earnings to the DailyEarnings rollup"""
+    apply_rollup_change(instance, instance.__dict__.pop('_rollup_before_save', None), using)
+
+
+@receiver(pre_delete, sender=Booking)
+@timed_handler
+def remember_daily_earnings_before_delete(sender, instance, using, **kwargs):
+    instance._rollup_before_delete = load_rollup_state(instance, using)
+
+
+@receiver(post_delete, sender=Booking)
+@timed_handler
+def update_daily_earnings_on_delete(sender, instance, using, origin=None, **kwargs):
+    """Subtract a deleted booking from the DailyEarnings rollup"""
+    # Deleting the vehicle or owner cascades to the rollup rows before the bookings
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    apply_rollup_change(
+        instance, instance.__dict__.pop('_rollup_before_delete', None), using,
+        deleted=True, cascade=origin_model is not Booking,
+    )
+
+
+@receiver(post_delete, sender=Payment)
+@timed_handler
+def update_paid_amount_on_payment_delete(sender, instance, **kwargs):
+    """Subtract a deleted payment from the booking's paid amount"""
+    Booking.apply_paid_amount_delta(instance.booking_id, -instance.amount)
@@ -1,3 +1,804 @@
-from django.test import TestCase
+import csv
+import gzip
+import json
+import os
+import tempfile
+import threading
+import tracemalloc
+from io import StringIO
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models import Q
+from django.test import RequestFactory, TestCase, TransactionTestCase, tag
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from pagination import CursorPaginator, decode_cursor
+from contracts.models import Contract
+from vehicles.models import Vehicle
+from .availability import VehicleIntervals, availability_index
+from .forms import BookingForm
+from .earnings import rebuild_daily_earnings
+from .export import stream_export
+from .models import Booking, BookingConflictError, DailyEarnings, Payment
+from .views import BookingListView
+import utils
+
+
+class BookingTestMixin:
+    def setUp(self):
+        availability_index.clear()
+        self.owner = CustomUser.objects.create_user(username='owner', password='x', role='owner')
+        self.renter = CustomUser.objects.create_user(username='renter', password='x', role='renter')
+        self.vehicle = Vehicle.objects.create(
+            owner=self.owner,
+            plate_number='01 A 123 BC',
+            daily_price=Decimal('300000.00'),
+            status='available',
+        )
+        self.now = timezone.now().replace(microsecond=0)
+
+    def make_booking(self, start_hours, end_hours, status='pending', vehicle=None):
+        return Booking.objects.create(
+            renter=self.renter,
+            vehicle=vehicle or self.vehicle,
+            start_at=self.now + timedelta(hours=start_hours),
+            end_at=self.now + timedelta(hours=end_hours),
+            status=status,
+        )
+
+    def window(self, start_hours, end_hours):
+        return self.now + timedelta(hours=start_hours), self.now + timedelta(hours=end_hours)
+
+
+class VehicleIntervalsTests(TestCase):
+    def test_conflicts_with_nested_and_adjacent_intervals(self):
+        intervals = VehicleIntervals([(0, 100, 1), (10, 20, 2), (150, 160, 3)])
+        self.assertTrue(intervals.conflicts(30, 40))
+        self.assertTrue(intervals.conflicts(155, 200))
+        self.assertFalse(intervals.conflicts(100, 150))
+        self.assertFalse(intervals.conflicts(30, 40, exclude_booking_id=1))
+
+    def test_add_and_remove(self):
+        intervals = VehicleIntervals()
+        intervals.add(5, 10, 1)
+        self.assertTrue(intervals.conflicts(9, 12))
+        intervals.remove(1)
+        self.assertFalse(intervals.conflicts(9, 12))
+
+
+class AvailabilityIndexTests(BookingTestMixin, TestCase):
+    def test_index_follows_booking_saves_and_deletes(self):
+        self.assertTrue(availability_index.is_free(self.vehicle.pk, *self.window(1, 5)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = self.make_booking(2, 4)
+        self.assertFalse(availability_index.is_free(self.vehicle.pk, *self.window(1, 5)))
+
+        booking.status = 'cancelled'
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.save()
+        self.assertTrue(availability_index.is_free(self.vehicle.pk, *self.window(1, 5)))
+
+        booking.status = 'active'
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.save()
+        self.assertFalse(availability_index.is_free(self.vehicle.pk, *self.window(1, 5)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.delete()
+        self.assertTrue(availability_index.is_free(self.vehicle.pk, *self.window(1, 5)))
+
+    def test_rolled_back_booking_leaves_no_interval(self):
+        self.assertTrue(availability_index.is_free(self.vehicle.pk, *self.window(1, 5)))
+        with self.captureOnCommitCallbacks(execute=True), self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.make_booking(2, 4)
+                raise RuntimeError
+        self.assertTrue(availability_index.is_free(self.vehicle.pk, *self.window(1, 5)))
+
+    def test_booking_committed_during_load_is_not_lost(self):
+        committed = []
+
+        def commit_during_query(execute, sql, params, many, context):
+            result = execute(sql, params, many, context)
+            if not committed and 'FROM "bookings_booking"' in sql:
+                # Boshqa thread so'rov o'qilgandan keyin bron yaratib commit qiladi
+                with self.captureOnCommitCallbacks(execute=True):
+                    committed.append(self.make_booking(2, 4))
+            return result
+
+        with connection.execute_wrapper(commit_during_query):
+            availability_index.load([self.vehicle.pk])
+        self.assertEqual(len(committed), 1)
+        with self.assertNumQueries(0):
+            self.assertFalse(availability_index.is_free(self.vehicle.pk, *self.window(1, 5)))
+
+    def test_lookups_do_not_query_once_loaded(self):
+        self.make_booking(2, 4)
+        availability_index.load([self.vehicle.pk])
+        with self.assertNumQueries(0):
+            availability_index.is_free(self.vehicle.pk, *self.window(1, 5))
+
+    def test_get_available_vehicles_and_check_availability(self):
+        other = Vehicle.objects.create(
+            owner=self.owner,
+            plate_number='01 B 456 CD',
+            daily_price=Decimal('200000.00'),
+            status='available',
+        )
+        booking = self.make_booking(2, 4)
+
+        available = utils.get_available_vehicles(*self.window(3, 6))
+        self.assertEqual(list(available), [other])
+        available = utils.get_available_vehicles(*self.window(3, 6), exclude_booking_id=booking.pk)
+        self.assertCountEqual(available, [self.vehicle, other])
+
+        self.assertEqual(
+            utils.check_vehicle_availability(self.vehicle, *self.window(3, 6)),
+            (False, "Bu vaqtda mashina band"),
+        )
+        self.assertEqual(
+            utils.check_vehicle_availability(self.vehicle, *self.window(4, 6)),
+            (True, "Mashina mavjud"),
+        )
+
+    def test_booking_form_rejects_overlap(self):
+        self.make_booking(2, 4)
+        start_at, end_at = self.window(3, 6)
+        form = BookingForm(data={
+            'renter': self.renter.pk,
+            'vehicle': self.vehicle.pk,
+            'start_at': start_at.strftime('%Y-%m-%dT%H:%M'),
+            'end_at': end_at.strftime('%Y-%m-%dT%H:%M'),
+            'deposit_amount': '0.00',
+            'total_price': '0.00',
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn("Bu vaqtda mashina band.", form.non_field_errors())
+
+
+class BookingReservationTests(BookingTestMixin, TransactionTestCase):
+    def test_reserve_rejects_overlap(self):
+        self.make_booking(2, 4)
+        start_at, end_at = self.window(3, 6)
+        booking = Booking(renter=self.renter, vehicle=self.vehicle, start_at=start_at, end_at=end_at)
+        with self.assertRaises(BookingConflictError):
+            booking.reserve()
+        self.assertIsNone(booking.pk)
+
+    def test_concurrent_reservations_have_one_winner(self):
+        workers = 8
+        start_at, end_at = self.window(1, 5)
+        barrier = threading.Barrier(workers)
+        outcomes = []
+
+        def reserve():
+            try:
+                booking = Booking(renter=self.renter, vehicle=self.vehicle, start_at=start_at, end_at=end_at)
+                barrier.wait()
+                try:
+                    booking.reserve(max_attempts=50)
+                    outcomes.append('won')
+                except BookingConflictError:
+                    outcomes.append('conflict')
+            except Exception as e:
+                outcomes.append(repr(e))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=reserve) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(outcomes), ['conflict'] * (workers - 1) + ['won'])
+        self.assertEqual(Booking.objects.filter(vehicle=self.vehicle).count(), 1)
+
+
+class QueryPlanTests(BookingTestMixin, TestCase):
+    """EXPLAIN QUERY PLAN checks: filtered booking queries must search the expected index"""
+
+    def assertSearches(self, queryset, index, ordered=False):
+        plan = queryset.explain()
+        lines = [line for line in plan.splitlines() if 'bookings_booking' in line]
+        self.assertTrue(lines, plan)
+        self.assertRegex(lines[0], rf'SEARCH bookings_booking USING (COVERING )?INDEX {index} ', plan)
+        if ordered:
+            self.assertNotIn('TEMP B-TREE', plan, f"Sort without index:\n{plan}")
+
+    def list_queryset(self, **params):
+        request = RequestFactory().get('/bookings/', params)
+        view = BookingListView()
+        view.setup(request)
+        return view.get_queryset()
+
+    def test_overlap_queries(self):
+        start_at, end_at = self.window(1, 5)
+        overlapping = Booking.objects.filter(
+            status__in=['pending', 'active'], start_at__lt=end_at, end_at__gt=start_at
+        ).order_by()
+        self.assertSearches(overlapping.filter(vehicle=self.vehicle), 'booking_vehicle_overlap_idx')
+        self.assertSearches(overlapping.values_list('vehicle_id', flat=True), 'booking_status_overlap_idx')
+        self.assertSearches(
+            Booking.objects.filter(status__in=['pending', 'active'], vehicle_id__in=[self.vehicle.pk])
+            .values_list('id', 'vehicle_id', 'start_at', 'end_at').order_by(),
+            'booking_vehicle_overlap_idx',
+        )
+
+    def test_booking_list_queries(self):
+        plan = self.list_queryset()[:20].explain()
+        self.assertIn('SCAN bookings_booking USING INDEX booking_created_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+        self.assertSearches(self.list_queryset(status='active')[:20], 'booking_status_created_idx', ordered=True)
+        self.assertSearches(
+            self.list_queryset(payment_status='paid')[:20], 'booking_payment_created_idx', ordered=True
+        )
+        today = timezone.localdate().isoformat()
+        self.assertSearches(self.list_queryset(start_date=today, end_date=today)[:20], 'booking_period_idx')
+        self.assertSearches(
+            self.list_queryset(status='active', start_date=today, end_date=today)[:20],
+            'booking_status_overlap_idx',
+        )
+
+    def test_vehicle_and_contract_history(self):
+        self.assertSearches(self.vehicle.bookings.all()[:10], 'booking_vehicle_created_idx', ordered=True)
+        contract = Contract.objects.create(
+            owner=self.owner, vehicle=self.vehicle, start_date=timezone.localdate(),
+            pricing_type='share', owner_share_percent=Decimal('80.00'),
+            company_share_percent=Decimal('20.00'),
+        )
+        bookings = contract.vehicle.bookings.filter(
+            start_at__gte=utils.start_of_day(contract.start_date),
+            start_at__lt=utils.start_of_day(contract.start_date + timedelta(days=30)),
+        )
+        self.assertSearches(bookings[:20], 'booking_vehicle_created_idx', ordered=True)
+
+
+class BookingSearchTests(BookingTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.renter.first_name = 'Alisher'
+        self.renter.last_name = 'Karimov'
+        self.renter.phone = '+998 90 123 45 67'
+        self.renter.save()
+        self.other = CustomUser.objects.create_user(username='bobur', password='x', role='renter')
+        self.other_vehicle = Vehicle.objects.create(
+            owner=self.owner, plate_number='30 Z 777 ZZ', name='Malibu', daily_price=Decimal('100.00'),
+        )
+        self.booking = self.make_booking(1, 5)
+        self.other_booking = Booking.objects.create(
+            renter=self.other, vehicle=self.other_vehicle,
+            start_at=self.now + timedelta(hours=1), end_at=self.now + timedelta(hours=5),
+        )
+
+    def search(self, text):
+        request = RequestFactory().get('/bookings/', {'search': text})
+        view = BookingListView()
+        view.setup(request)
+        return list(view.get_queryset())
+
+    def test_search_matches_renters_and_vehicles(self):
+        self.assertEqual(self.search('alish'), [self.booking])
+        self.assertEqual(self.search('KARIMOV'), [self.booking])
+        self.assertEqual(self.search('998 90'), [self.booking])
+        self.assertEqual(self.search('01 A 123'), [self.booking])
+        self.assertEqual(self.search('01a123'), [self.booking])
+        self.assertEqual(self.search('malibu'), [self.other_booking])
+        self.assertEqual(self.search('nobody'), [])
+        self.assertEqual(self.search('"*'), [])
+
+    def test_search_matches_phone_and_plate_suffixes(self):
+        self.assertEqual(self.search('4567'), [self.booking])
+        self.assertEqual(self.search('45 67'), [self.booking])
+        self.assertEqual(self.search('67'), [self.booking])
+        self.assertEqual(self.search('777ZZ'), [self.other_booking])
+        self.renter.phone = '+998 93 000 11 22'
+        self.renter.save()
+        self.assertEqual(self.search('4567'), [])
+        self.assertEqual(self.search('1122'), [self.booking])
+
+    def test_index_follows_renames(self):
+        self.other.last_name = 'Toshmatov'
+        self.other.save()
+        self.assertEqual(self.search('toshmat'), [self.other_booking])
+        self.other_vehicle.delete()
+        self.assertEqual(self.search('malibu'), [])
+
+
+class CursorPaginationTests(BookingTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.bookings = [self.make_booking(i * 10, i * 10 + 5) for i in range(45)]
+        self.expected = sorted(self.bookings, key=lambda b: (b.created_at, b.pk), reverse=True)
+
+    def get_page(self, query=''):
+        response = self.client.get('/bookings/?' + query)
+        return response, list(response.context['bookings'])
+
+    def test_walks_forward_and_back(self):
+        response, page = self.get_page()
+        pages = [page]
+        self.assertEqual(response.context['estimated_total'], (45, False))
+        self.assertIsNone(response.context['previous_page_query'])
+        while response.context['next_page_query']:
+            response, page = self.get_page(response.context['next_page_query'])
+            pages.append(page)
+        self.assertEqual([len(page) for page in pages], [20, 20, 5])
+        self.assertIsNone(response.context['estimated_total'])
+        self.assertEqual([b for page in pages for b in page], self.expected)
+
+        response, page = self.get_page(response.context['previous_page_query'])
+        self.assertEqual(page, pages[1])
+        response, page = self.get_page(response.context['previous_page_query'])
+        self.assertEqual(page, pages[0])
+        self.assertIsNone(response.context['previous_page_query'])
+
+    def test_cursor_keeps_filters_and_ignores_bad_tokens(self):
+        response, _ = self.get_page('status=pending')
+        self.assertIn('status=pending', response.context['next_page_query'])
+        response, page = self.get_page('cursor=not-a-cursor')
+        self.assertEqual(page, self.expected[:20])
+
+    def test_deep_pages_use_the_created_index(self):
+        paginator = CursorPaginator(Booking.objects.all(), 20)
+        token = paginator.page().next_cursor
+        created_at, pk, _ = decode_cursor(token)
+        queryset = Booking.objects.filter(created_at__lte=created_at).filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        ).order_by('-created_at', '-id')[:21]
+        QueryPlanTests.assertSearches(self, queryset, 'booking_created_idx', ordered=True)
+
+
+class VehicleStatusCascadeTests(BookingTestMixin, TestCase):
+    def save_status(self, booking, status):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                booking.status = status
+                booking.save()
+
+    def test_status_follows_bookings(self):
+        booking = self.make_booking(0, 4)
+        other = self.make_booking(5, 8)
+
+        self.save_status(booking, 'active')
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.status, 'rented')
+
+        self.save_status(other, 'active')
+        self.save_status(booking, 'completed')
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.status, 'rented')
+
+        self.save_status(other, 'cancelled')
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.status, 'available')
+
+    def test_status_change_runs_a_fixed_number_of_queries(self):
+        booking = self.make_booking(0, 4)
+        # SAVEPOINT, booking UPDATE, RELEASE, one vehicle UPDATE on commit
+        with self.assertNumQueries(4):
+            self.save_status(booking, 'active')
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.status, 'rented')
+
+    def test_inactive_vehicle_becomes_available_with_contract(self):
+        self.vehicle.status = 'inactive'
+        self.vehicle.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            Contract.objects.create(
+                owner=self.owner, vehicle=self.vehicle, start_date=timezone.localdate(),
+                pricing_type='share', owner_share_percent=Decimal('80.00'),
+                company_share_percent=Decimal('20.00'),
+            )
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.status, 'available')
+
+
+class PaymentLedgerTests(BookingTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.booking = self.make_booking(0, 24)
+        self.booking.total_price = Decimal('300000.00')
+        self.booking.save()
+
+    def test_payments_update_paid_amount_without_aggregating(self):
+        with self.assertNumQueries(4):
+            self.booking.add_payment(Decimal('100000.00'))
+        self.assertEqual(self.booking.payment_status, 'partial')
+
+        payment = Payment.objects.create(booking=self.booking, amount=Decimal('200000.00'), payment_type='final')
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.paid_amount, Decimal('300000.00'))
+        self.assertEqual(self.booking.payment_status, 'paid')
+
+        payment.amount = Decimal('50000.00')
+        payment.save()
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.paid_amount, Decimal('150000.00'))
+
+        payment.delete()
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.paid_amount, Decimal('100000.00'))
+        self.assertEqual(self.booking.payment_status, 'partial')
+
+    def test_stale_save_keeps_paid_amount(self):
+        stale = Booking.objects.get(pk=self.booking.pk)
+        self.booking.add_payment(Decimal('300000.00'))
+
+        stale.status = 'active'
+        stale.save()
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, 'active')
+        self.assertEqual(stale.paid_amount, Decimal('300000.00'))
+        self.assertEqual(stale.payment_status, 'paid')
+
+    def test_total_price_change_recomputes_payment_status(self):
+        stale = Booking.objects.get(pk=self.booking.pk)
+        self.booking.add_payment(Decimal('300000.00'))
+
+        stale.total_price = Decimal('400000.00')
+        stale.save()
+        self.assertEqual(stale.paid_amount, Decimal('300000.00'))
+        self.assertEqual(stale.payment_status, 'partial')
+        self.assertEqual(Booking.objects.get(pk=stale.pk).payment_status, 'partial')
+
+    def test_edit_form_keeps_paid_amount(self):
+        self.booking.add_payment(Decimal('100000.00'))
+        admin = CustomUser.objects.create_user(username='boss', password='x', role='admin', is_staff=True)
+        self.client.force_login(admin)
+        start_at, end_at = self.booking.start_at, self.booking.end_at
+        response = self.client.post(reverse('booking_update', args=[self.booking.pk]), {
+            'renter': self.renter.pk,
+            'vehicle': self.vehicle.pk,
+            'start_at': timezone.localtime(start_at).strftime('%Y-%m-%dT%H:%M'),
+            'end_at': timezone.localtime(end_at).strftime('%Y-%m-%dT%H:%M'),
+            'deposit_amount': '0.00',
+            'total_price': '300000.00',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.paid_amount, Decimal('100000.00'))
+        self.assertEqual(self.booking.payment_status, 'partial')
+
+    def test_reconcile_payments_fixes_drift(self):
+        self.booking.add_payment(Decimal('300000.00'))
+        Booking.objects.filter(pk=self.booking.pk).update(paid_amount=Decimal('0.00'), payment_status='unpaid')
+
+        out = StringIO()
+        call_command('reconcile_payments', '--dry-run', stdout=out)
+        self.assertIn('found 1 with drift', out.getvalue())
+
+        call_command('reconcile_payments', '--chunk-size', '1', stdout=StringIO())
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.paid_amount, Decimal('300000.00'))
+        self.assertEqual(self.booking.payment_status, 'paid')
+
+
+class RecomputeEarningsTests(BookingTestMixin, TestCase):
+    def test_recompute_earnings_updates_stale_rows(self):
+        Contract.objects.create(
+            owner=self.owner, vehicle=self.vehicle, start_date=timezone.localdate() - timedelta(days=1),
+            pricing_type='share', owner_share_percent=Decimal('70.00'),
+            company_share_percent=Decimal('30.00'),
+        )
+        booking = self.make_booking(0, 24)
+        Booking.objects.filter(pk=booking.pk).update(total_price=Decimal('333333.33'))
+
+        out = StringIO()
+        call_command('recompute_earnings', '--chunk-size', '1', '--vehicle', str(self.vehicle.pk), stdout=out)
+        self.assertIn('updated 1', out.getvalue())
+        self.assertIn('rows/s', out.getvalue())
+        booking.refresh_from_db()
+        self.assertEqual(booking.owner_earned, Decimal('233333.33'))
+        self.assertEqual(booking.company_earned, Decimal('100000.00'))
+
+        out = StringIO()
+        call_command('recompute_earnings', stdout=out)
+        self.assertIn('updated 0', out.getvalue())
+
+
+class EarningsSummaryTests(BookingTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        for start, amount in ((0, '100000.00'), (48, '200000.55')):
+            booking = self.make_booking(start, start + 24, status='completed')
+            booking.total_price = Decimal(amount)
+            booking.owner_earned = (Decimal(amount) * Decimal('0.8')).quantize(Decimal('0.01'))
+            booking.company_earned = (Decimal(amount) * Decimal('0.2')).quantize(Decimal('0.01'))
+            booking.save()
+        self.make_booking(100, 120, status='active')
+
+    def test_summaries_use_one_aggregate_query(self):
+        with self.assertNumQueries(1):
+            summary = utils.get_vehicle_earnings_summary(self.vehicle)
+        self.assertEqual(summary, {
+            'total_earnings': Decimal('300000.55'),
+            'owner_earnings': Decimal('240000.44'),
+            'company_earnings': Decimal('60000.11'),
+            'booking_count': 2,
+        })
+
+        with self.assertNumQueries(2):
+            summary = utils.get_owner_earnings_summary(self.owner)
+        self.assertEqual(summary['booking_count'], 2)
+        self.assertEqual(summary['vehicles_count'], 1)
+
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        summary = utils.get_company_earnings_summary(end_date=tomorrow)
+        self.assertEqual(summary['booking_count'], 1)
+        self.assertEqual(summary['total_earnings'], Decimal('20000.00'))
+
+    def test_empty_summary(self):
+        summary = utils.get_company_earnings_summary(start_date=timezone.localdate() + timedelta(days=30))
+        self.assertEqual(summary['total_earnings'], Decimal('0.00'))
+        self.assertEqual(summary['booking_count'], 0)
+
+
+class DailyEarningsTests(BookingTestMixin, TestCase):
+    def complete(self, booking, total, owner, company):
+        booking.status = 'completed'
+        booking.total_price = Decimal(total)
+        booking.owner_earned = Decimal(owner)
+        booking.company_earned = Decimal(company)
+        booking.save()
+
+    def rollup(self):
+        return list(DailyEarnings.objects.values_list(
+            'day', 'total_earnings', 'owner_earnings', 'company_earnings', 'booking_count'
+        ))
+
+    def test_rollup_follows_booking_changes(self):
+        day = timezone.localdate(self.window(0, 24)[1])
+        booking = self.make_booking(0, 24)
+        self.assertEqual(self.rollup(), [])
+
+        self.complete(booking, '1000.00', '800.00', '200.00')
+        other = self.make_booking(2, 24)
+        self.complete(other, '500.00', '400.00', '100.00')
+        self.assertEqual(self.rollup(), [(day, Decimal('1500.00'), Decimal('1200.00'), Decimal('300.00'), 2)])
+
+        # A booking loaded from the database remembers its contribution
+        booking = Booking.objects.get(pk=booking.pk)
+        booking.owner_earned = Decimal('700.00')
+        booking.company_earned = Decimal('300.00')
+        booking.save()
+        self.assertEqual(self.rollup(), [(day, Decimal('1500.00'), Decimal('1100.00'), Decimal('400.00'), 2)])
+
+        other.status = 'cancelled'
+        other.save()
+        booking.delete()
+        self.assertEqual(self.rollup(), [(day, Decimal('0.00'), Decimal('0.00'), Decimal('0.00'), 0)])
+
+    def test_deferred_instances_read_their_previous_contribution(self):
+        booking = self.make_booking(0, 24)
+        self.complete(booking, '1000.00', '800.00', '200.00')
+
+        booking = Booking.objects.only('id', 'deposit_amount').get(pk=booking.pk)
+        booking.deposit_amount = Decimal('50.00')
+        booking.save()
+        booking = Booking.objects.only('id', 'total_price').get(pk=booking.pk)
+        booking.total_price = Decimal('1200.00')
+        booking.save(update_fields=['total_price'])
+        self.assertEqual(self.rollup()[0][1], Decimal('1200.00'))
+        self.assertEqual(self.rollup()[0][4], 1)
+
+    def test_rebuild_matches_incremental_rollup(self):
+        for start, total in ((0, '1000.00'), (30, '300.00'), (60, '600.00')):
+            self.complete(self.make_booking(start, start + 20), total, '0.00', total)
+        incremental = sorted(self.rollup())
+
+        Booking.objects.update(company_earned=Decimal('1.00'))
+        self.assertEqual(sorted(self.rollup()), incremental)
+        self.assertEqual(rebuild_daily_earnings([self.vehicle.pk]), 3)
+        self.assertEqual(sum(row[3] for row in self.rollup()), Decimal('3.00'))
+
+        Booking.objects.update(company_earned=Decimal('0.00'))
+        out = StringIO()
+        call_command('backfill_daily_earnings', stdout=out)
+        self.assertIn('Rebuilt 3 daily earnings rows', out.getvalue())
+        self.assertEqual(sum(row[3] for row in self.rollup()), Decimal('0.00'))
+
+    def test_owner_change_moves_rollup_rows(self):
+        booking = self.make_booking(0, 24)
+        self.complete(booking, '1000.00', '800.00', '200.00')
+        new_owner = CustomUser.objects.create_user(username='new_owner', password='x', role='owner')
+
+        self.vehicle.owner = new_owner
+        self.vehicle.save()
+        self.assertEqual(list(DailyEarnings.objects.values_list('owner_id', flat=True)), [new_owner.pk])
+        self.assertEqual(utils.get_owner_earnings_summary(new_owner)['total_earnings'], Decimal('800.00'))
+        self.assertEqual(utils.get_owner_earnings_summary(self.owner)['total_earnings'], Decimal('0.00'))
+
+        # Later changes land on the new owner's row, no warning about a missing row
+        booking = Booking.objects.get(pk=booking.pk)
+        with self.assertNoLogs('bookings.earnings', level='WARNING'):
+            booking.status = 'cancelled'
+            booking.save()
+        self.assertEqual(self.rollup()[0][4], 0)
+
+    def test_recompute_earnings_rekeys_rows_of_bulk_owner_changes(self):
+        self.complete(self.make_booking(0, 24), '1000.00', '800.00', '200.00')
+        new_owner = CustomUser.objects.create_user(username='new_owner', password='x', role='owner')
+        Vehicle.objects.filter(pk=self.vehicle.pk).update(owner=new_owner)
+
+        out = StringIO()
+        call_command('recompute_earnings', stdout=out)
+        self.assertIn('1 vehicle(s) with DailyEarnings under a previous owner', out.getvalue())
+        self.assertEqual(list(DailyEarnings.objects.values_list('owner_id', flat=True)), [new_owner.pk])
+
+    def test_missing_rollup_row_is_logged(self):
+        booking = self.make_booking(0, 24)
+        self.complete(booking, '1000.00', '800.00', '200.00')
+        DailyEarnings.objects.all().delete()
+        with self.assertLogs('bookings.earnings', level='WARNING') as logs:
+            booking.delete()
+        self.assertIn('missing on subtract', logs.output[0])
+
+        # A vehicle delete cascades to the rollup rows first: nothing to report
+        self.complete(self.make_booking(30, 50), '1000.00', '800.00', '200.00')
+        with self.assertNoLogs('bookings.earnings', level='WARNING'):
+            self.vehicle.delete()
+
+    def test_recompute_earnings_refreshes_rollup(self):
+        Contract.objects.create(
+            owner=self.owner, vehicle=self.vehicle, start_date=timezone.localdate() - timedelta(days=1),
+            pricing_type='share', owner_share_percent=Decimal('70.00'),
+            company_share_percent=Decimal('30.00'),
+        )
+        booking = self.make_booking(0, 24)
+        self.complete(booking, '1000.00', '0.00', '0.00')
+
+        call_command('recompute_earnings', stdout=StringIO())
+        self.assertEqual(self.rollup()[0][2:], (Decimal('700.00'), Decimal('300.00'), 1))
+
+
+class ExportTests(BookingTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.renter.first_name = 'Alisher'
+        self.renter.save()
+        self.staff = CustomUser.objects.create_user(username='hisobchi', password='x', role='', is_staff=True)
+        self.booking = self.make_booking(1, 5)
+        self.booking.add_payment(Decimal('1000.00'), 'deposit')
+        old = self.make_booking(10, 15)
+        Booking.objects.filter(pk=old.pk).update(created_at=self.now - timedelta(days=40))
+        self.client.force_login(self.staff)
+
+    def export(self, url_name, **params):
+        response = self.client.get(reverse(url_name), params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def test_booking_csv_with_date_range(self):
+        today = timezone.localdate().isoformat()
+        response, body = self.export('export_bookings', start_date=today, end_date=today)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn(f'bookings_{today}_{today}.csv', response['Content-Disposition'])
+        rows = list(csv.DictReader(body.decode().splitlines()))
+        self.assertEqual([row['id'] for row in rows], [str(self.booking.pk)])
+        self.assertEqual(rows[0]['plate_number'], '01 A 123 BC')
+        self.assertEqual(rows[0]['renter_first_name'], 'Alisher')
+        self.assertEqual(rows[0]['paid_amount'], '1000.00')
+        self.assertEqual(rows[0]['created_at'], self.booking.created_at.isoformat())
+        self.assertEqual(rows[0]['start_at'], self.booking.start_at.isoformat())
+
+        _, body = self.export('export_bookings')
+        self.assertEqual(len(body.decode().splitlines()), 3)
+
+    def test_payment_jsonl_gzip(self):
+        response, body = self.export('export_payments', format='jsonl', gzip='on')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        lines = gzip.decompress(body).decode().splitlines()
+        payment = json.loads(lines[0])
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(payment['booking_id'], self.booking.pk)
+        self.assertEqual(payment['amount'], '1000.00')
+        self.assertEqual(payment['renter'], 'renter')
+
+    def test_invalid_params_and_permissions(self):
+        response = self.client.get(reverse('export_bookings'), {'start_date': 'kecha'})
+        self.assertEqual(response.status_code, 400)
+        self.client.force_login(self.renter)
+        response = self.client.get(reverse('export_bookings'))
+        self.assertRedirects(response, reverse('dashboard'))
+
+    def test_command_writes_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bookings.csv.gz')
+            out = StringIO()
+            call_command('export_history', 'bookings', '--gzip', '-o', path, stdout=out)
+            self.assertIn('Wrote', out.getvalue())
+            with gzip.open(path, 'rt') as exported:
+                self.assertEqual(len(exported.read().splitlines()), 3)
+
+
+@tag('slow')
+class ExportMemoryTests(BookingTestMixin, TestCase):
+    ROWS = 1_000_000
+
+    def test_peak_memory_is_flat_for_1m_rows(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < %s)
+                INSERT INTO bookings_booking (
+                    renter_id, vehicle_id, start_at, end_at, status, payment_status,
+                    total_price, deposit_amount, paid_amount, owner_earned, company_earned,
+                    created_at, updated_at
+                )
+                SELECT %s, %s, datetime('2030-01-01', '+' || x || ' minutes'),
+                       datetime('2030-01-01', '+' || (x + 60) || ' minutes'), 'completed', 'paid',
+                       '300000.00', '0.00', '300000.00', '240000.00', '60000.00',
+                       datetime('2020-01-01', '+' || x || ' seconds'), '2020-01-01 00:00:00'
+                FROM n
+                """,
+                [self.ROWS, self.renter.pk, self.vehicle.pk],
+            )
+
+        tracemalloc.start()
+        try:
+            lines = 0
+            for chunk in stream_export('bookings', 'jsonl'):
+                lines += chunk.count(b'\n')
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(lines, self.ROWS)
+        self.assertLess(peak, 16 * 1024 * 1024)
+
+
+
+class SeedFleetTests(TestCase):
+    def seed(self, prefix='seed'):
+        out = StringIO()
+        call_command(
+            'seed_fleet', '--owners', '3', '--renters', '5', '--vehicles', '8', '--bookings', '400',
+            '--days', '60', '--future-days', '10', '--anchor-date', '2030-03-01', '--prefix', prefix,
+            stdout=out,
+        )
+        return out.getvalue()
+
+    def test_generated_fleet_is_consistent(self):
+        self.assertIn('Seeded 8 vehicles, 8 contracts, 400 bookings', self.seed())
+        self.assertEqual(CustomUser.objects.filter(role='owner').count(), 3)
+        self.assertEqual(set(Contract.objects.values_list('pricing_type', flat=True)), {'share', 'fixed'})
+        self.assertEqual(
+            set(Booking.objects.values_list('status', flat=True)),
+            {'completed', 'cancelled', 'active', 'pending'},
+        )
+
+        bookings = list(Booking.objects.order_by('vehicle_id', 'start_at'))
+        for previous, booking in zip(bookings, bookings[1:]):
+            self.assertLess(booking.start_at, booking.end_at)
+            if previous.vehicle_id == booking.vehicle_id:
+                self.assertLessEqual(previous.end_at, booking.start_at)
+
+        for booking in Booking.objects.filter(status='completed')[:20]:
+            self.assertEqual(sum(payment.amount for payment in booking.payments.all()), booking.paid_amount)
+            self.assertEqual(booking.paid_amount, booking.total_price)
+            self.assertLess(booking.created_at, booking.start_at)
+
+        def rollup():
+            return sorted(DailyEarnings.objects.values_list(
+                'vehicle_id', 'owner_id', 'day', 'total_earnings', 'owner_earnings', 'booking_count',
+            ))
+        seeded = rollup()
+        rebuild_daily_earnings()
+        self.assertEqual(seeded, rollup())
+
+    def test_booking_ids_continue_after_seed(self):
+        self.seed()
+        vehicle = Vehicle.objects.first()
+        renter = CustomUser.objects.filter(role='renter').first()
+        start = timezone.now() + timedelta(days=400)
+        booking = Booking.objects.create(renter=renter, vehicle=vehicle, start_at=start, end_at=start + timedelta(hours=5))
+        self.assertGreater(booking.pk, Booking.objects.exclude(pk=booking.pk).order_by('-id').first().pk)
+        with self.assertRaisesMessage(CommandError, "usernames already exist"):
+            self.seed()
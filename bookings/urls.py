@@ -9,4 +9,6 @@ urlpatterns = [
     path('<int:pk>/delete/', views.BookingDeleteView.as_view(), name='booking_delete'),
     path('<int:pk>/update-status/', views.update_booking_status, name='update_booking_status'),
     path('<int:pk>/update-payment/', views.update_payment_status, name='update_payment_status'),
+    path('export/bookings/', views.export_history, {'kind': 'bookings'}, name='export_bookings'),
+    path('export/payments/', views.export_history, {'kind': 'payments'}, name='export_payments'),
 ]
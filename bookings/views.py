@@ -1,15 +1,19 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.paginator import Paginator
+from django.http import JsonResponse, StreamingHttpResponse
 from django.db.models import Q
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
+from datetime import timedelta
 from decimal import Decimal
-from .models import Booking
-from .forms import BookingForm, BookingSearchForm
+from pagination import CursorPaginationMixin
+from utils import search_user_ids, search_vehicle_ids, start_of_day
+from .models import Booking, BookingConflictError
+from .forms import BookingForm, BookingSearchForm, ExportForm
+from .export import export_filename, stream_export
 
-class BookingListView(ListView):
+class BookingListView(CursorPaginationMixin, ListView):
     model = Booking
     template_name = 'bookings/booking_list.html'
     context_object_name = 'bookings'
@@ -27,17 +31,24 @@ class BookingListView(ListView):
             
             filters = Q()
             if search:
-                filters |= Q(vehicle__make__icontains=search) | Q(vehicle__model__icontains=search) | Q(customer_name__icontains=search) | Q(phone_number__icontains=search) | Q(vehicle__plate_number__icontains=search) | Q(renter__username__icontains=search) | Q(renter__first_name__icontains=search) | Q(renter__last_name__icontains=search)
+                # Full-text index on renters and vehicles instead of LIKE scans over joins
+                filters &= Q(vehicle_id__in=search_vehicle_ids(search)) | Q(renter_id__in=search_user_ids(search))
             if status:
                 filters &= Q(status=status)
             if payment_status:
                 filters &= Q(payment_status=payment_status)
+            # Compare against datetimes so the start_at/end_at indexes can be used
             if start_date:
-                filters &= Q(start_date__gte=start_date)
+                filters &= Q(start_at__gte=start_of_day(start_date))
             if end_date:
-                filters &= Q(end_date__lte=end_date)
+                end_bound = start_of_day(end_date + timedelta(days=1))
+                # start_at < end_at, so the start_at bound is implied; it lets the
+                # planner search booking_period_idx instead of scanning in list order
+                filters &= Q(end_at__lt=end_bound, start_at__lt=end_bound)
                 
             queryset = queryset.filter(filters)
+        # Shablon renter va mashina (marka/model bilan) ma'lumotlarini chiqaradi
+        queryset = queryset.select_related('renter', 'vehicle__make', 'vehicle__model__make')
         return queryset.order_by('-created_at', '-id')
 
     def get_context_data(self, **kwargs):
@@ -60,10 +71,9 @@ class BookingCreateView(CreateView):
             # Set default values if not provided
             if not booking.deposit_amount:
                 booking.deposit_amount = Decimal('0.00')
-            if not booking.paid_amount:
-                booking.paid_amount = Decimal('0.00')
                 
-            booking.save()
+            # Overlap check and insert happen in one transaction
+            booking.reserve()
             form.save_m2m()  # In case there are many-to-many fields
             
             # Get vehicle display name safely
@@ -78,6 +88,9 @@ class BookingCreateView(CreateView):
             )
             return redirect('booking_list')
             
+        except BookingConflictError as e:
+            form.add_error(None, e)
+            return self.form_invalid(form)
         except Exception as e:
             import traceback
             error_message = f'Xatolik yuz berdi: {str(e)}\n{traceback.format_exc()}'
@@ -111,8 +124,14 @@ class BookingUpdateView(UpdateView):
     success_url = reverse_lazy('booking_list')
 
     def form_valid(self, form):
+        self.object = form.save(commit=False)
+        try:
+            self.object.reserve()
+        except BookingConflictError as e:
+            form.add_error(None, e)
+            return self.form_invalid(form)
         messages.success(self.request, 'Booking muvaffaqiyatli yangilandi!')
-        return super().form_valid(form)
+        return redirect(self.get_success_url())
 
 class BookingDeleteView(DeleteView):
     model = Booking
@@ -161,7 +180,7 @@ def update_booking_status(request, pk):
     new_status = request.POST.get('status')
     if new_status in ['pending', 'active', 'completed', 'cancelled']:
         booking.status = new_status
-        booking.save()
+        booking.save(update_fields=['status', 'updated_at'])
         
         status_names = {
             'pending': 'kutilmoqda',
@@ -191,7 +210,8 @@ def update_payment_status(request, pk):
     new_status = request.POST.get('payment_status')
     if new_status in ['unpaid', 'partial', 'paid']:
         booking.payment_status = new_status
-        booking.save()
+        # Qo'lda belgilangan holat; paid_amount faqat to'lovlar orqali o'zgaradi
+        booking.save(update_fields=['payment_status', 'updated_at'])
         
         status_names = {
             'unpaid': 'to\'lanmagan',
@@ -202,3 +222,34 @@ def update_payment_status(request, pk):
         messages.success(request, f'To\'lov holati "{status_names[new_status]}" ga o\'zgartirildi!')
     
     return redirect('booking_detail', pk=pk)
+
+
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+
+@login_required
+def export_history(request, kind):
+    """Stream the booking or payment history as CSV/JSONL (optionally gzip)"""
+    if not request.user.is_staff:
+        messages.error(request, 'Bu sahifani ko\'rish huquqingiz yo\'q.')
+        return redirect('dashboard')
+    
+    form = ExportForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'error': "Parametrlar noto'g'ri", 'details': form.errors}, status=400)
+    
+    fmt = form.cleaned_data['format']
+    start_date = form.cleaned_data['start_date']
+    end_date = form.cleaned_data['end_date']
+    compress = form.cleaned_data['gzip']
+    response = StreamingHttpResponse(
+        stream_export(kind, fmt, start_date, end_date, compress),
+        content_type='application/gzip' if compress else EXPORT_CONTENT_TYPES[fmt],
+    )
+    filename = export_filename(kind, fmt, start_date, end_date, compress)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
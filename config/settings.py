@@ -43,9 +43,12 @@ INSTALLED_APPS = [
     'bookings',
     'contracts',
     'constants',
+    'diagnostics',
+    'benchmarks',
 ]
 
 MIDDLEWARE = [
+    "diagnostics.middleware.QueryBudgetMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -53,6 +56,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "diagnostics.profiling.ProfilingMiddleware",
 ]
 
 ROOT_URLCONF = "config.urls"
@@ -156,3 +160,80 @@ MESSAGE_TAGS = {
     messages.WARNING: 'warning',
     messages.ERROR: 'error',
 }
+
+# Availability index: seconds after which a vehicle's cached booking intervals are reloaded
+AVAILABILITY_INDEX_TTL = 30
+
+# Contract timelines: seconds after which a vehicle's cached contracts are reloaded
+CONTRACT_TIMELINE_TTL = 300
+
+# Dashboard counters: seconds they stay cached (dropped earlier on model changes)
+DASHBOARD_STATS_TTL = 60
+
+# System constants: seconds after which the memoized Constant row is reloaded
+# (changes are seen at once through the version stamp in the shared cache)
+CONSTANTS_CACHE_TTL = 60
+
+# 'default' is per process. 'shared' is a file cache every worker process on
+# the host reads (gunicorn workers), for version stamps that tell the other
+# processes to drop their memoized copies; SHARED_CACHE_DIR moves it.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('SHARED_CACHE_DIR') or os.path.join(BASE_DIR, 'cache'),
+    },
+}
+
+# Request diagnostics: SQL query count/time, repeated queries and view time of
+# every request go to the Server-Timing header and the 'diagnostics.requests'
+# log. Budgets are per URL name; with QUERY_BUDGET_RAISE=1 in the environment
+# exceeding 'queries' or 'duplicates' raises (CI), every other overrun logs a
+# warning. `manage.py test` turns raising on through config.test_runner, and
+# the budget tests do so themselves with override_settings.
+TEST_RUNNER = 'config.test_runner.TestRunner'
+SERVER_TIMING_HEADER = True
+QUERY_BUDGET_RAISE = os.environ.get('QUERY_BUDGET_RAISE') == '1'
+QUERY_BUDGETS = {
+    'booking_list': {'queries': 8, 'duplicates': 0, 'sql_ms': 200, 'total_ms': 800},
+    'vehicle_list': {'queries': 8, 'duplicates': 0, 'sql_ms': 200, 'total_ms': 800},
+    'dashboard': {'queries': 8, 'duplicates': 0, 'sql_ms': 100, 'total_ms': 500},
+}
+
+# On-demand profiling: a staff user on the ProfilerAccess allow-list (admin)
+# adds ?_profile=cprofile|sample or an X-Profile header to a request; the
+# pstats and collapsed-stack files go to MEDIA_ROOT/profiles/.
+PROFILING_ENABLED = True
+PROFILING_SAMPLE_INTERVAL = 0.005
+PROFILING_KEEP = 200
+
+# Metrics (/metrics, Prometheus text format): with METRICS_DIR every process
+# writes its own mmap file there and /metrics sums them (gunicorn workers);
+# files of exited workers are folded into metrics_aggregate.db. Without it
+# only the current process counts.
+METRICS_DIR = os.environ.get('METRICS_DIR') or None
+# Scrapers allowed without a staff login, matched against REMOTE_ADDR (comma
+# separated). Behind a reverse proxy every request comes from the proxy's
+# address, so list only addresses that cannot be reached through it; empty
+# means staff users only.
+METRICS_ALLOWED_IPS = tuple(ip.strip() for ip in os.environ.get('METRICS_ALLOWED_IPS', '').split(',') if ip.strip())
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(asctime)s %(levelname)s %(name)s %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'message'},
+    },
+    'loggers': {
+        'diagnostics': {
+            'handlers': ['console'],
+            'level': os.environ.get('DIAGNOSTICS_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
@@ -0,0 +1,54 @@
+import logging
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """
+    `manage.py test` runner: query budget overruns raise for the whole suite,
+    the per-request diagnostics log stays quiet and the 'shared' cache lives
+    in a temporary directory instead of the development one. Other runners
+    get the first two with QUERY_BUDGET_RAISE=1 and DIAGNOSTICS_LOG_LEVEL=WARNING
+    and the last with SHARED_CACHE_DIR.
+
+    Tests tagged 'slow' (the million-row export memory test) are skipped
+    unless --slow is passed, RUN_SLOW_TESTS=1 is set or they are selected
+    with --tag slow.
+    """
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--slow', action='store_true', default=os.environ.get('RUN_SLOW_TESTS') == '1',
+            help="Run tests tagged 'slow' too (or set RUN_SLOW_TESTS=1).",
+        )
+
+    def __init__(self, *args, slow=None, tags=None, exclude_tags=None, **kwargs):
+        if slow is None:
+            slow = os.environ.get('RUN_SLOW_TESTS') == '1'
+        if not slow and 'slow' not in (tags or ()):
+            exclude_tags = {*(exclude_tags or ()), 'slow'}
+        super().__init__(*args, tags=tags, exclude_tags=exclude_tags, **kwargs)
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._shared_cache_dir = tempfile.mkdtemp(prefix='shared-cache-')
+        caches = {alias: dict(config) for alias, config in settings.CACHES.items()}
+        caches['shared']['LOCATION'] = self._shared_cache_dir
+        self._budget_override = override_settings(QUERY_BUDGET_RAISE=True, CACHES=caches)
+        self._budget_override.enable()
+        logger = logging.getLogger('diagnostics')
+        self._diagnostics_level = logger.level
+        logger.setLevel(logging.WARNING)
+
+    def teardown_test_environment(self, **kwargs):
+        logging.getLogger('diagnostics').setLevel(self._diagnostics_level)
+        self._budget_override.disable()
+        shutil.rmtree(self._shared_cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -20,26 +20,16 @@ from django.urls import path, include
 from django.shortcuts import redirect, render
 from django.contrib.auth.decorators import login_required
 
+from diagnostics.views import metrics
+
 @login_required
 def dashboard(request):
-    from vehicles.models import Vehicle
-    from bookings.models import Booking
-    from contracts.models import Contract
-    from accounts.models import CustomUser
-    
-    # Mijozlar statistikasi (admin emas)
-    total_users = CustomUser.objects.filter(role__in=['owner', 'renter']).count()
-    owner_count = CustomUser.objects.filter(role='owner').count()
-    renter_count = CustomUser.objects.filter(role='renter').count()
+    from accounts.dashboard import get_dashboard_stats
     
+    # Barcha hisoblagichlar keshdan (har bir jadval uchun bitta so'rov)
     context = {
         'user': request.user,
-        'total_vehicles': Vehicle.objects.count(),
-        'total_bookings': Booking.objects.count(),
-        'total_contracts': Contract.objects.count(),
-        'total_users': total_users,
-        'owner_count': owner_count,
-        'renter_count': renter_count,
+        **get_dashboard_stats(),
     }
     
     return render(request, 'accounts/dashboard.html', context)
@@ -51,6 +41,7 @@ urlpatterns = [
     path("admin/", admin.site.urls),
     path("", redirect_to_dashboard),
     path("dashboard/", dashboard, name="dashboard"),
+    path("metrics", metrics, name="metrics"),
     path("accounts/", include("accounts.urls")),
     path("vehicles/", include("vehicles.urls")),
     path("contracts/", include("contracts.urls")),
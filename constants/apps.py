@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ConstantsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "constants"
+
+    def ready(self):
+        import constants.signals
@@ -0,0 +1,87 @@
+"""
+Process-local cache of the Constant singleton
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from diagnostics.metrics import record_cache
+
+VERSION_KEY = 'constants:version'
+# Every worker process must see the stamp, so it lives in the 'shared' cache
+STAMP_CACHE = 'shared'
+
+
+def version_of(constants):
+    return constants.updated_at.isoformat() if constants.updated_at else ''
+
+
+class SystemConstantsCache:
+    """
+    The Constant row memoized per process.
+
+    Every save stores the row's updated_at as a version stamp in the 'shared'
+    cache, which all worker processes read. A lookup compares the stamp with
+    the memoized row (one cache get, no query) and reloads on mismatch; the
+    row is also reloaded after CONSTANTS_CACHE_TTL seconds in case a stamp
+    write was lost.
+
+    The returned instance is shared; treat it as read-only.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._constants = None
+        self._version = None
+        self._loaded_at = 0.0
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'CONSTANTS_CACHE_TTL', 60)
+
+    @property
+    def version(self):
+        """Version stamp of the settings currently in effect"""
+        return caches[STAMP_CACHE].get(VERSION_KEY) or version_of(self.get())
+
+    def get(self):
+        """Return the Constant row, creating it with default values if missing"""
+        constants = self._constants
+        stamp = caches[STAMP_CACHE].get(VERSION_KEY)
+        if (
+            constants is None
+            or time.monotonic() - self._loaded_at >= self.ttl
+            or (stamp is not None and stamp != self._version)
+        ):
+            record_cache('system_constants', misses=1)
+            constants = self.load(stamp)
+        else:
+            record_cache('system_constants', hits=1)
+        return constants
+
+    def load(self, stamp=None):
+        from .models import Constant
+
+        constants = Constant.objects.first() or Constant.objects.create()
+        if stamp is None:
+            stamp = version_of(constants)
+            caches[STAMP_CACHE].add(VERSION_KEY, stamp, None)
+        with self._lock:
+            self._constants = constants
+            self._version = stamp
+            self._loaded_at = time.monotonic()
+        return constants
+
+    def invalidate(self, constants=None):
+        """Drop the memoized row and publish the new version stamp to other processes"""
+        with self._lock:
+            self._constants = None
+        if constants is not None:
+            caches[STAMP_CACHE].set(VERSION_KEY, version_of(constants), None)
+        else:
+            caches[STAMP_CACHE].delete(VERSION_KEY)
+
+
+system_constants = SystemConstantsCache()
@@ -0,0 +1,19 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Constant
+from .cache import system_constants
+from diagnostics.metrics import timed_handler
+
+
+@receiver(post_save, sender=Constant)
+@timed_handler
+def invalidate_constants_on_save(sender, instance, using, **kwargs):
+    """Publish the new settings (ConstantForm, admin) once the change is committed"""
+    transaction.on_commit(lambda: system_constants.invalidate(instance), using=using)
+
+
+@receiver(post_delete, sender=Constant)
+@timed_handler
+def invalidate_constants_on_delete(sender, instance, using, **kwargs):
+    transaction.on_commit(system_constants.invalidate, using=using)
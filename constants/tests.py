@@ -1,3 +1,77 @@
+import subprocess
+import sys
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
 from django.test import TestCase
 
-# Create your tests here.
+from .cache import STAMP_CACHE, VERSION_KEY, SystemConstantsCache, system_constants, version_of
+from .forms import ConstantForm
+from .models import Constant
+
+
+class SystemConstantsCacheTests(TestCase):
+    def setUp(self):
+        caches[STAMP_CACHE].clear()
+        system_constants.invalidate()
+
+    def tearDown(self):
+        system_constants.invalidate()
+
+    def test_row_is_created_and_memoized(self):
+        with self.assertNumQueries(2):
+            constants = system_constants.get()
+        self.assertEqual(constants.min_renter_rental_hours, 1)
+        with self.assertNumQueries(0):
+            self.assertIs(system_constants.get(), constants)
+        self.assertEqual(Constant.objects.count(), 1)
+
+    def test_form_save_invalidates(self):
+        constants = system_constants.get()
+        form = ConstantForm({
+            'min_owner_rental_days': 10,
+            'min_renter_rental_hours': 3,
+            'late_fee_percent': '5.00',
+            'default_owner_share_percent': '70.00',
+            'default_company_share_percent': '30.00',
+        }, instance=Constant.objects.get(pk=constants.pk))
+        self.assertTrue(form.is_valid(), form.errors)
+        with self.captureOnCommitCallbacks(execute=True):
+            form.save()
+
+        self.assertEqual(system_constants.get().min_renter_rental_hours, 3)
+        self.assertEqual(system_constants.version, form.instance.updated_at.isoformat())
+
+    def test_version_stamp_from_another_process_reloads(self):
+        constants = system_constants.get()
+        Constant.objects.filter(pk=constants.pk).update(default_owner_share_percent=Decimal('60.00'))
+        self.assertEqual(system_constants.get().default_owner_share_percent, Decimal('80.00'))
+
+        caches[STAMP_CACHE].set(VERSION_KEY, 'boshqa-versiya')
+        self.assertEqual(system_constants.get().default_owner_share_percent, Decimal('60.00'))
+        with self.assertNumQueries(0):
+            system_constants.get()
+
+    def test_other_worker_drops_its_memo_after_a_save(self):
+        constants = system_constants.get()
+        # Boshqa gunicorn worker: o'z xotirasidagi nusxa va cache ulanishi
+        other_worker = SystemConstantsCache()
+        self.assertEqual(other_worker.get().min_renter_rental_hours, 1)
+
+        constants = Constant.objects.get(pk=constants.pk)
+        constants.min_renter_rental_hours = 4
+        with self.captureOnCommitCallbacks(execute=True):
+            constants.save()
+
+        # Shtamp boshqa jarayonga ham ko'rinadi
+        reader = (
+            'import sys; from django.core.cache.backends.filebased import FileBasedCache; '
+            'print(FileBasedCache(sys.argv[1], {}).get(sys.argv[2]))'
+        )
+        location = settings.CACHES[STAMP_CACHE]['LOCATION']
+        result = subprocess.run(
+            [sys.executable, '-c', reader, location, VERSION_KEY], capture_output=True, text=True, check=True,
+        )
+        self.assertEqual(result.stdout.strip(), version_of(constants))
+        self.assertEqual(other_worker.get().min_renter_rental_hours, 4)
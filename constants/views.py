@@ -4,6 +4,7 @@ from django.contrib import messages
 from django.views.generic import ListView, CreateView, UpdateView
 from django.urls import reverse_lazy
 from .models import Constant
+from .cache import system_constants
 from .forms import ConstantForm
 
 @login_required
@@ -13,12 +14,11 @@ def constants_list(request):
         messages.error(request, 'Bu sahifani ko\'rish huquqingiz yo\'q.')
         return redirect('dashboard')
     
-    constants = Constant.objects.first()
-    if not constants:
-        constants = Constant.objects.create()
+    constants = system_constants.get()
     
     if request.method == 'POST':
-        form = ConstantForm(request.POST, instance=constants)
+        # Keshdagi umumiy obyekt o'zgartirilmasin, tahrir uchun yangisi o'qiladi
+        form = ConstantForm(request.POST, instance=Constant.objects.get(pk=constants.pk))
         if form.is_valid():
             form.save()
             messages.success(request, 'Sozlamalar muvaffaqiyatli yangilandi!')
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contracts', '0001_initial'),
+        ('vehicles', '0003_vehicle_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(fields=['created_at', 'id'], name='contract_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(fields=['owner', 'created_at', 'id'], name='contract_owner_created_idx'),
+        ),
+    ]
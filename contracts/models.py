@@ -29,13 +29,17 @@ class Contract(models.Model):
     class Meta:
         unique_together = ("owner", "vehicle", "start_date")
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='contract_created_idx'),
+            models.Index(fields=['owner', 'created_at', 'id'], name='contract_owner_created_idx'),
+        ]
 
     def __str__(self):
         return f"Contract: {self.owner.username} - {self.vehicle.plate_number}"
 
     def clean(self):
         from django.core.exceptions import ValidationError
-        from constants.models import Constant
+        from constants.cache import system_constants
         
         # Validate dates
         if self.end_date and self.end_date <= self.start_date:
@@ -46,7 +50,7 @@ class Contract(models.Model):
             if not self.owner_share_percent or not self.company_share_percent:
                 # Use default values from constants
                 try:
-                    constants = Constant.objects.first()
+                    constants = system_constants.get()
                     if constants:
                         self.owner_share_percent = constants.default_owner_share_percent
                         self.company_share_percent = constants.default_company_share_percent
@@ -64,6 +68,18 @@ class Contract(models.Model):
             if not self.fixed_payout_amount:
                 raise ValidationError("Fixed payout amount is required for fixed pricing type.")
 
+    def split_earnings(self, total_price):
+        """Return (owner_earned, company_earned) for a booking total under this contract"""
+        if self.pricing_type == "share":
+            # Calculate based on percentages
+            owner_earned = (total_price * self.owner_share_percent) / Decimal("100.00")
+            company_earned = (total_price * self.company_share_percent) / Decimal("100.00")
+        else:
+            # Fixed payout - owner gets fixed amount, rest goes to company
+            owner_earned = self.fixed_payout_amount or Decimal("0.00")
+            company_earned = total_price - owner_earned
+        return owner_earned, company_earned
+
     def save(self, *args, **kwargs):
         self.clean()
         super().save(*args, **kwargs)
@@ -0,0 +1,17 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Contract
+from .timeline import contract_timelines
+from diagnostics.metrics import timed_handler
+
+@receiver(post_save, sender=Contract)
+@timed_handler
+def invalidate_contract_timeline_on_save(sender, instance, **kwargs):
+    """Drop the cached contract timeline of the vehicle"""
+    contract_timelines.invalidate(instance.vehicle_id)
+
+@receiver(post_delete, sender=Contract)
+@timed_handler
+def invalidate_contract_timeline_on_delete(sender, instance, **kwargs):
+    """Drop the cached contract timeline of the vehicle"""
+    contract_timelines.invalidate(instance.vehicle_id)
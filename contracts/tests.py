@@ -1,3 +1,88 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
 from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from bookings.models import Booking
+from vehicles.models import Vehicle
+from .models import Contract
+from .timeline import contract_timelines
+import utils
+
+
+class ContractTimelineTests(TestCase):
+    def setUp(self):
+        contract_timelines.clear()
+        self.owner = CustomUser.objects.create_user(username='owner', password='x', role='owner')
+        self.renter = CustomUser.objects.create_user(username='renter', password='x', role='renter')
+        self.vehicle = Vehicle.objects.create(
+            owner=self.owner, plate_number='01 A 123 BC',
+            daily_price=Decimal('300000.00'), status='available',
+        )
+        self.share = self.make_contract(date(2030, 1, 1), None, 'share')
+        self.fixed = self.make_contract(date(2030, 3, 1), date(2030, 3, 31), 'fixed')
+
+    def make_contract(self, start_date, end_date, pricing_type):
+        return Contract.objects.create(
+            owner=self.owner, vehicle=self.vehicle,
+            start_date=start_date, end_date=end_date, pricing_type=pricing_type,
+            owner_share_percent=Decimal('80.00'), company_share_percent=Decimal('20.00'),
+            fixed_payout_amount=Decimal('100000.00'),
+        )
+
+    def make_booking(self, start, days):
+        start_at = timezone.make_aware(datetime(start.year, start.month, start.day, 10))
+        return Booking(
+            renter=self.renter, vehicle=self.vehicle,
+            start_at=start_at, end_at=start_at + timedelta(days=days),
+            total_price=Decimal('1000000.00'),
+        )
+
+    def test_resolves_newest_covering_contract(self):
+        resolve = lambda start, end: contract_timelines.resolve(self.vehicle.pk, start, end)
+        self.assertIsNone(resolve(date(2029, 12, 31), date(2030, 1, 2)))
+        self.assertEqual(resolve(date(2030, 2, 1), date(2030, 2, 3)), self.share)
+        self.assertEqual(resolve(date(2030, 3, 5), date(2030, 3, 7)), self.fixed)
+        # The fixed contract ends before the booking, the older share contract still covers it
+        self.assertEqual(resolve(date(2030, 3, 30), date(2030, 4, 2)), self.share)
+
+    def test_earnings_use_cached_timeline(self):
+        contract_timelines.load([self.vehicle.pk])
+        booking = self.make_booking(date(2030, 3, 5), 2)
+        with self.assertNumQueries(0):
+            booking.calculate_earnings()
+            owner_earned, company_earned = utils.calculate_earnings(booking)
+        self.assertEqual((booking.owner_earned, booking.company_earned), (owner_earned, company_earned))
+        self.assertEqual(owner_earned, Decimal('100000.00'))
+        self.assertEqual(company_earned, Decimal('900000.00'))
+
+    def test_contract_changes_invalidate_timeline(self):
+        booking = self.make_booking(date(2030, 3, 5), 2)
+        self.assertEqual(utils.calculate_earnings(booking)[0], Decimal('100000.00'))
+        self.fixed.delete()
+        self.assertEqual(utils.calculate_earnings(booking)[0], Decimal('800000.00'))
+        self.share.is_active = False
+        self.share.save()
+        self.assertEqual(utils.calculate_earnings(booking), (Decimal('0.00'), booking.total_price))
+
+
+class ContractListTests(TestCase):
+    def test_owner_pages_through_own_contracts(self):
+        owner = CustomUser.objects.create_user(username='owner', password='x', role='owner')
+        for i in range(25):
+            vehicle = Vehicle.objects.create(owner=owner, plate_number=f'01 A {i:03d} BC')
+            Contract.objects.create(
+                owner=owner, vehicle=vehicle, start_date=date(2030, 1, 1),
+                owner_share_percent=Decimal('80.00'), company_share_percent=Decimal('20.00'),
+            )
+        self.client.force_login(owner)
 
-# Create your tests here.
+        response = self.client.get('/contracts/')
+        self.assertEqual(len(response.context['contracts']), 20)
+        self.assertContains(response, 'Keyingi')
+        self.assertEqual(response.context['estimated_total'], (25, False))
+        response = self.client.get('/contracts/?' + response.context['next_page_query'])
+        self.assertEqual(len(response.context['contracts']), 5)
+        self.assertIsNone(response.context['estimated_total'])
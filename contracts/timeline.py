@@ -0,0 +1,113 @@
+"""
+In-memory contract timelines used to resolve the pricing rule of a booking
+"""
+import threading
+import time
+from bisect import bisect_right
+from datetime import timedelta
+
+from django.conf import settings
+
+from diagnostics.metrics import record_cache
+
+CONTRACT_FIELDS = (
+    'id', 'vehicle_id', 'start_date', 'end_date', 'pricing_type',
+    'owner_share_percent', 'company_share_percent', 'fixed_payout_amount', 'created_at',
+)
+
+
+class VehicleContractTimeline:
+    """
+    Active contracts of one vehicle split into sorted, non-overlapping date
+    segments. Every segment holds the contracts covering it, newest first,
+    which is the order Contract.Meta.ordering gives the original query.
+    """
+
+    __slots__ = ('boundaries', 'segments', 'loaded_at')
+
+    def __init__(self, contracts=(), loaded_at=None):
+        contracts = sorted(contracts, key=lambda c: (c.created_at, c.pk), reverse=True)
+        boundaries = set()
+        for contract in contracts:
+            boundaries.add(contract.start_date)
+            if contract.end_date:
+                boundaries.add(contract.end_date + timedelta(days=1))
+        self.boundaries = sorted(boundaries)
+        self.segments = [
+            [
+                contract for contract in contracts
+                if contract.start_date <= day and (contract.end_date is None or contract.end_date >= day)
+            ]
+            for day in self.boundaries
+        ]
+        self.loaded_at = loaded_at if loaded_at is not None else time.monotonic()
+
+    def resolve(self, start_date, end_date):
+        """Newest contract with start_date <= start_date and no end or end_date >= end_date"""
+        position = bisect_right(self.boundaries, start_date) - 1
+        if position < 0:
+            return None
+        for contract in self.segments[position]:
+            if contract.end_date is None or contract.end_date >= end_date:
+                return contract
+        return None
+
+
+class ContractTimelineCache:
+    """
+    Process-local timelines keyed by vehicle id.
+
+    Missing vehicles of a batch are loaded with one query; entries are
+    dropped on Contract save/delete and reloaded after
+    CONTRACT_TIMELINE_TTL seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timelines = {}
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'CONTRACT_TIMELINE_TTL', 300)
+
+    def clear(self):
+        with self._lock:
+            self._timelines.clear()
+
+    def invalidate(self, vehicle_id):
+        with self._lock:
+            self._timelines.pop(vehicle_id, None)
+
+    def load(self, vehicle_ids):
+        """Return {vehicle_id: VehicleContractTimeline}, loading missing vehicles in one query"""
+        from .models import Contract
+
+        vehicle_ids = set(vehicle_ids)
+        now = time.monotonic()
+        with self._lock:
+            loaded = {vehicle_id: self._timelines.get(vehicle_id) for vehicle_id in vehicle_ids}
+        missing = [
+            vehicle_id for vehicle_id, timeline in loaded.items()
+            if timeline is None or now - timeline.loaded_at >= self.ttl
+        ]
+        record_cache('contract_timelines', len(loaded) - len(missing), len(missing))
+        if not missing:
+            return loaded
+
+        contracts = {vehicle_id: [] for vehicle_id in missing}
+        for contract in Contract.objects.filter(
+            vehicle_id__in=missing, is_active=True
+        ).only(*CONTRACT_FIELDS).order_by():
+            contracts[contract.vehicle_id].append(contract)
+
+        with self._lock:
+            for vehicle_id, vehicle_contracts in contracts.items():
+                timeline = VehicleContractTimeline(vehicle_contracts, loaded_at=now)
+                self._timelines[vehicle_id] = loaded[vehicle_id] = timeline
+        return loaded
+
+    def resolve(self, vehicle_id, start_date, end_date):
+        return self.load([vehicle_id])[vehicle_id].resolve(start_date, end_date)
+
+
+contract_timelines = ContractTimelineCache()
@@ -1,14 +1,16 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.paginator import Paginator
 from django.db.models import Q
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
+from datetime import timedelta
+from pagination import CursorPaginationMixin
+from utils import start_of_day
 from .models import Contract
 from .forms import ContractForm
 
-class ContractListView(ListView):
+class ContractListView(CursorPaginationMixin, ListView):
     model = Contract
     template_name = 'contracts/contract_list.html'
     context_object_name = 'contracts'
@@ -27,7 +29,7 @@ class ContractListView(ListView):
             # For other roles, show all contracts (including renters)
             pass
         
-        return queryset.order_by('-created_at')
+        return queryset.order_by('-created_at', '-id')
 
 class ContractCreateView(CreateView):
     model = Contract
@@ -71,12 +73,12 @@ def contract_detail(request, pk):
         messages.error(request, 'Bu shartnomani ko\'rish huquqingiz yo\'q.')
         return redirect('dashboard')
     
-    # Get related bookings
+    # Get related bookings (datetime bounds keep the start_at index usable)
     bookings = contract.vehicle.bookings.filter(
-        start_at__date__gte=contract.start_date
+        start_at__gte=start_of_day(contract.start_date)
     )
     if contract.end_date:
-        bookings = bookings.filter(start_at__date__lte=contract.end_date)
+        bookings = bookings.filter(start_at__lt=start_of_day(contract.end_date + timedelta(days=1)))
     
     context = {
         'contract': contract,
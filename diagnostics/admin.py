@@ -0,0 +1,65 @@
+from django.contrib import admin
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html, format_html_join
+
+from .models import ProfileCapture, ProfilerAccess
+
+
+@admin.register(ProfilerAccess)
+class ProfilerAccessAdmin(admin.ModelAdmin):
+    list_display = ('user', 'path_prefix', 'expires_at', 'note', 'created_at')
+    list_filter = ('expires_at',)
+    search_fields = ('user__username', 'path_prefix', 'note')
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'user':
+            kwargs['queryset'] = db_field.related_model.objects.filter(is_staff=True)
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+@admin.register(ProfileCapture)
+class ProfileCaptureAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'user', 'method', 'path', 'status_code', 'mode', 'duration_ms', 'queries', 'downloads')
+    list_filter = ('mode', 'url_name', 'created_at')
+    search_fields = ('path', 'url_name', 'user__username')
+    date_hierarchy = 'created_at'
+    list_select_related = ('user',)
+    readonly_fields = (
+        'created_at', 'user', 'method', 'path', 'url_name', 'status_code', 'mode', 'duration_ms', 'queries',
+        'samples', 'downloads', 'summary_text',
+    )
+    exclude = ('pstats_file', 'collapsed_file', 'summary')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/download/<str:kind>/', self.admin_site.admin_view(self.download),
+                 name='diagnostics_profilecapture_download'),
+        ] + super().get_urls()
+
+    def download(self, request, pk, kind):
+        # MEDIA_ROOT ommaga ochilmagan: fayllar admin orqali beriladi
+        capture = get_object_or_404(ProfileCapture, pk=pk)
+        field = {'pstats': capture.pstats_file, 'collapsed': capture.collapsed_file}.get(kind)
+        if not self.has_view_permission(request, capture) or not field:
+            raise Http404
+        return FileResponse(field.open('rb'), as_attachment=True, filename=field.name.rsplit('/', 1)[-1])
+
+    @admin.display(description='Fayllar')
+    def downloads(self, obj):
+        links = [
+            (reverse('admin:diagnostics_profilecapture_download', args=[obj.pk, kind]), kind)
+            for kind, field in (('pstats', obj.pstats_file), ('collapsed', obj.collapsed_file)) if field
+        ]
+        return format_html_join(' | ', '<a href="{}">{}</a>', links)
+
+    @admin.display(description='Xulosa')
+    def summary_text(self, obj):
+        return format_html('<pre style="white-space: pre; overflow-x: auto">{}</pre>', obj.summary)
@@ -0,0 +1,468 @@
+"""
+In-process metrics registry exported in the Prometheus text format
+
+Counters and histograms keep their values as float64 slots in an mmap.
+Every process writes only its own file (METRICS_DIR/metrics_<pid>.db), so
+gunicorn workers never lock each other; /metrics sums the files in the
+directory. A worker folds its file into metrics_aggregate.db when it
+exits, and a starting worker does the same for files whose process is
+gone (killed workers), so counters stay monotonic across restarts while
+the directory does not grow. Folding holds an exclusive flock on
+METRICS_DIR/metrics.lock and /metrics reads under a shared one, so a
+scrape never counts a value twice. Without METRICS_DIR the values live in
+anonymous memory and only the current process is reported (runserver,
+tests).
+
+Within a process one lock guards the slot updates; it is held for a few
+struct reads and writes per observation. A histogram observation is one
+bisect and three slot additions.
+
+File layout: an 8-byte header with the number of bytes in use, then
+entries of [u32 key length][key, padded to 8 bytes][float64 value]. A new
+entry is written before the header is advanced, so a reader never sees a
+half-written one.
+"""
+import atexit
+import bisect
+import fcntl
+import glob
+import json
+import math
+import mmap
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from struct import Struct
+
+from django.conf import settings
+
+HEADER = Struct('<Q')
+KEY_LENGTH = Struct('<I')
+VALUE = Struct('<d')
+INITIAL_SIZE = 64 * 1024
+FILE_GLOB = 'metrics_*.db'
+AGGREGATE_FILE = 'metrics_aggregate.db'
+LOCK_FILE = 'metrics.lock'
+
+
+def read_entries(buffer):
+    """(key, value, value offset) of every entry in a metrics buffer"""
+    used = HEADER.unpack_from(buffer, 0)[0]
+    position = HEADER.size
+    while position < used:
+        length = KEY_LENGTH.unpack_from(buffer, position)[0]
+        key = bytes(buffer[position + KEY_LENGTH.size:position + KEY_LENGTH.size + length]).decode()
+        position += KEY_LENGTH.size + length
+        position += -position % 8
+        yield key, VALUE.unpack_from(buffer, position)[0], position
+        position += VALUE.size
+
+
+class MmapValues:
+    """Float values by key in an mmap (a file, or anonymous memory without a path); one writer process"""
+
+    def __init__(self, path=None, size=INITIAL_SIZE):
+        self.path = path
+        self._fd = None
+        self._positions = {}
+        if path:
+            self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            existing = os.fstat(self._fd).st_size
+            if existing < size:
+                os.ftruncate(self._fd, size)
+            self._mmap = mmap.mmap(self._fd, max(existing, size))
+        else:
+            self._mmap = mmap.mmap(-1, size)
+        if HEADER.unpack_from(self._mmap, 0)[0] == 0:
+            HEADER.pack_into(self._mmap, 0, HEADER.size)
+        # Fayl qayta ochilganda (pid takrorlansa) mavjud yozuvlar davom ettiriladi
+        for key, _, position in read_entries(self._mmap):
+            self._positions[key] = position
+        self._used = HEADER.unpack_from(self._mmap, 0)[0]
+
+    def _grow(self, needed):
+        size = max(len(self._mmap) * 2, self._used + needed)
+        if self._fd is not None:
+            self._mmap.close()
+            os.ftruncate(self._fd, size)
+            self._mmap = mmap.mmap(self._fd, size)
+        else:
+            grown = mmap.mmap(-1, size)
+            grown[:self._used] = self._mmap[:self._used]
+            self._mmap.close()
+            self._mmap = grown
+
+    def _append(self, key):
+        encoded = key.encode()
+        value_offset = KEY_LENGTH.size + len(encoded)
+        value_offset += -value_offset % 8
+        needed = value_offset + VALUE.size
+        if self._used + needed > len(self._mmap):
+            self._grow(needed)
+        start = self._used
+        KEY_LENGTH.pack_into(self._mmap, start, len(encoded))
+        self._mmap[start + KEY_LENGTH.size:start + KEY_LENGTH.size + len(encoded)] = encoded
+        VALUE.pack_into(self._mmap, start + value_offset, 0.0)
+        self._used += needed
+        HEADER.pack_into(self._mmap, 0, self._used)
+        self._positions[key] = start + value_offset
+        return start + value_offset
+
+    def add(self, key, amount):
+        position = self._positions.get(key)
+        if position is None:
+            position = self._append(key)
+        VALUE.pack_into(self._mmap, position, VALUE.unpack_from(self._mmap, position)[0] + amount)
+
+    def items(self):
+        return [(key, value) for key, value, _ in read_entries(self._mmap)]
+
+    def close(self):
+        self._mmap.close()
+        if self._fd is not None:
+            os.close(self._fd)
+
+
+def read_file(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < HEADER.size:
+        return []
+    return [(key, value) for key, value, _ in read_entries(data)]
+
+
+@contextmanager
+def directory_lock(directory, operation):
+    """flock on METRICS_DIR/metrics.lock (fcntl.LOCK_SH or LOCK_EX)"""
+    fd = os.open(os.path.join(directory, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, operation)
+        yield
+    finally:
+        os.close(fd)
+
+
+def pid_of(path):
+    """Worker pid from a metrics_<pid>.db path, None for the aggregate file"""
+    name = os.path.basename(path)[len('metrics_'):-len('.db')]
+    return int(name) if name.isdigit() else None
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def fold_files(directory, paths):
+    """Add worker files to the aggregate file and delete them; the caller holds the exclusive lock"""
+    if not paths:
+        return
+    aggregate = MmapValues(os.path.join(directory, AGGREGATE_FILE))
+    try:
+        for path in paths:
+            for key, value in read_file(path):
+                aggregate.add(key, value)
+            os.unlink(path)
+    finally:
+        aggregate.close()
+
+
+def fold_dead_workers(directory):
+    """Fold the files of exited processes into the aggregate file; returns how many were folded"""
+    with directory_lock(directory, fcntl.LOCK_EX):
+        dead = [
+            path for path in glob.glob(os.path.join(directory, FILE_GLOB))
+            if pid_of(path) is not None and not pid_alive(pid_of(path))
+        ]
+        fold_files(directory, dead)
+    return len(dead)
+
+
+def sample_key(name, labels):
+    return json.dumps([name, labels], separators=(',', ':'))
+
+
+def format_value(value):
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self._lock = threading.Lock()
+        self._values = None
+        self._pid = None
+        atexit.register(self.retire)
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    @property
+    def directory(self):
+        return getattr(settings, 'METRICS_DIR', None)
+
+    def _store(self):
+        if self._pid != os.getpid():
+            # Fork qilingan worker ota jarayon faylini emas, o'z faylini yozadi
+            with self._lock:
+                if self._pid != os.getpid():
+                    directory = self.directory
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                        fold_dead_workers(directory)
+                        self._values = MmapValues(os.path.join(directory, f'metrics_{os.getpid()}.db'))
+                    else:
+                        self._values = MmapValues()
+                    self._pid = os.getpid()
+        return self._values
+
+    def add(self, increments):
+        values = self._store()
+        with self._lock:
+            for key, amount in increments:
+                values.add(key, amount)
+
+    def reset(self):
+        """Start from zero in this process (tests)"""
+        with self._lock:
+            if self._values is not None:
+                self._values.close()
+            self._values = None
+            self._pid = None
+
+    def retire(self):
+        """Fold this process's file into the aggregate file (at exit)"""
+        with self._lock:
+            values = self._values
+            if values is None or self._pid != os.getpid() or not values.path:
+                return
+            self._values = None
+            self._pid = None
+        values.close()
+        directory = os.path.dirname(values.path)
+        with directory_lock(directory, fcntl.LOCK_EX):
+            fold_files(directory, [values.path])
+
+    def collect(self):
+        """{sample key: value} summed over every worker's file and the aggregate file"""
+        totals = {}
+        directory = self.directory
+        if directory:
+            self._store()
+            with directory_lock(directory, fcntl.LOCK_SH):
+                sources = [read_file(path) for path in sorted(glob.glob(os.path.join(directory, FILE_GLOB)))]
+        else:
+            sources = [self._store().items()]
+        for items in sources:
+            for key, value in items:
+                totals[key] = totals.get(key, 0.0) + value
+        return totals
+
+    def render(self):
+        samples = {}
+        for key, value in self.collect().items():
+            name, labels = json.loads(key)
+            samples.setdefault(name, []).append(([tuple(pair) for pair in labels], value))
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render(samples))
+        lines.extend(render_cache_ratio(samples))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        registry.register(self)
+
+    def labels(self, **labels):
+        values = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(values)
+        if child is None:
+            child = self._children.setdefault(values, self.child(list(zip(self.labelnames, values))))
+        return child
+
+    def header(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+
+class CounterChild:
+    def __init__(self, key):
+        self.key = key
+
+    def inc(self, amount=1):
+        registry.add(((self.key, amount),))
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def child(self, labels):
+        return CounterChild(sample_key(f'{self.name}_total', labels))
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def render(self, samples):
+        lines = self.header()
+        for labels, value in sorted(samples.get(f'{self.name}_total', [])):
+            lines.append(f'{self.name}_total{format_labels(labels)} {format_value(value)}')
+        return lines
+
+
+class HistogramChild:
+    def __init__(self, name, labels, bounds):
+        self.bounds = bounds
+        self.bucket_keys = [
+            sample_key(f'{name}_bucket', labels + [('le', format_value(bound))])
+            for bound in bounds + (math.inf,)
+        ]
+        self.sum_key = sample_key(f'{name}_sum', labels)
+        self.count_key = sample_key(f'{name}_count', labels)
+
+    def observe(self, value):
+        bucket = self.bucket_keys[bisect.bisect_left(self.bounds, value)]
+        registry.add(((bucket, 1), (self.sum_key, value), (self.count_key, 1)))
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=()):
+        super().__init__(name, documentation, labelnames)
+        self.bounds = tuple(sorted(buckets))
+
+    def child(self, labels):
+        return HistogramChild(self.name, labels, self.bounds)
+
+    def render(self, samples):
+        lines = self.header()
+        # Bucketlar alohida saqlanadi, chiqishda yig'indi (cumulative) qilinadi
+        series = {}
+        for labels, value in samples.get(f'{self.name}_bucket', []):
+            le = dict(labels)['le']
+            base = tuple(pair for pair in labels if pair[0] != 'le')
+            series.setdefault(base, {})[le] = value
+        sums = {tuple(labels): value for labels, value in samples.get(f'{self.name}_sum', [])}
+        counts = {tuple(labels): value for labels, value in samples.get(f'{self.name}_count', [])}
+        for base in sorted(series):
+            cumulative = 0.0
+            for bound in self.bounds + (math.inf,):
+                le = format_value(bound)
+                cumulative += series[base].get(le, 0.0)
+                lines.append(f'{self.name}_bucket{format_labels(list(base) + [("le", le)])} {format_value(cumulative)}')
+            lines.append(f'{self.name}_sum{format_labels(base)} {format_value(sums.get(base, 0.0))}')
+            lines.append(f'{self.name}_count{format_labels(base)} {format_value(counts.get(base, 0.0))}')
+        return lines
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+HTTP_METHODS = frozenset(('GET', 'POST', 'HEAD', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'))
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Request latency by URL name', ['url_name', 'method'], LATENCY_BUCKETS,
+)
+REQUESTS = Counter(
+    'http_requests', 'Requests by URL name and status class (2xx..5xx)', ['url_name', 'method', 'status'],
+)
+REQUEST_QUERIES = Histogram(
+    'http_request_queries', 'SQL queries per request', ['url_name'], (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+DB_QUERIES = Counter('db_queries', 'SQL queries run while serving requests', ['url_name'])
+DB_QUERY_SECONDS = Counter('db_query_seconds', 'Time spent in SQL while serving requests', ['url_name'])
+CACHE_REQUESTS = Counter('cache_requests', 'Cache lookups by cache and result (hit/miss)', ['cache', 'result'])
+BOOKINGS_CREATED = Counter('bookings_created', 'Bookings created')
+PAYMENTS_RECORDED = Counter('payments_recorded', 'Payments recorded', ['payment_type', 'payment_method'])
+AVAILABILITY_CHECK = Histogram(
+    'availability_check_seconds', 'Availability index lookups', ['operation'], FAST_BUCKETS,
+)
+SIGNAL_HANDLER = Histogram(
+    'signal_handler_seconds', 'Time spent in model signal handlers', ['handler'], FAST_BUCKETS,
+)
+
+
+def record_request(stats):
+    """Request metrics from the stats of QueryBudgetMiddleware"""
+    url_name = stats['url_name'] or 'unmatched'
+    # Labels come from the client: keep them to a fixed set, every new value is a key for good
+    method = stats['method'] if stats['method'] in HTTP_METHODS else 'other'
+    status = f"{stats['status'] // 100}xx"
+    REQUEST_DURATION.labels(url_name=url_name, method=method).observe(stats['total_ms'] / 1000)
+    REQUESTS.labels(url_name=url_name, method=method, status=status).inc()
+    REQUEST_QUERIES.labels(url_name=url_name).observe(stats['queries'])
+    if stats['queries']:
+        DB_QUERIES.labels(url_name=url_name).inc(stats['queries'])
+        DB_QUERY_SECONDS.labels(url_name=url_name).inc(stats['sql_ms'] / 1000)
+
+
+def record_cache(cache, hits=0, misses=0):
+    if hits:
+        CACHE_REQUESTS.labels(cache=cache, result='hit').inc(hits)
+    if misses:
+        CACHE_REQUESTS.labels(cache=cache, result='miss').inc(misses)
+
+
+def render_cache_ratio(samples):
+    """cache_hit_ratio gauge derived from cache_requests_total"""
+    lookups = {}
+    for labels, value in samples.get('cache_requests_total', []):
+        labels = dict(labels)
+        lookups.setdefault(labels['cache'], {})[labels['result']] = value
+    lines = ['# HELP cache_hit_ratio Share of cache lookups that were hits', '# TYPE cache_hit_ratio gauge']
+    for cache in sorted(lookups):
+        total = sum(lookups[cache].values())
+        ratio = lookups[cache].get('hit', 0.0) / total if total else 0.0
+        lines.append(f'cache_hit_ratio{format_labels([("cache", cache)])} {format_value(round(ratio, 6))}')
+    return lines
+
+
+def timed_handler(func):
+    """Record the run time of a signal receiver in signal_handler_seconds"""
+    timer = SIGNAL_HANDLER.labels(handler=f'{func.__module__}.{func.__name__}')
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timer.observe(time.perf_counter() - started)
+
+    return wrapper
@@ -0,0 +1,140 @@
+"""
+Per-request SQL and timing instrumentation
+
+Every query of every database connection is passed through an
+execute_wrapper while the view runs. The middleware then knows, per
+request, the number of queries, total SQL time, how many queries repeated
+an SQL statement already run (the N+1 pattern) and the total view time.
+
+The numbers are returned in a Server-Timing header and written as one JSON
+line to the 'diagnostics.requests' logger. QUERY_BUDGETS sets limits per
+URL name; an overrun is logged as a warning or, with QUERY_BUDGET_RAISE
+(on under `manage.py test`), the count limits raise QueryBudgetExceeded.
+Timing limits only warn, since they depend on the machine.
+
+Queries run while a StreamingHttpResponse is consumed are not counted.
+Requests profiled by diagnostics.profiling are logged but not checked
+against the budgets.
+"""
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import record_request
+
+logger = logging.getLogger('diagnostics.requests')
+
+COUNT_LIMITS = ('queries', 'duplicates')
+TIME_LIMITS = ('sql_ms', 'total_ms')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryRecorder:
+    """execute_wrapper collecting query count, SQL time and repeated statements"""
+
+    def __init__(self):
+        self.statements = Counter()
+        self.sql_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.statements[sql] += 1
+
+    @property
+    def count(self):
+        return sum(self.statements.values())
+
+    @property
+    def duplicates(self):
+        return self.count - len(self.statements)
+
+    def most_repeated(self):
+        if not self.duplicates:
+            return None
+        sql, count = self.statements.most_common(1)[0]
+        return {'sql': sql[:300], 'count': count}
+
+
+def request_stats(request, response, recorder, total_time):
+    match = request.resolver_match
+    return {
+        'method': request.method,
+        'path': request.path,
+        'url_name': match.view_name if match else None,
+        'status': response.status_code,
+        'queries': recorder.count,
+        'duplicates': recorder.duplicates,
+        'sql_ms': round(recorder.sql_time * 1000, 2),
+        'total_ms': round(total_time * 1000, 2),
+        'most_repeated': recorder.most_repeated(),
+    }
+
+
+def server_timing(stats):
+    app_ms = max(stats['total_ms'] - stats['sql_ms'], 0)
+    return (
+        f'sql;dur={stats["sql_ms"]};desc="{stats["queries"]} queries, {stats["duplicates"]} duplicate", '
+        f'app;dur={round(app_ms, 2)}, total;dur={stats["total_ms"]}'
+    )
+
+
+def budget_overruns(stats, budget):
+    """[(limit name, limit, actual)] for every limit the request went over"""
+    return [
+        (name, budget[name], stats[name])
+        for name in COUNT_LIMITS + TIME_LIMITS
+        if name in budget and stats[name] > budget[name]
+    ]
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        stats = request_stats(request, response, recorder, time.perf_counter() - started)
+
+        if getattr(settings, 'SERVER_TIMING_HEADER', True):
+            response['Server-Timing'] = server_timing(stats)
+        logger.info(json.dumps(stats))
+        record_request(stats)
+        # Profil olingan so'rovda profiler o'z so'rovlari va sekinlashuvini qo'shadi
+        if not getattr(request, 'profiling', False):
+            self.check_budget(stats)
+        return response
+
+    def check_budget(self, stats):
+        match_name = stats['url_name']
+        budget = getattr(settings, 'QUERY_BUDGETS', {}).get(match_name)
+        if not budget:
+            return
+        overruns = budget_overruns(stats, budget)
+        if not overruns:
+            return
+        summary = ', '.join(f'{name} {actual} > {limit}' for name, limit, actual in overruns)
+        message = f'{match_name}: budget exceeded ({summary})'
+        if stats['most_repeated']:
+            message += f'; repeated {stats["most_repeated"]["count"]}x: {stats["most_repeated"]["sql"]}'
+        if getattr(settings, 'QUERY_BUDGET_RAISE', False) and any(
+            name in COUNT_LIMITS for name, _, _ in overruns
+        ):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message, extra={'request_stats': stats})
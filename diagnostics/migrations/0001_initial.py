@@ -0,0 +1,56 @@
+# Generated by Django 5.2.6 on 2026-10-18 05:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileCapture',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.CharField(max_length=500)),
+                ('url_name', models.CharField(blank=True, max_length=100)),
+                ('status_code', models.PositiveSmallIntegerField()),
+                ('mode', models.CharField(choices=[('cprofile', 'cProfile'), ('sample', 'Sampling')], max_length=10)),
+                ('duration_ms', models.FloatField()),
+                ('queries', models.PositiveIntegerField(default=0)),
+                ('samples', models.PositiveIntegerField(default=0)),
+                ('pstats_file', models.FileField(blank=True, upload_to='profiles/%Y/%m/%d')),
+                ('collapsed_file', models.FileField(blank=True, upload_to='profiles/%Y/%m/%d')),
+                ('summary', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Profil',
+                'verbose_name_plural': 'Profillar',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProfilerAccess',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path_prefix', models.CharField(blank=True, max_length=200)),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+                ('note', models.CharField(blank=True, max_length=200)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='profiler_access', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Profiler ruxsati',
+                'verbose_name_plural': 'Profiler ruxsatlari',
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+class ProfilerAccessQuerySet(models.QuerySet):
+    def active(self):
+        return self.filter(models.Q(expires_at=None) | models.Q(expires_at__gt=timezone.now()))
+
+
+class ProfilerAccess(models.Model):
+    """Allow-list: staff users who may profile their own requests"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='profiler_access')
+    # Bo'sh bo'lsa barcha sahifalar
+    path_prefix = models.CharField(max_length=200, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    note = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ProfilerAccessQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.user} {self.path_prefix or '*'}"
+
+    class Meta:
+        verbose_name = "Profiler ruxsati"
+        verbose_name_plural = "Profiler ruxsatlari"
+
+
+class ProfileCapture(models.Model):
+    MODE_CHOICES = [
+        ('cprofile', 'cProfile'),
+        ('sample', 'Sampling'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='+')
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    url_name = models.CharField(max_length=100, blank=True)
+    status_code = models.PositiveSmallIntegerField()
+    mode = models.CharField(max_length=10, choices=MODE_CHOICES)
+    duration_ms = models.FloatField()
+    queries = models.PositiveIntegerField(default=0)
+    samples = models.PositiveIntegerField(default=0)
+    # cProfile natijasi (pstats.Stats bilan ochiladi); sampling rejimida bo'sh
+    pstats_file = models.FileField(upload_to='profiles/%Y/%m/%d', blank=True)
+    # flamegraph.pl / speedscope uchun "frame;frame;frame count" qatorlari
+    collapsed_file = models.FileField(upload_to='profiles/%Y/%m/%d', blank=True)
+    summary = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f}ms)"
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Profil"
+        verbose_name_plural = "Profillar"
@@ -0,0 +1,203 @@
+"""
+On-demand request profiling
+
+A request is profiled only when it asks for it (the `_profile` query
+parameter or the X-Profile header, value 'cprofile' or 'sample') and its
+user is staff with an active ProfilerAccess row. Requests without the flag
+pay for one dictionary lookup and one substring test; PROFILING_ENABLED =
+False removes the middleware altogether.
+
+Both modes run a sampling thread that records the view thread's stack
+every PROFILING_SAMPLE_INTERVAL seconds; the stacks are written in the
+collapsed format of flamegraph.pl and speedscope. The 'cprofile' mode also
+runs cProfile over the view and saves its pstats dump; it is exact but
+slows the request down, the sampler alone barely does.
+"""
+import cProfile
+import io
+import logging
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.db import connections
+from django.utils.text import slugify
+
+from .middleware import QueryRecorder
+from .models import ProfileCapture, ProfilerAccess
+
+logger = logging.getLogger('diagnostics.profiling')
+
+QUERY_PARAM = '_profile'
+HEADER = 'HTTP_X_PROFILE'
+MODES = ('cprofile', 'sample')
+
+
+def requested_mode(request):
+    """Profiling mode the request asks for, None when it does not"""
+    value = request.META.get(HEADER)
+    if value is None:
+        if f'{QUERY_PARAM}=' not in request.META.get('QUERY_STRING', ''):
+            return None
+        value = request.GET.get(QUERY_PARAM)
+    value = (value or '').strip().lower()
+    if value in ('1', 'true', 'yes'):
+        return 'cprofile'
+    return value if value in MODES else None
+
+
+def is_allowed(request):
+    user = getattr(request, 'user', None)
+    if not (user and user.is_authenticated and user.is_staff):
+        return False
+    prefixes = ProfilerAccess.objects.active().filter(user=user).values_list('path_prefix', flat=True)
+    return any(request.path.startswith(prefix) for prefix in prefixes)
+
+
+def frame_label(code):
+    filename = code.co_filename
+    base = str(settings.BASE_DIR)
+    if filename.startswith(base):
+        filename = os.path.relpath(filename, base)
+    elif 'site-packages' in filename:
+        filename = filename.split('site-packages' + os.sep, 1)[-1]
+    elif filename.startswith(sys.base_prefix):
+        filename = os.path.relpath(filename, sys.base_prefix)
+    # ';' collapsed formatda ajratuvchi
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(';', ',')
+
+
+class StackSampler:
+    """Thread sampling another thread's Python stack, below a root frame"""
+
+    def __init__(self, thread_id, root_frame, interval):
+        self.thread_id = thread_id
+        self.root_frame = root_frame
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and frame is not self.root_frame:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+
+    @property
+    def samples(self):
+        return sum(self.stacks.values())
+
+    def collapsed(self):
+        """'outer;inner;leaf count' lines, heaviest stack first"""
+        lines = Counter()
+        for stack, count in self.stacks.items():
+            lines[';'.join(frame_label(code) for code in stack)] += count
+        return ''.join(f'{stack} {count}\n' for stack, count in lines.most_common())
+
+    def summary(self, limit=20):
+        """Functions by own samples (the leaf of the stack)"""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack[-1]] += count
+        total = self.samples or 1
+        return ''.join(
+            f'{count:>6} {count / total:>6.1%}  {frame_label(code)}\n' for code, count in leaves.most_common(limit)
+        )
+
+
+def profile_request(request, get_response, mode):
+    """Run the view under the profiler; returns (response, capture or None)"""
+    recorder = QueryRecorder()
+    profiler = cProfile.Profile() if mode == 'cprofile' else None
+    interval = getattr(settings, 'PROFILING_SAMPLE_INTERVAL', 0.005)
+    started = time.perf_counter()
+    with ExitStack() as stack:
+        sampler = stack.enter_context(StackSampler(threading.get_ident(), sys._getframe(), interval))
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        if profiler:
+            profiler.enable()
+        try:
+            response = get_response(request)
+        finally:
+            if profiler:
+                profiler.disable()
+    duration = time.perf_counter() - started
+
+    try:
+        capture = save_capture(request, response, mode, duration, recorder, sampler, profiler)
+    except Exception:
+        # Profil saqlanmasa ham foydalanuvchi javobni oladi
+        logger.exception("Profile capture of %s failed", request.path)
+        capture = None
+    return response, capture
+
+
+def save_capture(request, response, mode, duration, recorder, sampler, profiler):
+    capture = ProfileCapture(
+        user=request.user, method=request.method, path=request.path[:500],
+        url_name=(request.resolver_match.view_name if request.resolver_match else '')[:100],
+        status_code=response.status_code, mode=mode, duration_ms=round(duration * 1000, 2),
+        queries=recorder.count, samples=sampler.samples,
+    )
+    name = f"{time.strftime('%H%M%S')}-{slugify(capture.url_name or capture.path)[:50] or 'root'}"
+    if profiler:
+        stats = pstats.Stats(profiler, stream=io.StringIO())
+        capture.pstats_file.save(f'{name}.pstats', ContentFile(marshal.dumps(stats.stats)), save=False)
+        stats.sort_stats('cumulative').print_stats(30)
+        capture.summary = stats.stream.getvalue()
+    else:
+        capture.summary = sampler.summary()
+    capture.collapsed_file.save(f'{name}.collapsed', ContentFile(sampler.collapsed().encode()), save=False)
+    capture.save()
+    prune_captures()
+    return capture
+
+
+def prune_captures():
+    """Keep the PROFILING_KEEP newest captures; files go with the rows (post_delete signal)"""
+    keep = getattr(settings, 'PROFILING_KEEP', 200)
+    old_ids = list(ProfileCapture.objects.order_by('-created_at', '-id').values_list('id', flat=True)[keep:])
+    if old_ids:
+        for capture in ProfileCapture.objects.filter(id__in=old_ids):
+            capture.delete()
+
+
+class ProfilingMiddleware:
+    """Place after AuthenticationMiddleware: the allow-list needs request.user"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = requested_mode(request)
+        if mode is None or not is_allowed(request):
+            return self.get_response(request)
+        request.profiling = True
+        response, capture = profile_request(request, self.get_response, mode)
+        if capture:
+            response['X-Profile-Capture'] = str(capture.pk)
+        return response
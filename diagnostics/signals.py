@@ -0,0 +1,30 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from bookings.models import Booking
+from bookings.payment_models import Payment
+from .metrics import BOOKINGS_CREATED, PAYMENTS_RECORDED
+from .models import ProfileCapture
+
+
+@receiver(post_delete, sender=ProfileCapture)
+def delete_capture_files(sender, instance, **kwargs):
+    # Fayllar yozuv bilan birga o'chiriladi (admin va eski profillarni tozalash)
+    for field in (instance.pstats_file, instance.collapsed_file):
+        if field:
+            field.delete(save=False)
+
+
+@receiver(post_save, sender=Booking)
+def count_created_booking(sender, instance, created, using, **kwargs):
+    # Faqat tranzaksiya tasdiqlanganda (reserve() qayta urinishlari va rollback sanalmaydi)
+    if created:
+        transaction.on_commit(BOOKINGS_CREATED.inc, using=using)
+
+
+@receiver(post_save, sender=Payment)
+def count_recorded_payment(sender, instance, created, using, **kwargs):
+    if created:
+        counter = PAYMENTS_RECORDED.labels(payment_type=instance.payment_type, payment_method=instance.payment_method)
+        transaction.on_commit(counter.inc, using=using)
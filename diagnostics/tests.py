@@ -0,0 +1,310 @@
+import json
+import os
+import pstats
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import sys
+from datetime import timedelta
+
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from bookings.availability import availability_index
+from bookings.models import Booking, Payment
+from vehicles.models import CarMake, CarModel, Vehicle
+from .metrics import BOOKINGS_CREATED, INITIAL_SIZE, MmapValues, read_file, registry, sample_key
+from .middleware import QueryBudgetExceeded
+from .models import ProfileCapture, ProfilerAccess
+from .profiling import StackSampler
+
+
+@override_settings(QUERY_BUDGET_RAISE=True)
+class QueryBudgetMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'x', role='')
+        make = CarMake.objects.create(name='Chevrolet')
+        model = CarModel.objects.create(make=make, name='Cobalt')
+        owner = CustomUser.objects.create_user('owner', password='x', role='owner')
+        renters = CustomUser.objects.bulk_create([CustomUser(username=f'mijoz{i}', role='renter') for i in range(25)])
+        vehicles = Vehicle.objects.bulk_create([
+            Vehicle(owner=owner, make=make, model=model, plate_number=f'10 A {i:03d} BC', daily_price=100)
+            for i in range(25)
+        ])
+        start = timezone.now() + timedelta(days=1)
+        for i, (renter, vehicle) in enumerate(zip(renters, vehicles)):
+            Booking.objects.create(
+                renter=renter, vehicle=vehicle,
+                start_at=start + timedelta(days=i), end_at=start + timedelta(days=i, hours=3),
+            )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_lists_stay_within_budget(self):
+        # N+1 bo'lsa QUERY_BUDGET_RAISE (klassda yoqilgan) xato beradi
+        for name in ('booking_list', 'vehicle_list', 'dashboard'):
+            with self.subTest(name):
+                self.assertEqual(self.client.get(reverse(name)).status_code, 200)
+        make = CarMake.objects.get()
+        response = self.client.get(reverse('vehicle_list'), {'make': make.pk, 'status': 'available'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_server_timing_header_and_log(self):
+        with self.assertLogs('diagnostics.requests', 'INFO') as logs:
+            response = self.client.get(reverse('booking_list'))
+        self.assertRegex(response['Server-Timing'], r'^sql;dur=[\d.]+;desc="\d+ queries, 0 duplicate", app;dur=')
+        stats = json.loads(logs.records[0].getMessage())
+        self.assertEqual(stats['url_name'], 'booking_list')
+        self.assertEqual(stats['duplicates'], 0)
+        self.assertGreater(stats['queries'], 0)
+
+    @override_settings(QUERY_BUDGETS={'dashboard': {'queries': 1}})
+    def test_overrun_raises_in_tests(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'dashboard: budget exceeded (queries'):
+            self.client.get(reverse('dashboard'))
+
+    @override_settings(QUERY_BUDGETS={'dashboard': {'queries': 1, 'total_ms': 0}}, QUERY_BUDGET_RAISE=False)
+    def test_overrun_logs_warning(self):
+        with self.assertLogs('diagnostics.requests', 'WARNING') as logs:
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('total_ms', logs.output[0])
+
+
+class ProfilingMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'x', role='admin')
+        cls.access = ProfilerAccess.objects.create(user=cls.admin)
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.client.force_login(self.admin)
+
+    def test_not_profiled_without_flag(self):
+        response = self.client.get(reverse('dashboard'))
+        self.assertNotIn('X-Profile-Capture', response)
+        self.assertFalse(ProfileCapture.objects.exists())
+
+    def test_cprofile_capture(self):
+        response = self.client.get(reverse('vehicle_list'), {'_profile': 'cprofile'})
+        self.assertEqual(response.status_code, 200)
+        capture = ProfileCapture.objects.get(pk=response['X-Profile-Capture'])
+        self.assertEqual((capture.user, capture.url_name, capture.mode), (self.admin, 'vehicle_list', 'cprofile'))
+        self.assertGreater(capture.queries, 0)
+        self.assertIn('cumulative', capture.summary)
+        stats = pstats.Stats(capture.pstats_file.path)
+        self.assertTrue(any(name == 'get_queryset' for _, _, name in stats.stats))
+        self.assertTrue(os.path.exists(capture.collapsed_file.path))
+
+    def test_sample_mode_by_header(self):
+        response = self.client.get(reverse('dashboard'), HTTP_X_PROFILE='sample')
+        capture = ProfileCapture.objects.get(pk=response['X-Profile-Capture'])
+        self.assertEqual(capture.mode, 'sample')
+        self.assertFalse(capture.pstats_file)
+        self.assertTrue(capture.collapsed_file)
+
+    def test_allow_list(self):
+        staff = CustomUser.objects.create_user('staff', password='x', role='admin', is_staff=True)
+        renter = CustomUser.objects.create_user('renter', password='x', role='renter')
+        ProfilerAccess.objects.create(user=renter)
+        ProfilerAccess.objects.create(user=staff, expires_at=timezone.now() - timedelta(hours=1))
+        for user in (staff, renter):
+            self.client.force_login(user)
+            self.assertNotIn('X-Profile-Capture', self.client.get(reverse('dashboard'), {'_profile': 'cprofile'}))
+
+        self.access.path_prefix = '/bookings/'
+        self.access.save()
+        self.client.force_login(self.admin)
+        self.assertNotIn('X-Profile-Capture', self.client.get(reverse('dashboard'), {'_profile': '1'}))
+        self.assertIn('X-Profile-Capture', self.client.get(reverse('booking_list'), {'_profile': '1'}))
+
+    @override_settings(PROFILING_KEEP=2)
+    def test_old_captures_pruned_with_files(self):
+        for _ in range(3):
+            self.client.get(reverse('dashboard'), {'_profile': 'cprofile'})
+        first = ProfileCapture.objects.order_by('id').first()
+        paths = [first.pstats_file.path, first.collapsed_file.path]
+        self.client.get(reverse('dashboard'), {'_profile': 'cprofile'})
+        self.assertEqual(ProfileCapture.objects.count(), 2)
+        self.assertFalse(ProfileCapture.objects.filter(pk=first.pk).exists())
+        self.assertFalse(any(os.path.exists(path) for path in paths))
+
+    def test_admin_lists_and_downloads_captures(self):
+        response = self.client.get(reverse('dashboard'), {'_profile': 'cprofile'})
+        pk = response['X-Profile-Capture']
+        changelist = self.client.get(reverse('admin:diagnostics_profilecapture_changelist'))
+        self.assertContains(changelist, reverse('admin:diagnostics_profilecapture_download', args=[pk, 'pstats']))
+        download = self.client.get(reverse('admin:diagnostics_profilecapture_download', args=[pk, 'collapsed']))
+        self.assertEqual(download.status_code, 200)
+        self.assertTrue(download['Content-Disposition'].startswith('attachment'))
+
+    @override_settings(PROFILING_ENABLED=False)
+    def test_disabled(self):
+        response = self.client.get(reverse('dashboard'), {'_profile': 'cprofile'})
+        self.assertNotIn('X-Profile-Capture', response)
+
+
+class StackSamplerTests(TestCase):
+    def test_collapsed_stacks(self):
+        def busy_leaf():
+            deadline = time.perf_counter() + 0.05
+            while time.perf_counter() < deadline:
+                pass
+
+        def outer():
+            busy_leaf()
+
+        with StackSampler(threading.get_ident(), sys._getframe(), 0.001) as sampler:
+            outer()
+        self.assertGreater(sampler.samples, 5)
+        stack, count = sampler.collapsed().splitlines()[0].rsplit(' ', 1)
+        self.assertRegex(stack, r'^outer \(diagnostics/tests.py:\d+\);busy_leaf \(diagnostics/tests.py:\d+\)$')
+        self.assertGreater(int(count), 0)
+        self.assertIn('busy_leaf', sampler.summary())
+
+
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'x', role='admin')
+
+    def setUp(self):
+        registry.reset()
+        self.addCleanup(registry.reset)
+        availability_index.clear()
+
+    def scrape(self, **extra):
+        response = self.client.get('/metrics', **extra)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return response.content.decode()
+
+    def test_request_metrics(self):
+        self.client.force_login(self.admin)
+        self.client.get(reverse('dashboard'))
+        self.client.get(reverse('dashboard'))
+        text = self.scrape()
+        self.assertIn('http_requests_total{url_name="dashboard",method="GET",status="2xx"} 2', text)
+        self.assertIn('http_request_duration_seconds_count{url_name="dashboard",method="GET"} 2', text)
+        self.assertIn('http_request_duration_seconds_bucket{url_name="dashboard",method="GET",le="+Inf"} 2', text)
+        self.assertRegex(text, r'db_queries_total\{url_name="dashboard"\} \d+')
+        self.assertIn('cache_requests_total{cache="dashboard_stats",result="hit"} 1', text)
+        self.assertIn('cache_hit_ratio{cache="dashboard_stats"} 0.5', text)
+        self.assertIn('# TYPE http_request_duration_seconds histogram', text)
+
+    def test_business_and_signal_metrics(self):
+        owner = CustomUser.objects.create_user('owner', password='x', role='owner')
+        vehicle = Vehicle.objects.create(owner=owner, plate_number='01 A 123 BC', daily_price=100, status='available')
+        start = timezone.now() + timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = Booking.objects.create(
+                renter=self.admin, vehicle=vehicle, start_at=start, end_at=start + timedelta(hours=3),
+            )
+            Payment.objects.create(booking=booking, amount=50, payment_type='deposit', payment_method='card')
+        # Rolled back: not counted
+        with self.captureOnCommitCallbacks(execute=True), self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                Booking.objects.create(
+                    renter=self.admin, vehicle=vehicle, start_at=start + timedelta(days=1),
+                    end_at=start + timedelta(days=1, hours=3),
+                )
+                raise RuntimeError
+        availability_index.is_free(vehicle.pk, start, start + timedelta(hours=1))
+        availability_index.is_free(vehicle.pk, start, start + timedelta(hours=1))
+
+        self.client.force_login(self.admin)
+        text = self.scrape()
+        self.assertIn('bookings_created_total 1', text)
+        self.assertIn('payments_recorded_total{payment_type="deposit",payment_method="card"} 1', text)
+        self.assertIn('availability_check_seconds_count{operation="is_free"} 2', text)
+        self.assertIn(
+            'signal_handler_seconds_count{handler="bookings.signals.update_daily_earnings_on_save"} 2', text
+        )
+
+    def test_unknown_methods_and_statuses_are_bucketed(self):
+        self.client.generic('BREW', '/no-such-page/')
+        self.client.generic('FOO', '/no-such-page/')
+        self.client.force_login(self.admin)
+        text = self.scrape()
+        self.assertIn('http_requests_total{url_name="unmatched",method="other",status="4xx"} 2', text)
+        self.assertNotIn('BREW', text)
+
+    def test_staff_only_by_default(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        with override_settings(METRICS_ALLOWED_IPS=('10.0.0.5',)):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            self.scrape(REMOTE_ADDR='10.0.0.5')
+        self.client.force_login(self.admin)
+        self.scrape()
+
+    def test_workers_are_summed_from_the_metrics_directory(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with override_settings(METRICS_DIR=directory, METRICS_ALLOWED_IPS=('127.0.0.1',)):
+            registry.reset()
+            self.client.get('/metrics')
+            # Boshqa worker fayli
+            other = MmapValues(os.path.join(directory, 'metrics_1.db'))
+            for key, value in registry._store().items():
+                other.add(key, value)
+            other.close()
+            text = self.scrape()
+            registry.reset()
+        # Bu jarayondan 1 ta + boshqa worker faylidan 1 ta (joriy so'rov javobdan keyin yoziladi)
+        self.assertIn('http_requests_total{url_name="metrics",method="GET",status="2xx"} 2', text)
+
+    def test_dead_worker_files_are_folded_into_the_aggregate(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        worker = subprocess.Popen([sys.executable, '-c', 'pass'])
+        worker.wait()
+        dead_path = os.path.join(directory, f'metrics_{worker.pid}.db')
+        key = sample_key('bookings_created_total', [])
+        dead = MmapValues(dead_path)
+        dead.add(key, 3)
+        dead.close()
+
+        with override_settings(METRICS_DIR=directory, METRICS_ALLOWED_IPS=('127.0.0.1',)):
+            registry.reset()
+            BOOKINGS_CREATED.inc()
+            self.assertFalse(os.path.exists(dead_path))
+            self.assertIn('bookings_created_total 4', self.scrape())
+
+            # Jarayon tugaganda o'z fayli ham yig'indiga qo'shiladi, jami kamaymaydi
+            registry.retire()
+            self.assertEqual(sorted(os.listdir(directory)), ['metrics.lock', 'metrics_aggregate.db'])
+            self.assertIn('bookings_created_total 4', self.scrape())
+            registry.reset()
+        self.assertEqual(dict(read_file(os.path.join(directory, 'metrics_aggregate.db')))[key], 4)
+
+    def test_values_file_grows_and_reopens(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'metrics_1.db')
+        values = MmapValues(path)
+        keys = [f'key-{i}-{"x" * 40}' for i in range(INITIAL_SIZE // 40)]
+        for key in keys:
+            values.add(key, 1.5)
+        values.add(keys[0], 1)
+        values.close()
+        self.assertGreater(os.path.getsize(path), INITIAL_SIZE)
+
+        reopened = MmapValues(path)
+        reopened.add(keys[0], 1)
+        items = dict(reopened.items())
+        reopened.close()
+        self.assertEqual(len(items), len(keys))
+        self.assertEqual(items[keys[0]], 3.5)
+        self.assertEqual(items[keys[-1]], 1.5)
@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .metrics import registry
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def metrics(request):
+    """Prometheus text exposition; for scrapers on METRICS_ALLOWED_IPS and staff users"""
+    allowed_ips = getattr(settings, 'METRICS_ALLOWED_IPS', ())
+    if request.META.get('REMOTE_ADDR') not in allowed_ips and not request.user.is_staff:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,159 @@
+"""
+Keyset (cursor) pagination for long, newest-first lists
+
+Pages are read with WHERE (created_at, id) < (cursor) ORDER BY created_at
+DESC, id DESC LIMIT n, so a deep page costs the same as the first one
+and no COUNT(*) over the whole result is needed.
+"""
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(created_at, pk, direction):
+    payload = json.dumps([created_at.isoformat(), pk, direction], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Return (created_at, pk, direction) or None for a missing/invalid token"""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        created_at, pk, direction = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_at = parse_datetime(created_at)
+    except (ValueError, TypeError):
+        return None
+    if created_at is None or not isinstance(pk, int) or direction not in ('next', 'prev'):
+        return None
+    return created_at, pk, direction
+
+
+class CursorPage:
+    """One page of a CursorPaginator; mirrors the parts of Page the templates use"""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def has_other_pages(self):
+        return self.has_next_page or self.has_previous_page
+
+    @property
+    def next_cursor(self):
+        if not self.has_next_page or not self.object_list:
+            return None
+        last = self.object_list[-1]
+        return encode_cursor(last.created_at, last.pk, 'next')
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous_page or not self.object_list:
+            return None
+        first = self.object_list[0]
+        return encode_cursor(first.created_at, first.pk, 'prev')
+
+
+class CursorPaginator:
+    """
+    Paginate a queryset newest first on (created_at, id).
+
+    estimate_limit > 0 enables `estimated_total`: the number of rows counted
+    up to that limit (LIMIT-ed COUNT), shown as "N+" once it is reached.
+    """
+
+    def __init__(self, queryset, per_page, estimate_limit=0):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.estimate_limit = estimate_limit
+
+    def page(self, token=None):
+        cursor = decode_cursor(token)
+        queryset = self.queryset
+        if cursor is None:
+            rows = list(queryset.order_by('-created_at', '-id')[:self.per_page + 1])
+            return CursorPage(rows[:self.per_page], self, len(rows) > self.per_page, False)
+
+        created_at, pk, direction = cursor
+        # The redundant created_at bound outside the OR lets the database seek
+        # the (created_at, id) index instead of scanning it from the start
+        if direction == 'next':
+            rows = list(
+                queryset.filter(created_at__lte=created_at)
+                .filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+                .order_by('-created_at', '-id')[:self.per_page + 1]
+            )
+            return CursorPage(rows[:self.per_page], self, len(rows) > self.per_page, True)
+
+        # Oldingi sahifa: teskari tartibda o'qib, natijani qaytarib qo'yamiz
+        rows = list(
+            queryset.filter(created_at__gte=created_at)
+            .filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+            .order_by('created_at', 'id')[:self.per_page + 1]
+        )
+        has_previous = len(rows) > self.per_page
+        return CursorPage(rows[:self.per_page][::-1], self, True, has_previous)
+
+    @property
+    def estimated_total(self):
+        """(count, is_lower_bound) with count capped at estimate_limit, or None when disabled"""
+        if not self.estimate_limit:
+            return None
+        count = self.queryset.order_by()[:self.estimate_limit].count()
+        return count, count >= self.estimate_limit
+
+
+class CursorPaginationMixin:
+    """
+    Opt-in cursor pagination for ListView subclasses ordered by (created_at, id).
+
+    The page is selected with ?cursor=<token>; set cursor_estimate_limit to
+    show an estimated total (first page only) instead of the exact count.
+    """
+    cursor_param = 'cursor'
+    cursor_estimate_limit = 1000
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = CursorPaginator(queryset, page_size, self.cursor_estimate_limit)
+        page = paginator.page(self.request.GET.get(self.cursor_param))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def cursor_query(self, token):
+        """Current query string with the cursor replaced, keeping the filters"""
+        params = self.request.GET.copy()
+        if token:
+            params[self.cursor_param] = token
+        else:
+            params.pop(self.cursor_param, None)
+        return params.urlencode()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        page = context.get('page_obj')
+        if isinstance(page, CursorPage):
+            context['cursor_pagination'] = True
+            context['first_page_query'] = self.cursor_query(None)
+            context['next_page_query'] = self.cursor_query(page.next_cursor) if page.has_next() else None
+            context['previous_page_query'] = (
+                self.cursor_query(page.previous_cursor) if page.has_previous() else None
+            )
+            # Counted on the first page only; deeper pages stay a single indexed query
+            context['estimated_total'] = None if page.has_previous() else page.paginator.estimated_total
+        return context
@@ -1,36 +1,40 @@
 """
 Utility functions for Car Rental Management System
 """
+import re
 from decimal import Decimal
 from datetime import datetime, timedelta
 from django.utils import timezone
-from django.db.models import Q
-from .models import Vehicle, Booking, Contract, Constant
+from django.db import connection
+from django.db.models import DecimalField, Q, Sum, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+from accounts.models import CustomUser
+from vehicles.models import Vehicle
+from bookings.models import Booking, DailyEarnings
+from bookings.availability import availability_index
+from contracts.models import Contract
+from contracts.timeline import contract_timelines
+from constants.cache import system_constants
 
 
 def get_available_vehicles(start_date, end_date, exclude_booking_id=None):
     """
     Get vehicles that are available for booking in the given date range
     """
-    # Get vehicles with conflicting bookings
-    conflicting_bookings = Booking.objects.filter(
-        status__in=['pending', 'active'],
-        start_at__lt=end_date,
-        end_at__gt=start_date
+    candidates = Vehicle.objects.filter(
+        status='available',
+        daily_price__gt=0
     )
     
-    if exclude_booking_id:
-        conflicting_bookings = conflicting_bookings.exclude(id=exclude_booking_id)
-    
-    conflicting_vehicle_ids = conflicting_bookings.values_list('vehicle_id', flat=True)
+    # Conflicting bookings are resolved from the in-memory interval index
+    candidate_ids = list(candidates.values_list('id', flat=True))
+    busy_vehicle_ids = availability_index.busy_vehicle_ids(
+        candidate_ids, start_date, end_date, exclude_booking_id
+    )
     
     # Return available vehicles
-    return Vehicle.objects.filter(
-        status='available',
-        daily_price__gt=0
-    ).exclude(
-        id__in=conflicting_vehicle_ids
-    )
+    return candidates.exclude(id__in=busy_vehicle_ids)
 
 
 def calculate_booking_price(vehicle, start_at, end_at):
@@ -52,30 +56,19 @@ def calculate_earnings(booking):
     """
     Calculate owner and company earnings for a booking based on active contract
     """
-    # Find active contract for this vehicle
+    # Find active contract for this vehicle in the cached contract timeline
     try:
-        contract = Contract.objects.filter(
-            vehicle=booking.vehicle,
-            is_active=True,
-            start_date__lte=booking.start_at.date()
-        ).filter(
-            Q(end_date__isnull=True) | Q(end_date__gte=booking.end_at.date())
-        ).first()
+        contract = contract_timelines.resolve(
+            booking.vehicle_id,
+            booking.start_at.date(),
+            booking.end_at.date()
+        )
         
         if not contract:
             # No active contract, all earnings go to company
             return Decimal("0.00"), booking.total_price
         
-        if contract.pricing_type == "share":
-            # Calculate based on percentages
-            owner_earned = (booking.total_price * contract.owner_share_percent) / Decimal("100.00")
-            company_earned = (booking.total_price * contract.company_share_percent) / Decimal("100.00")
-        else:
-            # Fixed payout - owner gets fixed amount, rest goes to company
-            owner_earned = contract.fixed_payout_amount or Decimal("0.00")
-            company_earned = booking.total_price - owner_earned
-            
-        return owner_earned, company_earned
+        return contract.split_earnings(booking.total_price)
         
     except Exception:
         # Fallback: all earnings to company
@@ -86,16 +79,7 @@ def get_system_constants():
     """
     Get system constants, create default if not exists
     """
-    constants, created = Constant.objects.get_or_create(
-        defaults={
-            'min_owner_rental_days': 30,
-            'min_renter_rental_hours': 1,
-            'late_fee_percent': Decimal("10.00"),
-            'default_owner_share_percent': Decimal("80.00"),
-            'default_company_share_percent': Decimal("20.00"),
-        }
-    )
-    return constants
+    return system_constants.get()
 
 
 def validate_booking_duration(start_at, end_at, user_role=None):
@@ -113,75 +97,67 @@ def validate_booking_duration(start_at, end_at, user_role=None):
     return True, None
 
 
-def get_vehicle_earnings_summary(vehicle, start_date=None, end_date=None):
+def sum_decimal(field):
     """
-    Get earnings summary for a vehicle in a date range
+    SUM over a decimal field that returns 0.00 instead of NULL for no rows
+    """
+    return Coalesce(Sum(field), Value(Decimal("0.00")), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def filter_daily_earnings(rows, start_date=None, end_date=None):
+    """
+    Restrict DailyEarnings rows to an inclusive day range. A booking belongs
+    to the day its end_at falls on (local time).
     """
-    bookings = vehicle.bookings.filter(status='completed')
-    
     if start_date:
-        bookings = bookings.filter(start_at__date__gte=start_date)
+        rows = rows.filter(day__gte=start_date)
     if end_date:
-        bookings = bookings.filter(end_at__date__lte=end_date)
-    
-    total_earnings = sum(booking.total_price for booking in bookings)
-    owner_earnings = sum(booking.owner_earned for booking in bookings)
-    company_earnings = sum(booking.company_earned for booking in bookings)
+        rows = rows.filter(day__lte=end_date)
+    return rows
+
+
+def get_vehicle_earnings_summary(vehicle, start_date=None, end_date=None):
+    """
+    Get earnings summary for a vehicle in a date range
+    """
+    rows = filter_daily_earnings(DailyEarnings.objects.filter(vehicle=vehicle), start_date, end_date)
     
-    return {
-        'total_earnings': total_earnings,
-        'owner_earnings': owner_earnings,
-        'company_earnings': company_earnings,
-        'booking_count': bookings.count()
-    }
+    # Read from the daily rollup instead of scanning bookings
+    return rows.aggregate(
+        total_earnings=sum_decimal('total_earnings'),
+        owner_earnings=sum_decimal('owner_earnings'),
+        company_earnings=sum_decimal('company_earnings'),
+        booking_count=Coalesce(Sum('booking_count'), 0),
+    )
 
 
 def get_owner_earnings_summary(owner, start_date=None, end_date=None):
     """
     Get earnings summary for an owner in a date range
     """
-    bookings = Booking.objects.filter(
-        vehicle__owner=owner,
-        status='completed'
-    )
-    
-    if start_date:
-        bookings = bookings.filter(start_at__date__gte=start_date)
-    if end_date:
-        bookings = bookings.filter(end_at__date__lte=end_date)
+    rows = filter_daily_earnings(DailyEarnings.objects.filter(owner=owner), start_date, end_date)
     
-    total_earnings = sum(booking.owner_earned for booking in bookings)
-    total_bookings = bookings.count()
-    
-    return {
-        'total_earnings': total_earnings,
-        'booking_count': total_bookings,
-        'vehicles_count': owner.vehicles.count()
-    }
+    summary = rows.aggregate(
+        total_earnings=sum_decimal('owner_earnings'),
+        booking_count=Coalesce(Sum('booking_count'), 0),
+    )
+    summary['vehicles_count'] = owner.vehicles.count()
+    return summary
 
 
 def get_company_earnings_summary(start_date=None, end_date=None):
     """
     Get company earnings summary in a date range
     """
-    bookings = Booking.objects.filter(status='completed')
+    rows = filter_daily_earnings(DailyEarnings.objects.all(), start_date, end_date)
     
-    if start_date:
-        bookings = bookings.filter(start_at__date__gte=start_date)
-    if end_date:
-        bookings = bookings.filter(end_at__date__lte=end_date)
-    
-    total_earnings = sum(booking.company_earned for booking in bookings)
-    total_bookings = bookings.count()
-    total_vehicles = Vehicle.objects.count()
-    total_contracts = Contract.objects.filter(is_active=True).count()
-    
-    return {
-        'total_earnings': total_earnings,
-        'booking_count': total_bookings,
-        'vehicles_count': total_vehicles,
-        'contracts_count': total_contracts
-    }
+    summary = rows.aggregate(
+        total_earnings=sum_decimal('company_earnings'),
+        booking_count=Coalesce(Sum('booking_count'), 0),
+    )
+    summary['vehicles_count'] = Vehicle.objects.count()
+    summary['contracts_count'] = Contract.objects.filter(is_active=True).count()
+    return summary
 
 
 def send_booking_notification(booking, notification_type):
@@ -203,22 +179,19 @@ def check_vehicle_availability(vehicle, start_at, end_at, exclude_booking_id=Non
         return False, "Mashina narxi belgilanmagan"
     
     # Check for conflicting bookings
-    conflicting_bookings = Booking.objects.filter(
-        vehicle=vehicle,
-        status__in=['pending', 'active'],
-        start_at__lt=end_at,
-        end_at__gt=start_at
-    )
-    
-    if exclude_booking_id:
-        conflicting_bookings = conflicting_bookings.exclude(id=exclude_booking_id)
-    
-    if conflicting_bookings.exists():
+    if not availability_index.is_free(vehicle.pk, start_at, end_at, exclude_booking_id):
         return False, "Bu vaqtda mashina band"
     
     return True, "Mashina mavjud"
 
 
+def start_of_day(day):
+    """
+    Timezone-aware midnight at the beginning of the given date
+    """
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
 def format_currency(amount):
     """
     Format currency amount for display
@@ -244,3 +217,74 @@ def get_status_color(status):
         'paid': 'green',
     }
     return status_colors.get(status, 'gray')
+
+
+def fts_match_query(text):
+    """
+    FTS5 MATCH expression for free text: every word must match as a prefix.
+    Returns None when the text has no searchable words.
+    """
+    words = re.findall(r'\w+', text.lower())
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def substring_like_pattern(text):
+    """
+    LIKE pattern for the *_trigram tables, which hold phone numbers and plates
+    with separators stripped, so "4567" or "123BC" also matches mid-value.
+    Short terms still work; SQLite just scans the trigram table for them.
+    """
+    compact = re.sub(r'[\W_]', '', text)
+    return f'%{compact}%' if compact else None
+
+
+def use_fts_search():
+    """The FTS5 index tables only exist on SQLite (see the *_search_index migrations)"""
+    return connection.vendor == 'sqlite'
+
+
+def search_vehicle_ids(text):
+    """
+    Ids of vehicles matching the text in name, plate number, make or model
+    (word prefixes, or any part of the plate), usable as the right side of an id__in lookup
+    """
+    if use_fts_search():
+        match = fts_match_query(text)
+        if match is None:
+            return Vehicle.objects.none().values('id')
+        return RawSQL(
+            'SELECT rowid FROM vehicles_vehicle_fts WHERE vehicles_vehicle_fts MATCH %s '
+            'UNION SELECT rowid FROM vehicles_vehicle_trigram WHERE plate_compact LIKE %s',
+            [match, substring_like_pattern(text)],
+        )
+    return Vehicle.objects.filter(
+        Q(name__icontains=text) |
+        Q(plate_number__icontains=text) |
+        Q(make__name__icontains=text) |
+        Q(model__name__icontains=text)
+    ).values('id')
+
+
+def search_user_ids(text):
+    """
+    Ids of users matching the text in username, first/last name or phone
+    (word prefixes, or any part of the phone), usable as the right side of an id__in lookup
+    """
+    if use_fts_search():
+        match = fts_match_query(text)
+        if match is None:
+            return CustomUser.objects.none().values('id')
+        return RawSQL(
+            'SELECT rowid FROM accounts_customuser_fts WHERE accounts_customuser_fts MATCH %s '
+            'UNION SELECT rowid FROM accounts_customuser_trigram WHERE phone_compact LIKE %s',
+            [match, substring_like_pattern(text)],
+        )
+    return CustomUser.objects.filter(
+        Q(username__icontains=text) |
+        Q(first_name__icontains=text) |
+        Q(last_name__icontains=text) |
+        Q(phone__icontains=text)
+    ).values('id')
+
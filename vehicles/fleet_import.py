@@ -0,0 +1,355 @@
+"""
+Streaming fleet import (owners, vehicles and contracts) from CSV/JSONL
+
+One row describes one vehicle together with its owner and, optionally, a
+contract. Rows are parsed one at a time and written in batches, each batch
+in its own transaction:
+
+- CarMake/CarModel names are resolved through in-memory lookups loaded
+  once; only names not seen before are inserted;
+- owners (by username), vehicles (by plate number) and contracts (by
+  owner, vehicle, start_date) are upserted with
+  bulk_create(update_conflicts=True), then ids are read back by their keys;
+  rows whose username belongs to a renter or admin are rejected.
+
+Vehicle status is never overwritten for existing vehicles; imported
+vehicles are recomputed with the deferred status flush instead.
+"""
+import csv
+import json
+from collections import Counter
+from datetime import date
+from functools import partial
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from accounts.dashboard import invalidate_dashboard_stats
+from accounts.models import CustomUser
+from contracts.timeline import contract_timelines
+from bookings.earnings import rebuild_daily_earnings
+from contracts.models import Contract
+from .models import CarMake, CarModel, Vehicle, normalize_plate
+from .onboarding import parse_price, parse_year
+from .status import mark_vehicle_dirty
+
+FORMATS = ('csv', 'jsonl')
+
+FLEET_COLUMNS = (
+    'owner_username', 'owner_first_name', 'owner_last_name', 'owner_phone', 'owner_email',
+    'make', 'model', 'name', 'plate_number', 'year', 'daily_price', 'hourly_price', 'status',
+    'contract_start_date', 'contract_end_date', 'pricing_type', 'owner_share_percent',
+    'company_share_percent', 'fixed_payout_amount', 'min_rental_days', 'contract_active',
+)
+
+OWNER_UPDATE_FIELDS = ['first_name', 'last_name', 'phone']
+VEHICLE_UPDATE_FIELDS = ['owner', 'make', 'model', 'name', 'year', 'daily_price', 'hourly_price', 'updated_at']
+CONTRACT_UPDATE_FIELDS = [
+    'end_date', 'pricing_type', 'owner_share_percent', 'company_share_percent',
+    'fixed_payout_amount', 'min_rental_days', 'is_active', 'updated_at',
+]
+
+VEHICLE_STATUSES = {value for value, _ in Vehicle.STATUS_CHOICES}
+PRICING_TYPES = {value for value, _ in Contract.PRICING_TYPE}
+FALSE_VALUES = {'0', 'false', 'no', "yo'q", 'off'}
+
+
+def read_rows(path, fmt):
+    """Yield (line number, dict or None) from a CSV file with a header row or a JSONL file"""
+    with open(path, newline='', encoding='utf-8-sig') as source:
+        if fmt == 'csv':
+            reader = csv.DictReader(source)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for number, line in enumerate(source, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                row = None
+            yield number, row if isinstance(row, dict) else None
+
+
+def text(row, key, limit=None):
+    value = row.get(key)
+    value = '' if value is None else str(value).strip()
+    return value[:limit] if limit else value
+
+
+def parse_date(value, label):
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValidationError(f"{label} noto'g'ri: {value} (YYYY-MM-DD kutilgan)")
+
+
+def parse_percent(value):
+    if not value:
+        return None
+    try:
+        percent = parse_price(value)
+    except ValidationError:
+        percent = None
+    if percent is None or percent > 100:
+        raise ValidationError(f"Foiz noto'g'ri: {value}")
+    return percent
+
+
+def parse_row(row):
+    """
+    Validate one file row and return a dict with 'owner', 'vehicle' and
+    'contract' (or None) parts; raises ValidationError listing every problem
+    """
+    messages = []
+
+    def check(parse, *args):
+        try:
+            return parse(*args)
+        except ValidationError as error:
+            messages.extend(error.messages)
+
+    username = text(row, 'owner_username', 150)
+    if not username:
+        messages.append("owner_username kiritilishi shart.")
+    owner = {
+        'username': username,
+        'first_name': text(row, 'owner_first_name', 150),
+        'last_name': text(row, 'owner_last_name', 150),
+        'phone': text(row, 'owner_phone', 30),
+        'email': text(row, 'owner_email', 254),
+    }
+
+    status = text(row, 'status') or 'inactive'
+    if status not in VEHICLE_STATUSES:
+        messages.append(f"Holat noto'g'ri: {status}")
+    model = text(row, 'model', 100)
+    make = text(row, 'make', 100)
+    if model and not make:
+        messages.append("Model uchun marka kiritilishi shart.")
+    vehicle = {
+        'plate_number': check(normalize_plate, text(row, 'plate_number')),
+        'make': make,
+        'model': model,
+        'name': text(row, 'name', 200),
+        'year': check(parse_year, text(row, 'year')),
+        'daily_price': check(parse_price, text(row, 'daily_price') or '0'),
+        'hourly_price': check(parse_price, text(row, 'hourly_price')),
+        'status': status,
+    }
+
+    contract = None
+    start_date = check(parse_date, text(row, 'contract_start_date'), "Shartnoma boshlanish sanasi")
+    if start_date:
+        pricing_type = text(row, 'pricing_type') or 'share'
+        if pricing_type not in PRICING_TYPES:
+            messages.append(f"Narxlash turi noto'g'ri: {pricing_type}")
+        min_rental_days = text(row, 'min_rental_days')
+        if min_rental_days and not min_rental_days.isdigit():
+            messages.append(f"Minimal kunlar noto'g'ri: {min_rental_days}")
+        contract = Contract(
+            start_date=start_date,
+            end_date=check(parse_date, text(row, 'contract_end_date'), "Shartnoma tugash sanasi"),
+            pricing_type=pricing_type,
+            owner_share_percent=check(parse_percent, text(row, 'owner_share_percent')),
+            company_share_percent=check(parse_percent, text(row, 'company_share_percent')),
+            fixed_payout_amount=check(parse_price, text(row, 'fixed_payout_amount')),
+            min_rental_days=int(min_rental_days) if min_rental_days.isdigit() else None,
+            is_active=text(row, 'contract_active').lower() not in FALSE_VALUES,
+        )
+        if not messages:
+            # Umumiy foizlar va fixed narx Contract.clean() bilan tekshiriladi
+            check(contract.clean)
+
+    if messages:
+        raise ValidationError(messages)
+    return {'owner': owner, 'vehicle': vehicle, 'contract': contract}
+
+
+def invalidate_timelines(vehicle_ids):
+    for vehicle_id in vehicle_ids:
+        contract_timelines.invalidate(vehicle_id)
+
+
+class FleetImporter:
+    """
+    Write parsed rows batch by batch. With dry_run every batch is rolled
+    back, so the counters show what a real run would write.
+    """
+
+    def __init__(self, using=DEFAULT_DB_ALIAS, dry_run=False):
+        self.using = using
+        self.dry_run = dry_run
+        self.stats = Counter()
+        self.makes = {}
+        self.models = {}
+        self._new_lookups = []
+        self._counted = set()
+
+    def load_lookups(self):
+        """Fill the make/model name caches once (both tables are small)"""
+        for pk, name in CarMake.objects.using(self.using).values_list('id', 'name'):
+            self.makes.setdefault(name.lower(), pk)
+        for pk, make_id, name in CarModel.objects.using(self.using).values_list('id', 'make_id', 'name'):
+            self.models.setdefault((make_id, name.lower()), pk)
+
+    def resolve_lookups(self, rows):
+        """Insert unknown makes and models of the batch and set make_id/model_id on the rows"""
+        manager = CarMake.objects.using(self.using)
+        missing = {}
+        for row in rows:
+            name = row['vehicle']['make']
+            if name and name.lower() not in self.makes:
+                missing.setdefault(name.lower(), name)
+        if missing:
+            manager.bulk_create([CarMake(name=name) for name in missing.values()], ignore_conflicts=True)
+            for pk, name in manager.filter(name__in=list(missing.values())).values_list('id', 'name'):
+                self.remember(self.makes, name.lower(), pk)
+
+        manager = CarModel.objects.using(self.using)
+        missing = {}
+        for row in rows:
+            vehicle = row['vehicle']
+            vehicle['make_id'] = self.makes[vehicle['make'].lower()] if vehicle['make'] else None
+            key = (vehicle['make_id'], vehicle['model'].lower())
+            if vehicle['model'] and key not in self.models:
+                missing.setdefault(key, vehicle['model'])
+        if missing:
+            manager.bulk_create(
+                [CarModel(make_id=make_id, name=name) for (make_id, _), name in missing.items()],
+                ignore_conflicts=True,
+            )
+            created = manager.filter(
+                make_id__in={make_id for make_id, _ in missing}, name__in=list(missing.values()),
+            ).values_list('id', 'make_id', 'name')
+            for pk, make_id, name in created:
+                self.remember(self.models, (make_id, name.lower()), pk)
+
+        for row in rows:
+            vehicle = row['vehicle']
+            vehicle['model_id'] = (
+                self.models[vehicle['make_id'], vehicle['model'].lower()] if vehicle['model'] else None
+            )
+
+    def remember(self, cache, key, pk):
+        if key not in cache:
+            cache[key] = pk
+            self._new_lookups.append((cache, key))
+            # dry run'da bir nom har partiyada qayta qo'shiladi, lekin bir marta sanaladi
+            if key not in self._counted:
+                self._counted.add(key)
+                self.stats['makes' if cache is self.makes else 'models'] += 1
+
+    def forget_new_lookups(self):
+        """Drop cache entries whose rows were rolled back"""
+        for cache, key in self._new_lookups:
+            cache.pop(key, None)
+        self._new_lookups = []
+
+    def reject_non_owners(self, rows):
+        """Split off rows whose username is taken by a renter or admin; returns (rows, rejected)"""
+        usernames = {row['owner']['username'] for row in rows}
+        taken = dict(
+            CustomUser.objects.using(self.using).filter(username__in=list(usernames))
+            .exclude(role=CustomUser.Roles.OWNER).values_list('username', 'role')
+        )
+        if not taken:
+            return rows, []
+        rejected = [
+            (row.get('line'), f"'{row['owner']['username']}' mashina egasi emas ({taken[row['owner']['username']]}).")
+            for row in rows if row['owner']['username'] in taken
+        ]
+        self.stats['skipped'] += len(rejected)
+        return [row for row in rows if row['owner']['username'] not in taken], rejected
+
+    def upsert_owners(self, rows):
+        owners = {row['owner']['username']: row['owner'] for row in rows}
+        CustomUser.objects.using(self.using).bulk_create(
+            [
+                CustomUser(role=CustomUser.Roles.OWNER, password=make_password(None), is_verified=True, **owner)
+                for owner in owners.values()
+            ],
+            update_conflicts=True, unique_fields=['username'], update_fields=OWNER_UPDATE_FIELDS,
+        )
+        self.stats['owners'] += len(owners)
+        return dict(
+            CustomUser.objects.using(self.using).filter(username__in=list(owners)).values_list('username', 'id')
+        )
+
+    def upsert_vehicles(self, rows, owner_ids):
+        vehicles = {}
+        for row in rows:
+            vehicle = row['vehicle']
+            vehicles[vehicle['plate_number']] = Vehicle(
+                owner_id=owner_ids[row['owner']['username']],
+                make_id=vehicle['make_id'], model_id=vehicle['model_id'], name=vehicle['name'],
+                plate_number=vehicle['plate_number'], year=vehicle['year'],
+                daily_price=vehicle['daily_price'], hourly_price=vehicle['hourly_price'],
+                status=vehicle['status'],
+            )
+        manager = Vehicle.objects.using(self.using)
+        old_owners = dict(manager.filter(plate_number__in=list(vehicles)).values_list('plate_number', 'owner_id'))
+        manager.bulk_create(
+            list(vehicles.values()),
+            update_conflicts=True, unique_fields=['plate_number'], update_fields=VEHICLE_UPDATE_FIELDS,
+        )
+        self.stats['vehicles'] += len(vehicles)
+        vehicle_ids = dict(manager.filter(plate_number__in=list(vehicles)).values_list('plate_number', 'id'))
+        # Egasi o'zgargan mashinalarning DailyEarnings qatorlari yangi egaga ko'chiriladi
+        moved = [
+            vehicle_ids[plate] for plate, owner_id in old_owners.items()
+            if owner_id != vehicles[plate].owner_id
+        ]
+        if moved:
+            rebuild_daily_earnings(moved, using=self.using)
+            self.stats['owner_changes'] += len(moved)
+        return vehicle_ids
+
+    def upsert_contracts(self, rows, owner_ids, vehicle_ids):
+        contracts = {}
+        for row in rows:
+            contract = row['contract']
+            if contract is None:
+                continue
+            contract.owner_id = owner_ids[row['owner']['username']]
+            contract.vehicle_id = vehicle_ids[row['vehicle']['plate_number']]
+            contracts[contract.owner_id, contract.vehicle_id, contract.start_date] = contract
+        if contracts:
+            Contract.objects.using(self.using).bulk_create(
+                list(contracts.values()),
+                update_conflicts=True, unique_fields=['owner', 'vehicle', 'start_date'],
+                update_fields=CONTRACT_UPDATE_FIELDS,
+            )
+        self.stats['contracts'] += len(contracts)
+
+    def import_batch(self, rows):
+        """Upsert one batch of parsed rows in a single transaction; returns the rejected (line, message) pairs"""
+        with transaction.atomic(using=self.using):
+            rows, rejected = self.reject_non_owners(rows)
+            if not rows:
+                return rejected
+            self.resolve_lookups(rows)
+            owner_ids = self.upsert_owners(rows)
+            vehicle_ids = self.upsert_vehicles(rows, owner_ids)
+            self.upsert_contracts(rows, owner_ids, vehicle_ids)
+            if self.dry_run:
+                transaction.set_rollback(True, using=self.using)
+            else:
+                # bulk_create signal yubormaydi: holat va dashboard qo'lda yangilanadi
+                for vehicle_id in vehicle_ids.values():
+                    mark_vehicle_dirty(vehicle_id, self.using)
+                invalidate_dashboard_stats(self.using)
+                contract_vehicle_ids = [
+                    vehicle_ids[row['vehicle']['plate_number']] for row in rows if row['contract'] is not None
+                ]
+                # bulk_create Contract signallarini chetlab o'tadi
+                transaction.on_commit(partial(invalidate_timelines, contract_vehicle_ids), using=self.using)
+        if self.dry_run:
+            self.forget_new_lookups()
+        self._new_lookups = []
+        self.stats['imported'] += len(rows)
+        return rejected
@@ -0,0 +1,103 @@
+import json
+import os
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from vehicles.fleet_import import FLEET_COLUMNS, FORMATS, FleetImporter, parse_row, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Import owners, vehicles and contracts from a CSV/JSONL file in batched upserts. "
+        f"Columns: {', '.join(FLEET_COLUMNS)}"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV (with a header row) or JSONL file")
+        parser.add_argument('--format', choices=FORMATS, help="Default: from the file extension")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows written per transaction")
+        parser.add_argument('--dry-run', action='store_true', help="Validate and write every batch, then roll back")
+        parser.add_argument('--checkpoint', help="Checkpoint file (default: <path>.checkpoint)")
+        parser.add_argument('--resume', action='store_true', help="Skip the rows committed by a previous run")
+
+    def handle(self, *args, **options):
+        path = os.path.abspath(options['path'])
+        if not os.path.exists(path):
+            raise CommandError(f"Fayl topilmadi: {path}")
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError("--batch-size must be positive")
+        dry_run = options['dry_run']
+        checkpoint = options['checkpoint'] or f"{path}.checkpoint"
+        skip = self.read_checkpoint(checkpoint, path) if options['resume'] else 0
+        if skip:
+            self.stdout.write(f"Resuming after {skip:,} rows")
+
+        importer = FleetImporter(dry_run=dry_run)
+        importer.load_lookups()
+        started = time.perf_counter()
+        consumed = 0
+        batch = []
+
+        def flush():
+            for number, message in importer.import_batch(batch):
+                self.stderr.write(f"line {number}: {message}")
+            batch.clear()
+            if not dry_run:
+                self.write_checkpoint(checkpoint, path, consumed)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{consumed:,} rows, {importer.stats['imported']:,} imported, "
+                f"{(consumed - skip) / elapsed:,.0f} rows/s"
+            )
+
+        for number, row in read_rows(path, fmt):
+            consumed += 1
+            if consumed <= skip:
+                continue  # oldingi ishga tushirishda saqlangan
+            try:
+                if row is None:
+                    raise ValidationError("Qatorni o'qib bo'lmadi.")
+                parsed = parse_row(row)
+            except ValidationError as error:
+                importer.stats['skipped'] += 1
+                self.stderr.write(f"line {number}: {' '.join(error.messages)}")
+                continue
+            parsed['line'] = number
+            batch.append(parsed)
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+
+        if not dry_run and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        elapsed = time.perf_counter() - started
+        stats = importer.stats
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Dry run: ' if dry_run else ''}{consumed - skip:,} rows in {elapsed:.2f}s "
+            f"({(consumed - skip) / elapsed if elapsed else 0:,.0f} rows/s): "
+            f"{stats['imported']:,} imported, {stats['skipped']:,} skipped; "
+            f"upserted {stats['owners']:,} owners, {stats['vehicles']:,} vehicles, "
+            f"{stats['contracts']:,} contracts; new {stats['makes']:,} makes, {stats['models']:,} models"
+            + (f"; {stats['owner_changes']:,} vehicles changed owner" if stats['owner_changes'] else '')
+        ))
+
+    def read_checkpoint(self, checkpoint, path):
+        if not os.path.exists(checkpoint):
+            return 0
+        with open(checkpoint) as source:
+            state = json.load(source)
+        if state.get('file') != path or state.get('size') != os.path.getsize(path):
+            raise CommandError(f"{checkpoint} boshqa faylga tegishli; uni o'chirib qayta ishga tushiring")
+        return state['rows']
+
+    def write_checkpoint(self, checkpoint, path, rows):
+        # Yarim yozilgan fayl qolmasligi uchun vaqtinchalik fayl + os.replace
+        temporary = f"{checkpoint}.tmp"
+        with open(temporary, 'w') as target:
+            json.dump({'file': path, 'size': os.path.getsize(path), 'rows': rows}, target)
+        os.replace(temporary, checkpoint)
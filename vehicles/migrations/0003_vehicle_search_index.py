@@ -0,0 +1,86 @@
+from django.db import migrations
+
+VEHICLE_DOCUMENT = """
+    SELECT {id}, {name}, {plate}, replace({plate}, ' ', ''),
+           (SELECT name FROM vehicles_carmake WHERE id = {make_id}),
+           (SELECT name FROM vehicles_carmodel WHERE id = {model_id})
+"""
+
+
+def document(prefix):
+    return VEHICLE_DOCUMENT.format(
+        id=f'{prefix}.id', name=f'{prefix}.name', plate=f'{prefix}.plate_number',
+        make_id=f'{prefix}.make_id', model_id=f'{prefix}.model_id',
+    )
+
+
+FTS_COLUMNS = 'rowid, name, plate_number, plate_compact, make, model'
+
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE vehicles_vehicle_fts USING fts5(
+        name, plate_number, plate_compact, make, model,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER vehicles_vehicle_fts_insert AFTER INSERT ON vehicles_vehicle BEGIN
+        INSERT INTO vehicles_vehicle_fts ({FTS_COLUMNS}) {document('new')};
+    END
+    """,
+    f"""
+    CREATE TRIGGER vehicles_vehicle_fts_update
+    AFTER UPDATE OF name, plate_number, make_id, model_id ON vehicles_vehicle BEGIN
+        DELETE FROM vehicles_vehicle_fts WHERE rowid = old.id;
+        INSERT INTO vehicles_vehicle_fts ({FTS_COLUMNS}) {document('new')};
+    END
+    """,
+    """
+    CREATE TRIGGER vehicles_vehicle_fts_delete AFTER DELETE ON vehicles_vehicle BEGIN
+        DELETE FROM vehicles_vehicle_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER vehicles_carmake_fts_update AFTER UPDATE OF name ON vehicles_carmake BEGIN
+        UPDATE vehicles_vehicle_fts SET make = new.name
+        WHERE rowid IN (SELECT id FROM vehicles_vehicle WHERE make_id = new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER vehicles_carmodel_fts_update AFTER UPDATE OF name ON vehicles_carmodel BEGIN
+        UPDATE vehicles_vehicle_fts SET model = new.name
+        WHERE rowid IN (SELECT id FROM vehicles_vehicle WHERE model_id = new.id);
+    END
+    """,
+    f"INSERT INTO vehicles_vehicle_fts ({FTS_COLUMNS}) {document('v')} FROM vehicles_vehicle v",
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS vehicles_carmodel_fts_update',
+    'DROP TRIGGER IF EXISTS vehicles_carmake_fts_update',
+    'DROP TRIGGER IF EXISTS vehicles_vehicle_fts_delete',
+    'DROP TRIGGER IF EXISTS vehicles_vehicle_fts_update',
+    'DROP TRIGGER IF EXISTS vehicles_vehicle_fts_insert',
+    'DROP TABLE IF EXISTS vehicles_vehicle_fts',
+]
+
+
+def run_on_sqlite(statements):
+    # FTS5 faqat SQLite'da; boshqa bazalarda qidiruv icontains bilan ishlaydi
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicles', '0002_alter_vehicle_status'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_sqlite(CREATE_SQL), run_on_sqlite(DROP_SQL)),
+    ]
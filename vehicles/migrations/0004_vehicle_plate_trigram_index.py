@@ -0,0 +1,60 @@
+from django.db import migrations
+
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE vehicles_vehicle_trigram USING fts5(
+        plate_compact, tokenize = 'trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER vehicles_vehicle_trigram_insert AFTER INSERT ON vehicles_vehicle BEGIN
+        INSERT INTO vehicles_vehicle_trigram (rowid, plate_compact)
+        VALUES (new.id, replace(new.plate_number, ' ', ''));
+    END
+    """,
+    """
+    CREATE TRIGGER vehicles_vehicle_trigram_update
+    AFTER UPDATE OF plate_number ON vehicles_vehicle BEGIN
+        DELETE FROM vehicles_vehicle_trigram WHERE rowid = old.id;
+        INSERT INTO vehicles_vehicle_trigram (rowid, plate_compact)
+        VALUES (new.id, replace(new.plate_number, ' ', ''));
+    END
+    """,
+    """
+    CREATE TRIGGER vehicles_vehicle_trigram_delete AFTER DELETE ON vehicles_vehicle BEGIN
+        DELETE FROM vehicles_vehicle_trigram WHERE rowid = old.id;
+    END
+    """,
+    """
+    INSERT INTO vehicles_vehicle_trigram (rowid, plate_compact)
+    SELECT id, replace(plate_number, ' ', '') FROM vehicles_vehicle
+    """,
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS vehicles_vehicle_trigram_delete',
+    'DROP TRIGGER IF EXISTS vehicles_vehicle_trigram_update',
+    'DROP TRIGGER IF EXISTS vehicles_vehicle_trigram_insert',
+    'DROP TABLE IF EXISTS vehicles_vehicle_trigram',
+]
+
+
+def run_on_sqlite(statements):
+    # Trigram FTS5 faqat SQLite'da; boshqa bazalarda qidiruv icontains bilan ishlaydi
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicles', '0003_vehicle_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_sqlite(CREATE_SQL), run_on_sqlite(DROP_SQL)),
+    ]
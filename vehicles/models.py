@@ -10,6 +10,18 @@ plate_validator = RegexValidator(
     message="Plate format bo'lishi kerak: '12 A 345 BC'."
 )
 
+def normalize_plate(value):
+    """
+    Istalgan yozuvni ('12a345bc', '12 A 345 BC') '12 A 345 BC' ko'rinishiga keltirish.
+    Noto'g'ri formatda ValidationError.
+    """
+    # Barcha bo'shliqlarni olib tashlash va katta harflarga o'tkazish
+    plate = str(value).strip().upper().replace(' ', '')
+    # Format: 2 raqam + harf + 3 raqam + 2 harf
+    if len(plate) == 8 and plate[:2].isdigit() and plate[2].isalpha() and plate[3:6].isdigit() and plate[6:8].isalpha():
+        return f"{plate[:2]} {plate[2]} {plate[3:6]} {plate[6:8]}"
+    raise ValidationError("Plate format bo'lishi kerak: '12 A 345 BC' yoki '12A345BC'.")
+
 class CarMake(models.Model):
     name = models.CharField(max_length=100, unique=True)
     def __str__(self):
@@ -54,18 +66,9 @@ class Vehicle(models.Model):
         return f"{display_name} ({self.plate_number})"
 
     def clean(self):
-        from django.core.exceptions import ValidationError
         # Normalize plate number - istalgan formatni to'g'ri formatga o'tkazish
         if self.plate_number:
-            # Barcha bo'shliqlarni olib tashlash va katta harflarga o'tkazish
-            plate = self.plate_number.strip().upper().replace(' ', '')
-            
-            # Format: 2 raqam + harf + 3 raqam + 2 harf
-            if len(plate) == 8 and plate[:2].isdigit() and plate[2].isalpha() and plate[3:6].isdigit() and plate[6:8].isalpha():
-                # To'g'ri formatga o'tkazish: "12 A 345 BC"
-                self.plate_number = f"{plate[:2]} {plate[2]} {plate[3:6]} {plate[6:8]}"
-            else:
-                raise ValidationError("Plate format bo'lishi kerak: '12 A 345 BC' yoki '12A345BC'.")
+            self.plate_number = normalize_plate(self.plate_number)
 
     def save(self, *args, **kwargs):
         self.clean()
@@ -0,0 +1,157 @@
+"""
+Bulk vehicle onboarding
+
+All rows are validated and normalized before anything is written: plates
+are checked against each other and against the database with one query,
+makes/models with one query each, and the whole fleet is inserted with a
+single bulk_create inside one transaction. A batch with any invalid row
+inserts nothing and reports the errors per row.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+
+from .models import CarMake, CarModel, Vehicle, normalize_plate
+
+MAX_PRICE = Decimal('99999999.99')  # max_digits=10, decimal_places=2
+
+
+def parse_price(value, required=False):
+    if value in (None, ''):
+        if required:
+            raise ValidationError("Kunlik narx kiritilishi shart.")
+        return None
+    try:
+        price = Decimal(str(value).strip().replace(' ', '')).quantize(Decimal('0.01'))
+    except (InvalidOperation, ValueError):
+        raise ValidationError(f"Narx noto'g'ri: {value}")
+    if not Decimal('0') <= price <= MAX_PRICE:
+        raise ValidationError(f"Narx noto'g'ri: {value}")
+    return price
+
+
+def parse_year(value):
+    if value in (None, ''):
+        return None
+    try:
+        year = int(str(value).strip())
+    except ValueError:
+        raise ValidationError(f"Yil noto'g'ri: {value}")
+    if not 0 < year <= 32767:
+        raise ValidationError(f"Yil noto'g'ri: {value}")
+    return year
+
+
+def parse_id(value, message):
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValidationError(message)
+
+
+def build_vehicles(rows, using=DEFAULT_DB_ALIAS, status='available'):
+    """
+    Validate onboarding rows (dicts with make, model, name, plate_number,
+    year, daily_price, hourly_price).
+
+    Returns (vehicles, errors): unsaved Vehicle objects without an owner and
+    {row index: [messages]}; vehicles is empty when any row has errors.
+    """
+    built, errors, plates = [], {}, {}
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors[index] = ["Mashina ma'lumotlari noto'g'ri."]
+            continue
+        row_errors = []
+        vehicle = Vehicle(status=status, name=str(row.get('name') or '').strip()[:200])
+        checks = (
+            ('plate_number', lambda: normalize_plate(row.get('plate_number') or '')),
+            ('year', lambda: parse_year(row.get('year'))),
+            ('daily_price', lambda: parse_price(row.get('daily_price'), required=True)),
+            ('hourly_price', lambda: parse_price(row.get('hourly_price'))),
+            ('make_id', lambda: parse_id(row.get('make'), "Marka topilmadi.")),
+            ('model_id', lambda: parse_id(row.get('model'), "Model topilmadi.")),
+        )
+        for field, parse in checks:
+            try:
+                setattr(vehicle, field, parse())
+            except ValidationError as error:
+                row_errors.extend(error.messages)
+
+        if vehicle.plate_number:
+            if vehicle.plate_number in plates:
+                row_errors.append(
+                    f"{vehicle.plate_number} raqami {plates[vehicle.plate_number] + 1}-qatorda ham bor."
+                )
+            else:
+                plates[vehicle.plate_number] = index
+        if row_errors:
+            errors[index] = row_errors
+        built.append((index, vehicle))
+
+    # Bazadagi raqamlar, markalar va modellar - har biri bitta so'rov
+    taken = set(
+        Vehicle.objects.using(using).filter(plate_number__in=list(plates)).values_list('plate_number', flat=True)
+    )
+    make_ids = {vehicle.make_id for _, vehicle in built if vehicle.make_id is not None}
+    model_ids = {vehicle.model_id for _, vehicle in built if vehicle.model_id is not None}
+    known_makes = set()
+    if make_ids:
+        known_makes = set(CarMake.objects.using(using).filter(id__in=make_ids).values_list('id', flat=True))
+    model_makes = {}
+    if model_ids:
+        model_makes = dict(CarModel.objects.using(using).filter(id__in=model_ids).values_list('id', 'make_id'))
+
+    for index, vehicle in built:
+        row_errors = []
+        if vehicle.plate_number in taken and plates.get(vehicle.plate_number) == index:
+            row_errors.append(f"{vehicle.plate_number} raqamli mashina allaqachon mavjud.")
+        if vehicle.make_id is not None and vehicle.make_id not in known_makes:
+            row_errors.append("Marka topilmadi.")
+        if vehicle.model_id is not None:
+            if vehicle.model_id not in model_makes:
+                row_errors.append("Model topilmadi.")
+            elif vehicle.make_id is not None and model_makes[vehicle.model_id] != vehicle.make_id:
+                row_errors.append("Model tanlangan markaga tegishli emas.")
+        if row_errors:
+            errors.setdefault(index, []).extend(row_errors)
+
+    if errors:
+        return [], errors
+    return [vehicle for _, vehicle in built], {}
+
+
+def save_vehicles(owner, vehicles, using=DEFAULT_DB_ALIAS):
+    """Insert validated vehicles for the owner with one bulk_create"""
+    from accounts.dashboard import invalidate_dashboard_stats
+
+    for vehicle in vehicles:
+        vehicle.owner = owner
+    with transaction.atomic(using=using):
+        created = Vehicle.objects.using(using).bulk_create(vehicles)
+        # bulk_create post_save signalini yubormaydi
+        invalidate_dashboard_stats(using)
+    return created
+
+
+def onboard_vehicles(owner, rows, using=DEFAULT_DB_ALIAS, status='available'):
+    """
+    Validate and insert a whole fleet for the owner.
+
+    Returns (created vehicles, errors); nothing is inserted when errors is
+    not empty. A plate taken concurrently between the check and the insert
+    is reported as that row's error.
+    """
+    vehicles, errors = build_vehicles(rows, using, status)
+    if errors:
+        return [], errors
+    try:
+        return save_vehicles(owner, vehicles, using), {}
+    except IntegrityError:
+        vehicles, errors = build_vehicles(rows, using, status)
+        if not errors:
+            raise
+        return [], errors
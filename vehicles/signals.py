@@ -1,26 +1,38 @@
 from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 from .models import Vehicle
+from .status import mark_vehicle_dirty
+from bookings.earnings import rebuild_daily_earnings
 from contracts.models import Contract
+from diagnostics.metrics import timed_handler
 
 @receiver(post_save, sender=Vehicle)
-def update_vehicle_status_on_price_change(sender, instance, created, **kwargs):
+@timed_handler
+def update_vehicle_status_on_price_change(sender, instance, created, using, **kwargs):
     """Update vehicle status to available when daily_price is set and active contract exists"""
-    if not created and instance.daily_price > 0:
-        # Check if there's an active contract for this vehicle
-        active_contract = Contract.objects.filter(
-            vehicle=instance,
-            is_active=True
-        ).first()
-        
-        if active_contract and instance.status == 'inactive':
-            instance.status = 'available'
-            instance.save(update_fields=['status'])
+    if not created and instance.status == 'inactive' and instance.daily_price > 0:
+        mark_vehicle_dirty(instance.pk, using)
+
+@receiver(pre_save, sender=Vehicle)
+@timed_handler
+def remember_owner_before_save(sender, instance, using, update_fields=None, **kwargs):
+    instance._owner_before_save = None
+    if instance.pk and (update_fields is None or 'owner' in update_fields):
+        instance._owner_before_save = (
+            Vehicle.objects.using(using).filter(pk=instance.pk).values_list('owner_id', flat=True).first()
+        )
+
+@receiver(post_save, sender=Vehicle)
+@timed_handler
+def rekey_daily_earnings_on_owner_change(sender, instance, created, using, **kwargs):
+    """DailyEarnings rows are keyed by owner: rebuild them for the new owner"""
+    old_owner_id = instance.__dict__.pop('_owner_before_save', None)
+    if not created and old_owner_id is not None and old_owner_id != instance.owner_id:
+        rebuild_daily_earnings([instance.pk], using=using)
 
 @receiver(post_save, sender=Contract)
-def update_vehicle_status_on_contract_creation(sender, instance, created, **kwargs):
+@timed_handler
+def update_vehicle_status_on_contract_creation(sender, instance, created, using, **kwargs):
     """Update vehicle status to available when active contract is created and price is set"""
-    if created and instance.is_active and instance.vehicle.daily_price > 0:
-        if instance.vehicle.status == 'inactive':
-            instance.vehicle.status = 'available'
-            instance.vehicle.save(update_fields=['status'])
+    if created and instance.is_active:
+        mark_vehicle_dirty(instance.vehicle_id, using)
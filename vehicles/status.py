@@ -0,0 +1,67 @@
+"""
+Deferred vehicle status recomputation
+
+Booking, Vehicle and Contract changes only mark the affected vehicles as
+dirty. The dirty set is kept per thread and database alias and flushed
+once when the surrounding transaction commits (immediately in autocommit
+mode), recomputing Vehicle.status for every touched vehicle with a single
+UPDATE statement.
+"""
+import threading
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Case, Exists, F, OuterRef, Q, Value, When
+
+_state = threading.local()
+
+
+def _dirty_vehicles(using):
+    pending = getattr(_state, 'pending', None)
+    if pending is None:
+        pending = _state.pending = {}
+    return pending.setdefault(using, set())
+
+
+def mark_vehicle_dirty(vehicle_id, using=DEFAULT_DB_ALIAS):
+    """Schedule a status recomputation of the vehicle at transaction commit"""
+    _dirty_vehicles(using).add(vehicle_id)
+    # Every mark registers a callback, so a rolled back transaction cannot
+    # swallow the flush; the first callback empties the set and later ones
+    # return without querying.
+    transaction.on_commit(lambda: flush_dirty_vehicles(using), using=using)
+
+
+def vehicle_status_expression():
+    """
+    New Vehicle.status as an SQL expression:
+
+    - an active booking makes the vehicle 'rented';
+    - a 'rented' vehicle without active bookings becomes 'available';
+    - an 'inactive' vehicle with a price and an active contract becomes 'available';
+    - any other status is kept.
+    """
+    from bookings.models import Booking
+    from contracts.models import Contract
+
+    has_active_booking = Exists(Booking.objects.filter(vehicle=OuterRef('pk'), status='active'))
+    has_active_contract = Exists(Contract.objects.filter(vehicle=OuterRef('pk'), is_active=True))
+    return Case(
+        When(has_active_booking, then=Value('rented')),
+        When(status='rented', then=Value('available')),
+        When(Q(status='inactive', daily_price__gt=0) & has_active_contract, then=Value('available')),
+        default=F('status'),
+    )
+
+
+def flush_dirty_vehicles(using=DEFAULT_DB_ALIAS):
+    """Recompute the status of all dirty vehicles with one bulk UPDATE"""
+    from .models import Vehicle
+
+    dirty = _dirty_vehicles(using)
+    if not dirty:
+        return 0
+    vehicle_ids = list(dirty)
+    dirty.clear()
+    return Vehicle.objects.using(using).filter(id__in=vehicle_ids).update(
+        status=vehicle_status_expression()
+    )
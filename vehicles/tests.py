@@ -1,3 +1,273 @@
+import csv
+import json
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from bookings.models import Booking, DailyEarnings
+from contracts.models import Contract
+from contracts.timeline import contract_timelines
+from .models import CarMake, CarModel, Vehicle
+from .onboarding import onboard_vehicles
+
+
+class AvailabilityMatrixTests(TestCase):
+    def setUp(self):
+        self.owner = CustomUser.objects.create_user(username='owner', password='x', role='owner')
+        self.renter = CustomUser.objects.create_user(username='renter', password='x', role='renter')
+        self.vehicle = Vehicle.objects.create(
+            owner=self.owner, plate_number='01 A 123 BC',
+            daily_price=Decimal('300000.00'), status='available',
+        )
+        self.broken = Vehicle.objects.create(
+            owner=self.owner, plate_number='01 B 456 CD',
+            daily_price=Decimal('300000.00'), status='maintenance',
+        )
+        self.start = timezone.make_aware(datetime(2030, 1, 1))
+        Booking.objects.create(
+            renter=self.renter, vehicle=self.vehicle,
+            start_at=self.start + timedelta(days=2, hours=6),
+            end_at=self.start + timedelta(days=4),
+            status='active',
+        )
+        Booking.objects.create(
+            renter=self.renter, vehicle=self.vehicle,
+            start_at=self.start + timedelta(days=8),
+            end_at=self.start + timedelta(days=9),
+            status='cancelled',
+        )
+        self.client.force_login(self.owner)
+
+    def get_rows(self, **params):
+        params.setdefault('start', '2030-01-01')
+        params.setdefault('days', 10)
+        response = self.client.get(reverse('vehicle_availability_matrix'), params)
+        self.assertEqual(response.status_code, 200)
+        return {row['id']: row['row'] for row in response.json()['vehicles']}
+
+    def test_run_length_rows(self):
+        rows = self.get_rows()
+        self.assertEqual(rows[self.vehicle.pk], [0, 2, 1, 2, 0, 6])
+        self.assertEqual(rows[self.broken.pk], [2, 10])
+
+    def test_bitset_rows(self):
+        rows = self.get_rows(encoding='bitset', slot='hour', days=3)
+        self.assertEqual(int(rows[self.vehicle.pk], 16), ((1 << 18) - 1) << 54)
+        self.assertEqual(int(rows[self.broken.pk], 16), (1 << 72) - 1)
+
+    def test_invalid_parameters(self):
+        response = self.client.get(reverse('vehicle_availability_matrix'), {'days': 500})
+        self.assertEqual(response.status_code, 400)
+
+
+class VehicleSearchTests(TestCase):
+    def setUp(self):
+        self.owner = CustomUser.objects.create_user(username='owner', password='x', role='owner')
+        self.make = CarMake.objects.create(name='Chevrolet')
+        self.model = CarModel.objects.create(make=self.make, name='Cobalt')
+        self.cobalt = Vehicle.objects.create(
+            owner=self.owner, plate_number='01 A 123 BC', make=self.make, model=self.model,
+        )
+        self.other = Vehicle.objects.create(owner=self.owner, plate_number='10 K 555 KK', name='Damas')
+        self.client.force_login(self.owner)
+
+    def search(self, text):
+        response = self.client.get(reverse('vehicle_list'), {'search': text})
+        return list(response.context['vehicles'])
+
+    def test_search_by_name_plate_make_and_model(self):
+        self.assertEqual(self.search('chev'), [self.cobalt])
+        self.assertEqual(self.search('cobalt'), [self.cobalt])
+        self.assertEqual(self.search('10K555'), [self.other])
+        self.assertEqual(self.search('damas'), [self.other])
+
+    def test_search_by_plate_suffix(self):
+        self.assertEqual(self.search('123BC'), [self.cobalt])
+        self.assertEqual(self.search('555 kk'), [self.other])
+        self.assertEqual(self.search('55'), [self.other])
+        self.other.plate_number = '10 K 888 KK'
+        self.other.save()
+        self.assertEqual(self.search('555'), [])
+        self.assertEqual(self.search('888'), [self.other])
+
+    def test_make_and_model_renames_are_indexed(self):
+        self.make.name = 'Ravon'
+        self.make.save()
+        self.model.name = 'Nexia'
+        self.model.save()
+        self.assertEqual(self.search('ravon nexia'), [self.cobalt])
+        self.assertEqual(self.search('chevrolet'), [])
+
+
+
+class VehicleOnboardingTests(TestCase):
+    def setUp(self):
+        self.owner = CustomUser.objects.create_user(username='owner', password='x', role='owner')
+        self.make = CarMake.objects.create(name='Chevrolet')
+        self.model = CarModel.objects.create(make=self.make, name='Cobalt')
+        self.other_model = CarModel.objects.create(make=CarMake.objects.create(name='Kia'), name='K5')
+        Vehicle.objects.create(owner=self.owner, plate_number='01 A 123 BC')
+
+    def row(self, plate, **extra):
+        row = {'make': self.make.pk, 'model': self.model.pk, 'plate_number': plate,
+               'year': '2020', 'daily_price': '300000', 'hourly_price': ''}
+        row.update(extra)
+        return row
+
+    def test_fleet_is_inserted_in_constant_queries(self):
+        rows = [self.row(f'10a{i:03d}bc') for i in range(60)]
+        # plates, makes, models, savepoint, INSERT, release
+        with self.assertNumQueries(6):
+            created, errors = onboard_vehicles(self.owner, rows)
+        self.assertEqual(errors, {})
+        self.assertEqual(len(created), 60)
+        vehicle = Vehicle.objects.get(plate_number='10 A 007 BC')
+        self.assertEqual((vehicle.owner, vehicle.status, vehicle.year), (self.owner, 'available', 2020))
+        self.assertEqual(vehicle.daily_price, Decimal('300000.00'))
+
+    def test_errors_are_reported_per_row_and_nothing_is_saved(self):
+        rows = [
+            self.row('10 B 111 CD'),
+            self.row('1B111CD'),
+            self.row('10b111cd'),
+            self.row('01a123bc'),
+            self.row('10 C 222 DE', model=self.other_model.pk, daily_price='narx'),
+        ]
+        created, errors = onboard_vehicles(self.owner, rows)
+        self.assertEqual(created, [])
+        self.assertEqual(sorted(errors), [1, 2, 3, 4])
+        self.assertIn('1-qatorda', errors[2][0])
+        self.assertIn('allaqachon mavjud', errors[3][0])
+        self.assertEqual(len(errors[4]), 2)
+        self.assertEqual(Vehicle.objects.count(), 1)
+
+
+class ImportFleetTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'fleet.csv')
+        CarMake.objects.create(name='Chevrolet')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, rows):
+        with open(self.path, 'w', newline='') as target:
+            writer = csv.DictWriter(target, fieldnames=['owner_username', 'owner_first_name', 'make', 'model',
+                                                        'plate_number', 'daily_price', 'contract_start_date'])
+            writer.writeheader()
+            writer.writerows(rows)
+
+    def run_import(self, *args):
+        out, err = StringIO(), StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import_fleet', self.path, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def fleet(self, price='300000'):
+        return [
+            {'owner_username': 'sardor', 'owner_first_name': 'Sardor', 'make': 'chevrolet', 'model': 'Cobalt',
+             'plate_number': '01a123bc', 'daily_price': price, 'contract_start_date': '2030-01-01'},
+            {'owner_username': 'sardor', 'make': 'Kia', 'model': 'K5', 'plate_number': '01 B 456 CD',
+             'daily_price': price, 'contract_start_date': ''},
+            {'owner_username': 'aziz', 'make': 'Chevrolet', 'model': 'Cobalt', 'plate_number': '10K555KK',
+             'daily_price': price, 'contract_start_date': '2030-01-01'},
+            {'owner_username': '', 'plate_number': 'xato'},
+        ]
+
+    def test_import_is_an_upsert(self):
+        self.write(self.fleet())
+        out, err = self.run_import('--batch-size', '2')
+        self.assertIn('3 imported, 1 skipped', out)
+        self.assertIn('line 5:', err)
+        self.assertEqual(CarMake.objects.count(), 2)
+        self.assertEqual(CarModel.objects.count(), 2)
+        vehicle = Vehicle.objects.get(plate_number='01 A 123 BC')
+        self.assertEqual((vehicle.owner.username, vehicle.model.name), ('sardor', 'Cobalt'))
+        self.assertEqual(vehicle.make.name, 'Chevrolet')
+        # narx va faol shartnoma bo'lgani uchun holat qayta hisoblanadi
+        self.assertEqual(vehicle.status, 'available')
+        contract = Contract.objects.get(vehicle=vehicle)
+        self.assertEqual((contract.start_date, contract.owner_share_percent), (date(2030, 1, 1), Decimal('80.00')))
+        self.assertFalse(os.path.exists(self.path + '.checkpoint'))
+
+        self.write(self.fleet(price='350000'))
+        self.run_import()
+        self.assertEqual(Vehicle.objects.count(), 3)
+        self.assertEqual(Contract.objects.count(), 2)
+        self.assertEqual(CustomUser.objects.filter(role='owner').count(), 2)
+        self.assertEqual(Vehicle.objects.get(plate_number='10 K 555 KK').daily_price, Decimal('350000.00'))
+
+    def test_owner_change_moves_daily_earnings(self):
+        self.write(self.fleet())
+        self.run_import()
+        vehicle = Vehicle.objects.get(plate_number='10 K 555 KK')
+        renter = CustomUser.objects.create_user(username='mijoz', password='x', role='renter')
+        start_at = timezone.now() - timedelta(days=3)
+        Booking.objects.create(
+            renter=renter, vehicle=vehicle, start_at=start_at, end_at=start_at + timedelta(days=1),
+            status='completed', total_price=Decimal('1000.00'), owner_earned=Decimal('800.00'),
+            company_earned=Decimal('200.00'),
+        )
+
+        rows = self.fleet()
+        rows[2]['owner_username'] = 'sardor'
+        self.write(rows)
+        out, _ = self.run_import()
+        self.assertIn('1 vehicles changed owner', out)
+        self.assertEqual(
+            list(DailyEarnings.objects.values_list('owner__username', flat=True)), ['sardor'],
+        )
+
+    def test_rows_of_non_owner_accounts_are_rejected(self):
+        renter = CustomUser.objects.create_user(username='aziz', password='x', role='renter')
+        self.write(self.fleet())
+        out, err = self.run_import()
+        self.assertIn('2 imported, 2 skipped', out)
+        self.assertIn("line 4: 'aziz' mashina egasi emas (renter).", err)
+        renter.refresh_from_db()
+        self.assertEqual(renter.role, 'renter')
+        self.assertFalse(renter.vehicles.exists())
+
+    def test_import_invalidates_contract_timelines(self):
+        self.write(self.fleet())
+        self.run_import()
+        vehicle = Vehicle.objects.get(plate_number='01 A 123 BC')
+        contract = contract_timelines.resolve(vehicle.pk, date(2030, 2, 1), date(2030, 2, 2))
+        self.assertEqual(contract.owner_share_percent, Decimal('80.00'))
+
+        with open(self.path, 'w', newline='') as target:
+            writer = csv.DictWriter(target, fieldnames=['owner_username', 'plate_number', 'daily_price',
+                                                        'contract_start_date', 'owner_share_percent',
+                                                        'company_share_percent'])
+            writer.writeheader()
+            writer.writerow({'owner_username': 'sardor', 'plate_number': '01 A 123 BC', 'daily_price': '300000',
+                             'contract_start_date': '2030-01-01', 'owner_share_percent': '60',
+                             'company_share_percent': '40'})
+        self.run_import()
+        contract = contract_timelines.resolve(vehicle.pk, date(2030, 2, 1), date(2030, 2, 2))
+        self.assertEqual(contract.owner_share_percent, Decimal('60.00'))
+
+    def test_dry_run_writes_nothing(self):
+        self.write(self.fleet())
+        out, _ = self.run_import('--dry-run', '--batch-size', '2')
+        self.assertIn('Dry run: 4 rows', out)
+        self.assertIn('3 vehicles', out)
+        self.assertEqual(Vehicle.objects.count(), 0)
+        self.assertEqual(CarMake.objects.count(), 1)
 
-# Create your tests here.
+    def test_resume_skips_committed_rows(self):
+        self.write(self.fleet())
+        with open(self.path + '.checkpoint', 'w') as target:
+            json.dump({'file': self.path, 'size': os.path.getsize(self.path), 'rows': 2}, target)
+        out, _ = self.run_import('--resume')
+        self.assertIn('Resuming after 2 rows', out)
+        self.assertEqual(list(Vehicle.objects.values_list('plate_number', flat=True)), ['10 K 555 KK'])
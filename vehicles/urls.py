@@ -8,6 +8,7 @@ urlpatterns = [
     path('<int:pk>/', views.vehicle_detail, name='vehicle_detail'),
     path('<int:pk>/edit/', views.VehicleUpdateView.as_view(), name='vehicle_update'),
     path('<int:pk>/delete/', views.VehicleDeleteView.as_view(), name='vehicle_delete'),
+    path('availability/', views.availability_matrix, name='vehicle_availability_matrix'),
     
     # CarMake URLs
     path('makes/', views.CarMakeListView.as_view(), name='carmake_list'),
@@ -6,6 +6,9 @@ from django.db.models import Q
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
 from django.http import JsonResponse
+from django.utils import timezone
+from datetime import datetime, timedelta
+from utils import search_vehicle_ids
 from .models import CarMake, CarModel, Vehicle
 from .forms import CarMakeForm, CarModelForm, VehicleForm, VehicleSearchForm
 
@@ -16,10 +19,10 @@ class VehicleListView(ListView):
     paginate_by = 12
 
     def get_queryset(self):
-        queryset = Vehicle.objects.select_related('owner', 'make', 'model')
+        queryset = Vehicle.objects.select_related('owner', 'make', 'model__make')
         
-        # Apply search filters
-        search_form = VehicleSearchForm(self.request.GET)
+        # Apply search filters (forma bir marta tekshiriladi va kontekstda qayta ishlatiladi)
+        self.search_form = search_form = VehicleSearchForm(self.request.GET)
         if search_form.is_valid():
             search = search_form.cleaned_data.get('search')
             make = search_form.cleaned_data.get('make')
@@ -28,12 +31,7 @@ class VehicleListView(ListView):
             max_price = search_form.cleaned_data.get('max_price')
             
             if search:
-                queryset = queryset.filter(
-                    Q(name__icontains=search) |
-                    Q(plate_number__icontains=search) |
-                    Q(make__name__icontains=search) |
-                    Q(model__name__icontains=search)
-                )
+                queryset = queryset.filter(id__in=search_vehicle_ids(search))
             
             if make:
                 queryset = queryset.filter(make=make)
@@ -51,7 +49,7 @@ class VehicleListView(ListView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['search_form'] = VehicleSearchForm(self.request.GET)
+        context['search_form'] = self.search_form
         context['makes'] = CarMake.objects.all()
         return context
 
@@ -140,3 +138,47 @@ def get_models_by_make(request):
         models = CarModel.objects.filter(make_id=make_id).values('id', 'name')
         return JsonResponse(list(models), safe=False)
     return JsonResponse([], safe=False)
+
+@login_required
+def availability_matrix(request):
+    """
+    Fleet availability grid: rows are vehicles, columns are day or hour slots.
+
+    Query parameters: start (YYYY-MM-DD, default today), days (1-90,
+    default 28), slot ('day' or 'hour'), encoding ('rle' or 'bitset'),
+    status (optional Vehicle.status filter).
+    """
+    from bookings.availability import (
+        SLOT_BOOKED, SLOT_FREE, SLOT_UNAVAILABLE, build_availability_matrix,
+    )
+
+    try:
+        start = timezone.localdate()
+        if request.GET.get('start'):
+            start = datetime.strptime(request.GET['start'], '%Y-%m-%d').date()
+        days = int(request.GET.get('days', 28))
+    except ValueError:
+        return JsonResponse({'error': "start yoki days noto'g'ri"}, status=400)
+    slot = request.GET.get('slot', 'day')
+    encoding = request.GET.get('encoding', 'rle')
+    if not 1 <= days <= 90 or slot not in ('day', 'hour') or encoding not in ('rle', 'bitset'):
+        return JsonResponse({'error': "Parametrlar noto'g'ri"}, status=400)
+
+    slot_size = timedelta(days=1) if slot == 'day' else timedelta(hours=1)
+    slot_count = days if slot == 'day' else days * 24
+    window_start = timezone.make_aware(datetime.combine(start, datetime.min.time()))
+
+    vehicles = Vehicle.objects.order_by('id')
+    status = request.GET.get('status')
+    if status:
+        vehicles = vehicles.filter(status=status)
+
+    rows = build_availability_matrix(vehicles, window_start, slot_size, slot_count, encoding)
+    return JsonResponse({
+        'start': window_start.isoformat(),
+        'slot': slot,
+        'slots': slot_count,
+        'encoding': encoding,
+        'states': {SLOT_FREE: 'free', SLOT_BOOKED: 'booked', SLOT_UNAVAILABLE: 'unavailable'},
+        'vehicles': rows,
+    })